@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Single-pass results aggregator.
+
+Walks every benchmark result tree once, normalizes each file into flat records
+and caches the parse by file mtime/size, so regenerating downstream artifacts
+only re-reads what changed. Every consumer (README table, docs pages,
+run_vllm_bench.print_summary, compare_results) builds on `collect()`.
+
+Record schema:
+    {
+      "model": "org/name", "model_safe": "org_name", "gpu": "AMD R9700",
+      "tp": 1, "backend": "Triton" | "ROCm" | "AITER" | "default",
+      "tag": "", "kind": "throughput" | "latency" | "startup" | "max_context" | "server_log",
+      "qps": "1.0" | None, "params": {...},   # run parameters (max_context: util/max_seqs)
+      "metrics": {name: float}, "samples": {name: [float]},  # samples = per-trial values
+      "error": None | str,
+      "provenance": {"path": ..., "tree": ..., "date": "YYYY-MM-DD" | None, "mtime": float}
+    }
+
+Usage (regenerates docs/results.json, docs/comparison_results.json and prints
+the README max-context table):
+
+    python aggregate_results.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import analyze_server_logs
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+DOCS_DIR = PROJECT_ROOT / "docs"
+# Outside the repo so /opt (read-only in the image) and git stay clean
+CACHE_FILE = Path(os.getenv("RESULTS_CACHE", Path.home() / ".cache" / "vllm_bench_results_cache.json"))
+CACHE_VERSION = 9
+
+try:
+    import models
+    MODELS_TO_RUN = models.MODELS_TO_RUN
+    MODEL_TABLE = models.MODEL_TABLE
+except ImportError:
+    MODELS_TO_RUN = []
+    MODEL_TABLE = {}
+
+# Result tree name -> (GPU display name, backend override)
+TREE_INFO = {
+    "benchmark_results_amd-r9700": ("AMD R9700", None),
+    "benchmark_results_amd-r9700-rocm_atten": ("AMD R9700", "ROCm"),
+    "benchmark_results_amd-r9700-uv+pl": ("AMD R9700 (UV+PL)", None),
+    "benchmark_results_nvidia-3090": ("NVIDIA RTX 3090", None),
+    "benchmark_results_nvidia-4090": ("NVIDIA RTX 4090", None),
+    "benchmark_results_nvidia-5090": ("NVIDIA RTX 5090", None),
+    "benchmark_results_nvidia-ada5000": ("NVIDIA RTX 5000 Ada", None),
+    "benchmark_results_nvidia-a100": ("NVIDIA A100", None),
+    "vllm_benchmark_results": ("AMD R9700", None), # run_vllm_bench.RESULTS_DIR
+}
+# Cross-vendor comparison page only uses the per-GPU snapshot trees
+COMPARISON_TREES = [name for name in TREE_INFO if name.startswith("benchmark_results_")]
+DATED_TREE_RE = re.compile(r"^vllm_benchmark_results_(\d{2})-(\d{2})-(\d{4})$") # dd-mm-yyyy
+DEFAULT_GPU = "AMD R9700"
+
+BACKEND_DIRS = {"triton": "Triton", "rocm": "ROCm", "aiter": "AITER"}
+
+# metric -> (regex over `vllm bench serve` raw output, higher_is_better)
+LATENCY_METRICS = {
+    "output_tok_s": (r"Output token throughput \(tok/s\):\s*([\d\.]+)", True),
+    "mean_ttft_ms": (r"Mean TTFT \(ms\):\s*([\d\.]+)", False),
+    "p99_ttft_ms":  (r"P99 TTFT \(ms\):\s*([\d\.]+)", False),
+    "mean_tpot_ms": (r"Mean TPOT \(ms\):\s*([\d\.]+)", False),
+    "p99_tpot_ms":  (r"P99 TPOT \(ms\):\s*([\d\.]+)", False),
+}
+
+RESULT_RE = re.compile(r"^(?P<model>.+?)_tp(?P<tp>\d+)(?:_(?P<rest>.*?))?_(?P<kind>throughput|latency|startup)\.json$")
+SERVER_LOG_RE = re.compile(r"^(?P<model>.+?)_tp(?P<tp>\d+)(?:_(?P<tag>.*?))?_server\.log$")
+MAX_CONTEXT_FILE = "max_context_results.json"
+
+def log(msg): print(f"[AGGREGATE] {msg}", file=sys.stderr, flush=True)
+
+# =========================
+# PARSING
+# =========================
+
+def restore_model_name(model_safe):
+    """meta-llama_Meta-Llama-3.1-8B-Instruct -> meta-llama/Meta-Llama-3.1-8B-Instruct"""
+    return model_safe.replace("_", "/", 1) if "_" in model_safe else model_safe
+
+def parse_result_name(path):
+    """
+    Splits a result filename into (model_safe, tp, tag, qps, kind).
+    Returns None if the file is not a benchmark result.
+    """
+    m = RESULT_RE.match(path.name)
+    if not m:
+        return None
+
+    rest = m.group("rest") or ""
+    qps = None
+    m_qps = re.search(r"(?:^|_)qps([\d\.]+)$", rest)
+    if m_qps:
+        qps = m_qps.group(1)
+        rest = rest[:m_qps.start()]
+
+    return m.group("model"), int(m.group("tp")), rest.strip("_"), qps, m.group("kind")
+
+def kv_cache_tag(model, kv_cache_dtype):
+    """
+    Result tag for a KV cache dtype sweep: "" for the dtype the model is
+    configured with (MODEL_TABLE kv_cache_dtype, else "auto"), "kv<dtype>" otherwise.
+    """
+    configured = MODEL_TABLE.get(model, {}).get("kv_cache_dtype", "auto")
+    return "" if kv_cache_dtype in (None, configured) else f"kv{kv_cache_dtype}"
+
+def get_tree_info(path):
+    """
+    Derives (tree, gpu, backend, date) from the directories a file lives in.
+    The nearest backend-named directory wins over a tree-level backend override.
+    """
+    backend = None
+    for parent in path.parents:
+        if backend is None and parent.name in BACKEND_DIRS:
+            backend = BACKEND_DIRS[parent.name]
+        if parent.name in TREE_INFO:
+            gpu, tree_backend = TREE_INFO[parent.name]
+            return parent.name, gpu, backend or tree_backend or "default", None
+        m = DATED_TREE_RE.match(parent.name)
+        if m:
+            day, month, year = m.groups()
+            return parent.name, DEFAULT_GPU, backend or "default", f"{year}-{month}-{day}"
+    return path.parent.name, DEFAULT_GPU, backend or "default", None
+
+def parse_latency_output(raw):
+    metrics = {}
+    for name, (pattern, _) in LATENCY_METRICS.items():
+        m = re.search(pattern, raw)
+        if m:
+            metrics[name] = float(m.group(1))
+    return metrics
+
+def parse_result_file(path):
+    """Parses one throughput/latency/startup JSON into a list with a single record."""
+    parsed = parse_result_name(path)
+    if not parsed:
+        return []
+    model_safe, tp, tag, qps, kind = parsed
+    tree, gpu, backend, date = get_tree_info(path)
+
+    record = {
+        "model": restore_model_name(model_safe), "model_safe": model_safe, "gpu": gpu,
+        "tp": tp, "backend": backend, "tag": tag, "kind": kind, "qps": qps,
+        "params": {}, "metrics": {}, "samples": {}, "error": None,
+        "provenance": {"path": str(path), "tree": tree, "date": date, "mtime": path.stat().st_mtime},
+    }
+
+    try:
+        data = json.loads(path.read_text())
+    except Exception as e:
+        record["error"] = f"Unreadable ({e})"
+        return [record]
+
+    if "error" in data:
+        record["error"] = str(data["error"])
+    elif kind == "throughput":
+        tps = data.get("tokens_per_second")
+        if not tps:
+            record["error"] = "No tokens_per_second"
+        else:
+            record["metrics"]["tokens_per_second"] = float(tps)
+            for field in ("tokens_per_second_stddev", "tokens_per_second_ci95", "requests_per_second", "elapsed_time"):
+                if data.get(field) is not None:
+                    record["metrics"][field] = float(data[field])
+            record["samples"]["tokens_per_second"] = [float(v) for v in data.get("tokens_per_second_trials") or [tps]]
+            if data.get("max_num_seqs") is not None:
+                record["params"]["max_num_seqs"] = int(data["max_num_seqs"])
+            if data.get("kv_cache_dtype"):
+                record["params"]["kv_cache_dtype"] = data["kv_cache_dtype"]
+    elif kind == "startup":
+        # startup_bench.py: time-to-ready plus per-phase seconds
+        record["params"] = {"cache": data.get("cache"), "vllm_version": data.get("vllm_version")}
+        if data.get("time_to_ready_s") is None:
+            record["error"] = "Server did not start"
+        else:
+            record["metrics"]["time_to_ready_s"] = float(data["time_to_ready_s"])
+            for phase, seconds in (data.get("phases") or {}).items():
+                if seconds is not None:
+                    record["metrics"][f"phase_{phase}_s"] = float(seconds)
+    else:
+        record["metrics"] = parse_latency_output(data.get("raw_output", ""))
+        if not data.get("success", True):
+            # Typed by the watchdog ("hang in benchmark", ...) when it has one
+            record["error"] = data.get("failure") or "Benchmark failed"
+        elif not record["metrics"]:
+            record["error"] = "No metrics in raw_output"
+    return [record]
+
+def parse_server_log(path):
+    """Parses a `*_server.log` written by the latency runner into a single record."""
+    m = SERVER_LOG_RE.match(path.name)
+    if not m:
+        return []
+    tree, gpu, backend, date = get_tree_info(path)
+    model_safe = m.group("model")
+    record = {
+        "model": restore_model_name(model_safe), "model_safe": model_safe, "gpu": gpu,
+        "tp": int(m.group("tp")), "backend": backend, "tag": m.group("tag") or "", "kind": "server_log", "qps": None,
+        "params": {}, "metrics": {}, "samples": {}, "error": None,
+        "provenance": {"path": str(path), "tree": tree, "date": date, "mtime": path.stat().st_mtime},
+    }
+
+    timeline = analyze_server_logs.analyze(path.read_text(errors="replace"))
+    if timeline["version"]:
+        record["params"]["vllm_version"] = timeline["version"]
+    record["metrics"] = analyze_server_logs.record_metrics(timeline)
+    if not timeline["started"]:
+        record["error"] = "Server did not start"
+    return [record]
+
+def parse_max_context_file(path):
+    """Parses find_max_context.py output into one record per probe."""
+    tree, gpu, backend, date = get_tree_info(path)
+    try:
+        rows = json.loads(path.read_text())
+    except Exception as e:
+        log(f"Skipping bad JSON: {path} ({e})")
+        return []
+
+    records = []
+    for row in rows:
+        # Probes from before the KV dtype sweep carry no kv_cache_dtype: untagged
+        records.append({
+            "model": row["model"], "model_safe": row["model"].replace("/", "_"), "gpu": gpu,
+            "tp": row["tp"], "backend": backend, "tag": kv_cache_tag(row["model"], row.get("kv_cache_dtype")),
+            "kind": "max_context", "qps": None,
+            "params": {"util": float(row["util"]), "max_seqs": row["max_seqs"], "kv_cache_dtype": row.get("kv_cache_dtype")},
+            "metrics": {
+                "max_context": row.get("max_context_1_user", 0),
+                "real_capacity": row.get("real_capacity", 0),
+                "model_limit": row.get("model_limit", 0),
+            },
+            "samples": {},
+            "error": None if row.get("status") == "success" else (row.get("error") or "fail"),
+            "provenance": {"path": str(path), "tree": tree, "date": date, "mtime": path.stat().st_mtime},
+        })
+    return records
+
+def parse_file(path):
+    if path.name == MAX_CONTEXT_FILE:
+        return parse_max_context_file(path)
+    if path.suffix == ".log":
+        return parse_server_log(path)
+    return parse_result_file(path)
+
+# =========================
+# COLLECTION + CACHE
+# =========================
+
+def default_roots():
+    roots = [p for p in sorted(BENCH_DIR.iterdir()) if p.is_dir() and "benchmark_results" in p.name]
+    roots.append(BENCH_DIR / MAX_CONTEXT_FILE)
+    return roots
+
+def load_cache():
+    try:
+        cache = json.loads(CACHE_FILE.read_text())
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except Exception:
+        pass
+    return {"version": CACHE_VERSION, "files": {}}
+
+def save_cache(cache):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(cache))
+        tmp.replace(CACHE_FILE)
+    except Exception as e:
+        log(f"Warning: could not write cache: {e}")
+
+def iter_result_files(roots):
+    for root in roots:
+        root = Path(root).expanduser()
+        if root.is_file():
+            yield root.resolve()
+        elif root.is_dir():
+            for path in sorted(root.rglob("*")):
+                if RESULT_RE.match(path.name) or SERVER_LOG_RE.match(path.name) or path.name == MAX_CONTEXT_FILE:
+                    yield path.resolve()
+        else:
+            log(f"Warning: {root} does not exist, skipping.")
+
+def collect(roots=None, use_cache=True):
+    """
+    Returns normalized records for every result file under `roots`
+    (default: all result trees in benchmarks/ plus max_context_results.json).
+    Unchanged files are served from the mtime cache.
+    """
+    roots = default_roots() if roots is None else roots
+    cache = load_cache() if use_cache else {"version": CACHE_VERSION, "files": {}}
+    files = cache["files"]
+
+    records = []
+    parsed = 0
+    seen = set()
+    for path in iter_result_files(roots):
+        key = str(path)
+        if key in seen:
+            continue
+        seen.add(key)
+        st = path.stat()
+        entry = files.get(key)
+        if not entry or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "records": parse_file(path)}
+            files[key] = entry
+            parsed += 1
+        records.extend(entry["records"])
+
+    if use_cache and parsed:
+        save_cache(cache)
+    log(f"{len(records)} records from {len(seen)} files ({parsed} parsed, {len(seen) - parsed} cached).")
+    return records
+
+def model_order(records):
+    """Configured MODELS_TO_RUN first, then any other model found in the results."""
+    order = list(MODELS_TO_RUN)
+    for r in sorted(records, key=lambda r: r["model"]):
+        if r["model"] not in order:
+            order.append(r["model"])
+    return order
+
+# =========================
+# EMITTERS
+# =========================
+
+def format_context(val):
+    if val is None or val == 0:
+        return "Fail"
+    if val >= 1000:
+        return f"{val/1000:.0f}k"
+    return str(val)
+
+def build_readme_table(records, seq_levels=(1, 4, 8, 16)):
+    """Markdown max-context table: best context (util) per model/TP/concurrency."""
+    # model -> tp -> seq -> list of (context, util)
+    tree = {}
+    for r in records:
+        if r["kind"] != "max_context" or r["error"] or r["tag"]:
+            continue
+        seqs = tree.setdefault(r["model"], {}).setdefault(r["tp"], {})
+        seqs.setdefault(r["params"]["max_seqs"], []).append((r["metrics"]["max_context"], r["params"]["util"]))
+
+    lines = [
+        "",
+        "**Table Key:** Cell values represent `Max Context Length (GPU Memory Utilization)`.",
+        "",
+        "| Model | TP | " + " | ".join(f"{s} Req" if s == 1 else f"{s} Reqs" for s in seq_levels) + " |",
+        "| :--- | :--- | " + " | ".join(":---" for _ in seq_levels) + " |",
+    ]
+
+    for model_name in model_order([r for r in records if r["kind"] == "max_context"]):
+        if model_name not in tree:
+            continue
+
+        for i, tp in enumerate(sorted(tree[model_name])):
+            # 1. Best raw result per concurrency level: maximize context, then minimize util
+            best_by_seq = {}
+            for seq in seq_levels:
+                candidates = tree[model_name][tp].get(seq, [])
+                if candidates:
+                    best_by_seq[seq] = sorted(candidates, key=lambda x: (-x[0], x[1]))[0]
+
+            # 2. Smooth/Backfill: Ctx(reqs=low) >= Ctx(reqs=high).
+            # If 4 users can do 156k, 1 user certainly can too.
+            row_cells = [f"**`{model_name}`**" if i == 0 else "", str(tp)]
+            for i_seq, seq in enumerate(seq_levels):
+                valid_futures = [best_by_seq[s] for s in seq_levels[i_seq:] if s in best_by_seq]
+                if not valid_futures:
+                    row_cells.append("Fail")
+                else:
+                    ctx_val, util_val = max(valid_futures, key=lambda x: (x[0], -x[1]))
+                    row_cells.append(f"{format_context(ctx_val)} ({util_val:.2f})")
+
+            lines.append("| " + " | ".join(row_cells) + " |")
+    return "\n".join(lines)
+
+# Regex to parse model name for quantization and parameters
+PARAMS_REGEX = r"(\d+(?:\.\d+)?)B"
+QUANT_REGEX = r"(FP8|AWQ|GPTQ|BF16|4bit|Int4)"
+
+def extract_meta(model_name):
+    """Returns (params_b, quant) guessed from the model name."""
+    params_match = re.search(PARAMS_REGEX, model_name, re.IGNORECASE)
+    params_b = float(params_match.group(1)) if params_match else None
+
+    quant_match = re.search(QUANT_REGEX, model_name, re.IGNORECASE)
+    quant = quant_match.group(1).upper() if quant_match else "BF16"
+    if quant == "4BIT" or quant == "INT4":
+        if "GPTQ" in model_name: quant = "GPTQ-4bit"
+        elif "AWQ" in model_name: quant = "AWQ-4bit"
+        else: quant = "4-bit"
+    return params_b, quant
+
+# docs/index.html only knows the default (Triton) and ROCm columns
+DOCS_VARIANTS = {"Triton": "default", "ROCm": "rocm"}
+
+def latest_dated_tree(records):
+    dated = [r["provenance"] for r in records if r["provenance"]["date"]]
+    if not dated:
+        return None
+    return max(dated, key=lambda p: p["date"])["tree"]
+
+def build_docs_runs(records, tree=None):
+    """Rows for docs/results.json from the newest dated R9700 run (or `tree`)."""
+    tree = tree or latest_dated_tree(records)
+    runs = []
+    for r in records:
+        if r["provenance"]["tree"] != tree or r["backend"] not in DOCS_VARIANTS:
+            continue
+        if r["kind"] not in ("throughput", "latency"):
+            continue
+
+        params_b, quant = extract_meta(r["model"])
+        base_run = {
+            "model": r["model"],
+            "model_clean": r["model"],
+            "env": f"TP{r['tp']}",
+            "variant": DOCS_VARIANTS[r["backend"]],
+            "gpu_config": "dual" if r["tp"] > 1 else "single",
+            "quant": quant,
+            "params_b": params_b,
+            "name_params_b": params_b,
+            "backend": "vLLM",
+            "error": False
+        }
+
+        if r["kind"] == "throughput":
+            run = base_run.copy()
+            run["test"] = "Throughput"
+            run["tps_mean"] = r["metrics"].get("tokens_per_second", 0)
+            # Multi-trial results (run_vllm_bench.py --trials) carry error bars
+            run["tps_std"] = r["metrics"].get("tokens_per_second_stddev", 0)
+            run["tps_ci95"] = r["metrics"].get("tokens_per_second_ci95")
+            run["error"] = bool(r["error"])
+            runs.append(run)
+        else:
+            qps = r["qps"] or "?"
+            for label, metric in (("TTFT", "mean_ttft_ms"), ("TPOT", "mean_tpot_ms")):
+                run = base_run.copy()
+                run["test"] = f"{label} @ QPS {qps}"
+                run["tps_mean"] = r["metrics"].get(metric, 0.0)
+                runs.append(run)
+    return runs
+
+def build_comparison(records, tp=1):
+    """Rows for docs/comparison_results.json: TP=1 throughput per GPU, models seen on >= 2 GPUs."""
+    results = {}
+    snapshots = [r for r in records if r["provenance"]["tree"] in COMPARISON_TREES]
+    snapshots.sort(key=lambda r: COMPARISON_TREES.index(r["provenance"]["tree"])) # Stable GPU column order
+    for r in snapshots:
+        if r["kind"] != "throughput" or r["tp"] != tp or r["error"] or r["tag"]:
+            continue
+        if r["backend"] != "default":
+            continue
+        info = results.setdefault(r["model_safe"], {
+            "model_name": r["model"],
+            "model_clean": r["model_safe"],
+            "gpus": {}
+        })
+        info["gpus"][r["gpu"]] = r["metrics"]["tokens_per_second"]
+
+    final_output = [info for info in results.values() if len(info["gpus"]) >= 2]
+    final_output.sort(key=lambda x: x["model_name"])
+    return final_output
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    log(f"Written to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate all benchmark results and regenerate README/docs artifacts")
+    parser.add_argument("--no-cache", action="store_true", help="Re-parse every file")
+    parser.add_argument("--dump", type=str, help="Also write the normalized records to this JSON file")
+    args = parser.parse_args()
+
+    records = collect(use_cache=not args.no_cache)
+
+    write_json(DOCS_DIR / "results.json", {"runs": build_docs_runs(records)})
+    write_json(DOCS_DIR / "comparison_results.json", build_comparison(records))
+    if args.dump:
+        write_json(args.dump, records)
+
+    print(build_readme_table(records))
+
+if __name__ == "__main__":
+    main()
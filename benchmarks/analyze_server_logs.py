@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Startup-phase timeline for `vllm serve` logs.
+
+Turns each `*_server.log` (written by the latency runners) into a cold-start
+breakdown. Phase boundaries come from the log line timestamps (1 s resolution),
+so every phase ends at the first line of its end marker:
+
+    startup        first log line -> "Starting to load model"  (arg/config resolution, engine spawn)
+    weight_load    -> "Model loading took"                     (safetensors shards -> GPU)
+    compile        -> "torch.compile takes"                    (Dynamo + Inductor, cache hit or miss)
+    kv_profile     -> "GPU KV cache size"                      (memory profiling run, KV allocation)
+    graph_capture  -> "Graph capturing finished"               (CUDA/HIP graphs)
+    ready          -> "Application startup complete"           (warmup, API server routes)
+
+A phase whose marker is missing (e.g. --enforce-eager has no compile or graph
+capture) is reported as None and its time is folded into the next phase found.
+The self-reported figures vLLM prints (weights GiB, KV cache size, load/compile
+seconds) are extracted alongside; aggregate_results stores both in its
+`server_log` records so the warehouse and comparator can use them.
+
+Usage:
+
+    python analyze_server_logs.py                               # all result trees, grouped by backend
+    python analyze_server_logs.py benchmark_results_nvidia-4090 --group-by model
+    python analyze_server_logs.py --json startup_phases.json
+"""
+import argparse
+import datetime
+import json
+import re
+import statistics
+import sys
+
+# (phase, regex of the line that ENDS the phase), in startup order
+PHASES = [
+    ("startup",       r"Starting to load model"),
+    ("weight_load",   r"Model loading took"),
+    ("compile",       r"torch\.compile takes"),
+    ("kv_profile",    r"GPU KV cache size"),
+    ("graph_capture", r"Graph capturing finished"),
+    ("ready",         r"Application startup complete"),
+]
+
+# Startup facts printed once by `vllm serve` (values are per GPU for TP > 1)
+SERVER_LOG_METRICS = {
+    "weights_gib":     r"Model loading took ([\d\.]+) GiB",
+    "model_load_s":    r"Model loading took [\d\.]+ GiB memory and ([\d\.]+) seconds",
+    "weights_read_s":  r"Loading weights took ([\d\.]+) seconds",
+    "compile_s":       r"torch\.compile takes ([\d\.]+) s in total",
+    "kv_cache_gib":    r"Available KV cache memory: ([\d\.]+) GiB",
+    "kv_cache_tokens": r"GPU KV cache size: ([\d,]+) tokens",
+    "graph_capture_s": r"Graph capturing finished in ([\d\.]+) secs",
+    "graph_gib":       r"Graph capturing finished in [\d\.]+ secs, took ([\d\.]+) GiB",
+    # "... can use total_gpu_memory (31.86GiB) x gpu_memory_utilization (0.90) = 28.67GiB"
+    "vram_budget_gib": r"x gpu_memory_utilization \([\d\.]+\) = ([\d\.]+) ?GiB",
+    # Launch settings from the "non-default args: {...}" line
+    "max_num_seqs":    r"'max_num_seqs': (\d+)",
+    "gpu_util":        r"'gpu_memory_utilization': ([\d\.]+)",
+    "init_engine_s":   r"init engine \(profile, create kv cache, warmup model\) took ([\d\.]+) seconds",
+}
+
+# "INFO 12-09 18:49:09 [api_server.py:1351] ..." (no year in vLLM log lines)
+TIMESTAMP_RE = re.compile(r"\b(?:DEBUG|INFO|WARNING|ERROR|CRITICAL) (\d\d-\d\d \d\d:\d\d:\d\d) ")
+# tqdm progress: "Loading safetensors checkpoint shards: 100% Completed | 4/4 [00:03<00:00, ...]"
+SHARDS_RE = re.compile(r"Loading safetensors checkpoint shards:.*?(\d+)/(\d+) \[(?:(\d+):)?(\d+):(\d+)<")
+
+def log(msg): print(f"[LOGS] {msg}", file=sys.stderr, flush=True)
+
+def parse_timestamp(stamp):
+    # Leap year so "02-29" parses; only differences are ever used
+    return datetime.datetime.strptime(f"2000-{stamp}", "%Y-%m-%d %H:%M:%S")
+
+def extract_facts(text):
+    facts = {}
+    for name, pattern in SERVER_LOG_METRICS.items():
+        m = re.search(pattern, text)
+        if m:
+            facts[name] = float(m.group(1).replace(",", ""))
+
+    # Completed shard progress bars (one per TP rank): the slowest rank bounds the read
+    finished = [m for m in SHARDS_RE.finditer(text) if m.group(1) == m.group(2)]
+    if finished:
+        facts["shards"] = float(finished[0].group(2))
+        facts["shard_load_s"] = float(max(int(m.group(3) or 0) * 3600 + int(m.group(4)) * 60 + int(m.group(5)) for m in finished))
+    return facts
+
+def analyze(text):
+    """
+    Returns {"phases": {phase: seconds | None}, "total_s": float | None,
+             "facts": {name: float}, "started": bool, "version": str | None}.
+    """
+    first = None
+    last = None
+    marks = {}
+    pending = [(name, re.compile(pattern)) for name, pattern in PHASES]
+
+    for line in text.splitlines():
+        m = TIMESTAMP_RE.search(line)
+        if m:
+            last = parse_timestamp(m.group(1))
+            if first is None:
+                first = last
+        # Lines like "INFO:     Application startup complete." carry no stamp: use the last one seen
+        if last is None:
+            continue
+        for name, pattern in pending:
+            if pattern.search(line):
+                marks[name] = last
+                pending.remove((name, pattern))
+                break
+        if not pending:
+            break
+
+    phases = {}
+    prev = first
+    for name, _ in PHASES:
+        if name not in marks:
+            phases[name] = None
+            continue
+        delta = (marks[name] - prev).total_seconds()
+        if delta < 0:
+            # Crossed new year between two lines
+            delta += 366 * 86400
+        phases[name] = delta
+        prev = marks[name]
+
+    m_ver = re.search(r"vLLM API server version (\S+)", text)
+    started = "ready" in marks
+    return {
+        "phases": phases,
+        "total_s": sum(v for v in phases.values() if v is not None) if started else None,
+        "facts": extract_facts(text),
+        "started": started,
+        "version": m_ver.group(1) if m_ver else None,
+    }
+
+def record_metrics(timeline):
+    """Flattens analyze() output into aggregate_results metric names."""
+    metrics = dict(timeline["facts"])
+    for name, seconds in timeline["phases"].items():
+        if seconds is not None:
+            metrics[f"phase_{name}_s"] = seconds
+    if timeline["total_s"] is not None:
+        metrics["time_to_ready_s"] = timeline["total_s"]
+    return metrics
+
+# =========================
+# REPORTING
+# =========================
+
+def fmt(val, spec=".0f"):
+    return "-" if val is None else format(val, spec)
+
+def print_timelines(records):
+    phase_names = [name for name, _ in PHASES]
+    print(f"\n{'MODEL':<45} | {'GPU':<19} | {'Backend':<8} | {'TP':<2} | " +
+          " | ".join(f"{p[:8]:>8}" for p in phase_names) + f" | {'Total':>6} | {'KV GiB':>6} | {'KV tok':>9}")
+    print("-" * 190)
+    for r in records:
+        m = r["metrics"]
+        phases = " | ".join(f"{fmt(m.get(f'phase_{p}_s')):>8}" for p in phase_names)
+        total = fmt(m.get("time_to_ready_s")) if not r["error"] else "FAIL"
+        tokens = f"{int(m['kv_cache_tokens']):,}" if "kv_cache_tokens" in m else "-"
+        print(f"{r['model'].split('/')[-1][:45]:<45} | {r['gpu']:<19} | {r['backend']:<8} | {r['tp']:<2} | "
+              f"{phases} | {total:>6} | {fmt(m.get('kv_cache_gib'), '.2f'):>6} | {tokens:>9}")
+    print("-" * 190)
+
+def summarize(records, group_by):
+    """Mean seconds per phase for each group (model / gpu / backend / tp)."""
+    groups = {}
+    for r in records:
+        if r["error"]:
+            continue
+        key = str(r[group_by])
+        for name in [f"phase_{p}_s" for p, _ in PHASES] + ["time_to_ready_s"]:
+            if name in r["metrics"]:
+                groups.setdefault(key, {}).setdefault(name, []).append(r["metrics"][name])
+
+    summary = {}
+    for key, series in groups.items():
+        summary[key] = {name: statistics.fmean(vals) for name, vals in series.items()}
+        summary[key]["n"] = len(series.get("time_to_ready_s", []))
+    return summary
+
+def print_summary(summary, group_by):
+    phase_names = [name for name, _ in PHASES]
+    print(f"\nMean startup phases by {group_by} (seconds)")
+    print(f"{group_by.upper():<45} | {'N':>3} | " + " | ".join(f"{p[:8]:>8}" for p in phase_names) + f" | {'Total':>6}")
+    print("-" * 145)
+    for key, s in sorted(summary.items(), key=lambda kv: kv[1].get("time_to_ready_s", 0), reverse=True):
+        phases = " | ".join(f"{fmt(s.get(f'phase_{p}_s'), '.1f'):>8}" for p in phase_names)
+        print(f"{key[:45]:<45} | {s['n']:>3} | {phases} | {fmt(s.get('time_to_ready_s'), '.1f'):>6}")
+    print("-" * 145)
+
+def main():
+    # Imported here: aggregate_results imports this module for its log parsing
+    import aggregate_results
+
+    parser = argparse.ArgumentParser(description="Startup-phase timing breakdown from vLLM server logs")
+    parser.add_argument("roots", nargs="*", help="Result directories or log files (default: all result trees)")
+    parser.add_argument("--group-by", choices=["backend", "gpu", "model", "tp"], default="backend")
+    parser.add_argument("--model", type=str, help="Only models containing this substring")
+    parser.add_argument("--json", type=str, help="Also write per-log timelines and the summary to this file")
+    args = parser.parse_args()
+
+    records = [r for r in aggregate_results.collect(args.roots or None) if r["kind"] == "server_log"]
+    if args.model:
+        records = [r for r in records if args.model.lower() in r["model"].lower()]
+    if not records:
+        log("No server logs found.")
+        sys.exit(1)
+    records.sort(key=lambda r: (r["gpu"], r["backend"], r["model"], r["tp"]))
+
+    print_timelines(records)
+    summary = summarize(records, args.group_by)
+    print_summary(summary, args.group_by)
+
+    failed = [r for r in records if r["error"]]
+    if failed:
+        log(f"{len(failed)} log(s) never reached 'Application startup complete'.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"logs": records, "summary": summary, "group_by": args.group_by}, f, indent=2)
+        log(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Throughput autotuner for --max-num-batched-tokens and --max-num-seqs.
+
+For each model / TP / attention backend, serves the model with a grid of
+scheduler settings and drives every server with the same saturating
+`vllm bench serve` load. The search climbs the grid instead of running all of
+it: batched tokens grow until output throughput stops improving by
+--min-gain (or the server no longer starts), then max-num-seqs grows while its
+best run still improves. With --chunked-prefill both, every max-num-seqs level
+also gets one run with chunked prefill disabled (batched tokens = context).
+Failed settings are recorded in the failure database (failure_db.py) and not
+launched again on the same stack unless --retry-failed.
+
+Every run lands on a throughput vs latency plane (--latency-metric, default
+p99 end-to-end). The Pareto frontier and three picks from it are stored per
+configuration:
+
+    throughput   highest output tok/s
+    balanced     lowest latency within BALANCED_WITHIN of the best tok/s
+    latency      lowest latency
+
+Outputs (under ~/vllm_benchmark_results/):
+    autotune/{triton,rocm,aiter}/{model}_tp{N}_bt{tokens}_seqs{S}[_nochunk]_serve.json
+    autotune/{triton,rocm,aiter}/{model}_tp{N}_bt{tokens}_seqs{S}[_nochunk]_metrics.json   /metrics time series
+    autotune/{triton,rocm,aiter}/{model}_tp{N}_bt{tokens}_seqs{S}[_nochunk]_host.json      --profile-host samples
+    autotune/{triton,rocm,aiter}/{model}_tp{N}_autotune_server.log
+    autotune_results.json    trials, frontier and recommendations; the
+                             "balanced" pick is printed as a MODEL_TABLE entry
+"""
+import subprocess, time, json, sys, os, argparse, contextlib
+
+try:
+    from run_vllm_bench import MODEL_TABLE, MODELS_TO_RUN, RESULTS_DIR, DEFAULT_BATCH_TOKENS, GPU_UTIL, get_gpu_count, kill_vllm, nuke_vllm_cache, get_dataset, get_model_args
+    from tp_vs_dp_bench import SERVE_FIELDS, wait_for_server, verified_context
+except ImportError:
+    print("Error: Could not import run_vllm_bench.py / tp_vs_dp_bench.py. Make sure they are in the same directory.")
+    sys.exit(1)
+
+import failure_db
+import host_profiler
+import vllm_metrics
+import watchdog
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HOST = "127.0.0.1"
+PORT = 8000
+BATCH_TOKENS_GRID = [2048, 4096, 8192, 16384, 32768]
+MAX_SEQS_GRID = [16, 32, 64, 128, 256]
+NUM_PROMPTS = 300
+MIN_GAIN = 0.02          # Stop climbing an axis when tok/s improves by less than 2%
+BALANCED_WITHIN = 0.05   # "balanced" may give up 5% of the best tok/s for latency
+LATENCY_METRICS = ["p99_e2el_ms", "median_e2el_ms", "p99_ttft_ms", "median_ttft_ms", "p99_tpot_ms", "median_tpot_ms"]
+
+OUT_DIR = RESULTS_DIR / "autotune"
+SUMMARY_FILE = RESULTS_DIR / "autotune_results.json"
+# Launcher backend name -> (results sub-directory, --attention-backend, extra env)
+BACKENDS = {
+    "Triton": ("triton", "TRITON_ATTN", {}),
+    "ROCm":   ("rocm", "ROCM_ATTN", {}),
+    "AITER":  ("aiter", "ROCM_ATTN", {"VLLM_ROCM_USE_AITER": "1"}),
+}
+
+def log(msg): print(f"\n[AUTOTUNE] {msg}", flush=True)
+
+def trial_key(model, tp, backend, max_seqs):
+    config = MODEL_TABLE[model]
+    return failure_db.make_key("autotune", model, tp, config.get("gpu_util", GPU_UTIL), max_seqs, backend,
+                               config.get("kv_cache_dtype", "auto"))
+
+def run_trial(model, tp, backend, batch_tokens, max_seqs, chunked, ctx, dataset_path, retry_failed=False, profile=None):
+    """
+    Serves one scheduler setting and benchmarks it. Returns a trial dict.
+    Settings the failure database knows to fail (fatal, or at least as many
+    batched tokens as a recorded failure) are not launched unless `retry_failed`.
+    `profile` ("cpu" or "py-spy") adds a host_profiler verdict to the trial.
+    """
+    subdir, attn_backend, backend_env = BACKENDS[backend]
+    out_dir = OUT_DIR / subdir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model_safe = model.replace("/", "_")
+    label = f"bt{batch_tokens}_seqs{max_seqs}" + ("" if chunked else "_nochunk")
+    result_file = out_dir / f"{model_safe}_tp{tp}_{label}_serve.json"
+    metrics_file = out_dir / f"{model_safe}_tp{tp}_{label}_metrics.json"
+    trial = {"max_num_batched_tokens": batch_tokens, "max_num_seqs": max_seqs, "chunked_prefill": chunked}
+
+    if result_file.exists():
+        data = json.loads(result_file.read_text())
+        log(f"CACHED {label} ({data.get('output_throughput', 0):.0f} tok/s)")
+        server_metrics = json.loads(metrics_file.read_text())["summary"] if metrics_file.exists() else {}
+        return {**trial, **{k: data.get(k) for k in SERVE_FIELDS}, "server_metrics": server_metrics}
+
+    key = trial_key(model, tp, backend, max_seqs)
+    known = None if retry_failed else failure_db.lookup(key)
+    cap = failure_db.length_cap(known)
+    if failure_db.should_skip(known) or (cap and batch_tokens >= cap):
+        log(f"SKIP {label} (known failure: {failure_db.describe(known)}, use --retry-failed)")
+        return {**trial, "error": f"Known failure: {known['reason']}"}
+
+    overrides = {"max_num_seqs": str(max_seqs)}
+    if ctx:
+        overrides["ctx"] = ctx
+    cmd = ["vllm", "serve"] + get_model_args(model, tp, overrides) + [
+        "--host", HOST, "--port", str(PORT),
+        "--max-num-batched-tokens", str(batch_tokens),
+        "--attention-backend", attn_backend,
+        "--mm-encoder-attn-backend", "TRITON_ATTN",
+    ]
+    if not chunked:
+        cmd.append("--no-enable-chunked-prefill")
+    env = os.environ.copy()
+    env["VLLM_DISABLE_COMPILE_CACHE"] = "1"
+    env.pop("VLLM_ROCM_USE_AITER", None)
+    env.update(backend_env)
+    env.update(MODEL_TABLE[model].get("env", {}))
+
+    log(f"START {model} (TP={tp} | {backend} | {label})")
+    kill_vllm()
+    server_log = out_dir / f"{model_safe}_tp{tp}_autotune_server.log"
+    with open(server_log, "w") as srv_log:
+        proc = subprocess.Popen(cmd, stdout=srv_log, stderr=subprocess.STDOUT, env=env)
+        try:
+            if not wait_for_server(f"http://{HOST}:{PORT}", [proc]):
+                srv_log.flush()
+                oom = watchdog.OOM_RE.search(server_log.read_text(errors="replace"))
+                error = "Server did not start (OOM)" if oom else "Server did not start"
+                failure_db.record(key, error, batch_tokens)
+                return {**trial, "error": error}
+            bench = [
+                "vllm", "bench", "serve",
+                "--model", model,
+                "--base-url", f"http://{HOST}:{PORT}",
+                "--request-rate", "inf",
+                "--num-prompts", str(NUM_PROMPTS),
+                # Enough clients to keep every sequence slot busy
+                "--max-concurrency", str(max_seqs * 2),
+                "--percentile-metrics", "ttft,tpot,e2el",
+                "--metric-percentiles", "50,99",
+                "--save-result", "--result-dir", str(out_dir), "--result-filename", result_file.name,
+                "--trust-remote-code"
+            ]
+            if dataset_path: bench.extend(["--dataset-name", "sharegpt", "--dataset-path", dataset_path])
+            else: bench.extend(["--dataset-name", "random", "--random-input-len", "1024", "--random-output-len", "512"])
+            profiler = (host_profiler.HostProfiler(proc.pid, pyspy=profile == "py-spy",
+                                                   pyspy_out=out_dir / f"{model_safe}_tp{tp}_{label}_pyspy.txt")
+                        if profile else contextlib.nullcontext())
+            with vllm_metrics.MetricsScraper(f"http://{HOST}:{PORT}") as scraper, profiler:
+                res = subprocess.run(bench, capture_output=True, text=True)
+            server_metrics = scraper.save(metrics_file)
+            host = profiler.save(out_dir / f"{model_safe}_tp{tp}_{label}_host.json") if profile else None
+            try:
+                data = json.loads(result_file.read_text())
+            except Exception:
+                error = res.stderr[-500:] if res.stderr else "Benchmark failed"
+                failure_db.record(key, error, batch_tokens)
+                return {**trial, "error": error}
+        finally:
+            proc.terminate()
+            kill_vllm()
+
+    failure_db.success(key, batch_tokens)
+    result = {**trial, **{k: data.get(k) for k in SERVE_FIELDS}, "server_metrics": server_metrics}
+    log(f"{label}: {result['output_throughput'] or 0:.0f} tok/s | {vllm_metrics.describe(server_metrics)}")
+    if host:
+        result["host_profile"] = host
+        log(f"{label}: {host_profiler.describe(host)}")
+    return result
+
+def throughput(trial):
+    return 0 if trial.get("error") else (trial.get("output_throughput") or 0)
+
+def search(model, tp, backend, chunked_modes, ctx, dataset_path, min_gain=MIN_GAIN, retry_failed=False, profile=None):
+    """
+    Coordinate ascent with early stopping: for each max-num-seqs level climb
+    batched tokens, then move to the next level only while it still pays off.
+    """
+    trials = []
+    best_prev_level = 0
+    for max_seqs in MAX_SEQS_GRID:
+        level = []
+        for batch_tokens in BATCH_TOKENS_GRID:
+            # vLLM rejects max_num_batched_tokens < max_num_seqs
+            if batch_tokens < max_seqs:
+                continue
+            trial = run_trial(model, tp, backend, batch_tokens, max_seqs, True, ctx, dataset_path, retry_failed, profile)
+            trials.append(trial)
+            if trial.get("error"):
+                break # Larger batches only need more memory
+            best_level = max((throughput(t) for t in level), default=0)
+            level.append(trial)
+            if best_level and throughput(trial) < best_level * (1 + min_gain):
+                break
+        if False in chunked_modes and str(ctx).isdigit():
+            trial = run_trial(model, tp, backend, int(ctx), max_seqs, False, ctx, dataset_path, retry_failed, profile)
+            trials.append(trial)
+            level.append(trial)
+
+        best_level = max((throughput(t) for t in level), default=0)
+        if not best_level or best_level < best_prev_level * (1 + min_gain):
+            log(f"Stopping at max_num_seqs={max_seqs}: no gain over {best_prev_level:.0f} tok/s")
+            break
+        best_prev_level = best_level
+    return trials
+
+def pareto_front(trials, latency_metric):
+    """Trials not beaten on both throughput (higher) and latency (lower), by latency."""
+    points = [t for t in trials if throughput(t) and t.get(latency_metric) is not None]
+    front = []
+    for t in sorted(points, key=lambda t: (-throughput(t), t[latency_metric])):
+        if not front or t[latency_metric] < front[-1][latency_metric]:
+            front.append(t)
+    return sorted(front, key=lambda t: t[latency_metric])
+
+def recommendations(front, latency_metric):
+    if not front:
+        return {}
+    best = max(front, key=throughput)
+    near_best = [t for t in front if throughput(t) >= throughput(best) * (1 - BALANCED_WITHIN)]
+    return {
+        "throughput": best,
+        "balanced": min(near_best, key=lambda t: t[latency_metric]),
+        "latency": min(front, key=lambda t: t[latency_metric]),
+    }
+
+def profile_snippet(model, pick):
+    """MODEL_TABLE fields for the pick (strings, like models.py)."""
+    fields = {"max_num_seqs": str(pick["max_num_seqs"]), "max_tokens": str(pick["max_num_batched_tokens"])}
+    baseline = {k: MODEL_TABLE[model].get(k) for k in fields}
+    return fields, baseline
+
+def print_summary(rows, latency_metric):
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Backend':<7} | {'Pick':<10} | {'Batch tok':<9} | {'Seqs':<4} | {'Chunk':<5} | {'Out tok/s':<9} | {latency_metric:<14}")
+    print("-" * 125)
+    for row in rows:
+        name = row["model"].split("/")[-1][:40]
+        if not row["recommendations"]:
+            print(f"{name:<40} | {row['tp']:<2} | {row['backend']:<7} | FAILED ({len(row['trials'])} trials)")
+            continue
+        for pick_name, t in row["recommendations"].items():
+            print(f"{name:<40} | {row['tp']:<2} | {row['backend']:<7} | {pick_name:<10} | {t['max_num_batched_tokens']:<9} | {t['max_num_seqs']:<4} | "
+                  f"{'on' if t['chunked_prefill'] else 'off':<5} | {throughput(t):<9.0f} | {t[latency_metric]:<14.0f}"
+                  + (" | KV saturated" if (t.get("server_metrics") or {}).get("saturated") else ""))
+            name = ""
+        fields, baseline = profile_snippet(row["model"], row["recommendations"]["balanced"])
+        print(f"{'':<40}   => MODEL_TABLE[\"{row['model']}\"]: {fields} (currently {baseline})")
+        host = row["recommendations"]["throughput"].get("host_profile")
+        if host:
+            print(f"{'':<40}   => host at the throughput pick: {host['verdict']} - {host['advice']}")
+        print("-" * 125)
+
+def main():
+    parser = argparse.ArgumentParser(description="Search max-num-batched-tokens x max-num-seqs per model/TP/backend")
+    parser.add_argument("--model", type=str, help="Filter to run only this model (substring match)")
+    parser.add_argument("--tp", type=int, nargs="+", help="TP sizes (default: every valid TP that fits)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=["Triton"])
+    parser.add_argument("--chunked-prefill", choices=["on", "both"], default="on",
+                        help="'both' adds a chunked-prefill-off run per max-num-seqs level")
+    parser.add_argument("--latency-metric", choices=LATENCY_METRICS, default="p99_e2el_ms")
+    parser.add_argument("--min-gain", type=float, default=MIN_GAIN, help="Early-stopping threshold (relative tok/s gain)")
+    parser.add_argument("--force", action="store_true", help="Re-tune configurations already in the summary")
+    parser.add_argument("--retry-failed", action="store_true", help="Launch settings the failure database knows to fail")
+    parser.add_argument("--profile-host", choices=["cpu", "py-spy"],
+                        help="Profile server CPU per trial (py-spy: also hot Python frames) for a CPU- vs GPU-bound verdict")
+    args = parser.parse_args()
+
+    gpu_count = get_gpu_count()
+    chunked_modes = [True] if args.chunked_prefill == "on" else [True, False]
+
+    summary = []
+    if SUMMARY_FILE.exists():
+        try: summary = json.loads(SUMMARY_FILE.read_text())
+        except Exception as e: log(f"Warning: could not read {SUMMARY_FILE}: {e}")
+
+    dataset_path = get_dataset()
+    touched = []
+    for model in MODELS_TO_RUN:
+        if args.model and args.model not in model:
+            continue
+        for tp in args.tp or MODEL_TABLE[model]["valid_tp"]:
+            if tp not in MODEL_TABLE[model]["valid_tp"] or tp > gpu_count:
+                continue
+            for backend in args.backends:
+                key = (model, tp, backend)
+                touched.append(key)
+                if not args.force and any((r["model"], r["tp"], r["backend"]) == key for r in summary):
+                    log(f"SKIP {model} (TP={tp} | {backend}) (in {SUMMARY_FILE.name}, use --force)")
+                    continue
+
+                nuke_vllm_cache()
+                # Never tune past the context verified to start for this TP
+                ctx = verified_context(model, tp) or MODEL_TABLE[model].get("ctx")
+                trials = search(model, tp, backend, chunked_modes, ctx, dataset_path, args.min_gain, args.retry_failed, args.profile_host)
+                front = pareto_front(trials, args.latency_metric)
+                row = {
+                    "model": model, "tp": tp, "backend": backend, "latency_metric": args.latency_metric,
+                    "baseline": {"max_tokens": MODEL_TABLE[model].get("max_tokens", DEFAULT_BATCH_TOKENS),
+                                 "max_num_seqs": MODEL_TABLE[model].get("max_num_seqs")},
+                    "trials": trials, "pareto": front, "recommendations": recommendations(front, args.latency_metric),
+                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                summary = [r for r in summary if (r["model"], r["tp"], r["backend"]) != key] + [row]
+                SUMMARY_FILE.write_text(json.dumps(summary, indent=2))
+
+    print_summary([r for r in summary if (r["model"], r["tp"], r["backend"]) in touched],
+                  args.latency_metric)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Compares two benchmark result sets and flags regressions.
+
+Results are matched by (model, TP, backend, tag, metric). Backend is taken from
+the `triton/`, `rocm/` or `aiter/` sub-directory a file lives in ("default" for
+flat result trees such as `benchmark_results_amd-r9700`, see
+aggregate_results.get_tree_info). Use --ignore-backend to compare across them.
+
+Several directories may be passed for each side (e.g. three baseline runs of the
+same image), and multi-trial throughput results (`run_vllm_bench.py --trials`)
+contribute every trial. The spread of those samples is used as the noise floor,
+so a delta only counts as a regression when it exceeds BOTH the relative
+tolerance and NOISE_SIGMAS times the combined standard deviation.
+
+Exit code is 1 if any regression is found, 0 otherwise. Intended use is gating
+a new toolbox image before rolling it out:
+
+    python compare_results.py --baseline old/triton old_rerun/triton --candidate new/triton
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+
+import aggregate_results
+from aggregate_results import LATENCY_METRICS
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+DEFAULT_TOLERANCE = 0.05 # 5% relative change before we care
+NOISE_SIGMAS = 2.0       # Deltas inside 2 sigma of run-to-run noise are ignored
+
+def log(msg): print(f"[COMPARE] {msg}", flush=True)
+
+def load_result_set(dirs, ignore_backend=False):
+    """
+    Loads every result under `dirs` (via aggregate_results) and returns
+    {(model, tp, backend, tag, metric): {"values": [...], "errors": [...]}}.
+    Multiple directories are treated as repeated runs of the same configuration.
+    """
+    results = {}
+    for r in aggregate_results.collect(dirs):
+        if r["kind"] not in ("throughput", "latency", "startup"):
+            continue
+        backend = "*" if ignore_backend else r["backend"]
+        suffix = "" if r["qps"] is None else f"@qps{r['qps']}"
+
+        if r["error"]:
+            names = {"throughput": ["tokens_per_second"], "startup": ["time_to_ready_s"]}.get(r["kind"], list(LATENCY_METRICS))
+            for name in names:
+                entry = results.setdefault((r["model_safe"], r["tp"], backend, r["tag"], name + suffix), {"values": [], "errors": []})
+                entry["errors"].append(r["error"])
+            continue
+
+        names = ["tokens_per_second"] if r["kind"] == "throughput" else list(r["metrics"])
+        for name in names:
+            # Multi-trial throughput results contribute every trial as a sample
+            samples = r["samples"].get(name) or [r["metrics"][name]]
+            entry = results.setdefault((r["model_safe"], r["tp"], backend, r["tag"], name + suffix), {"values": [], "errors": []})
+            entry["values"].extend(samples)
+    return results
+
+def higher_is_better(metric):
+    name = metric.split("@")[0]
+    if name in LATENCY_METRICS:
+        return LATENCY_METRICS[name][1]
+    # Startup phases and time-to-ready are durations
+    return not name.endswith("_s")
+
+def summarize(values):
+    """Returns (mean, stddev). Stddev is 0 for a single sample."""
+    mean = statistics.fmean(values)
+    std = statistics.stdev(values) if len(values) > 1 else 0.0
+    return mean, std
+
+def compare(baseline, candidate, tolerance=DEFAULT_TOLERANCE, sigmas=NOISE_SIGMAS):
+    """
+    Compares two loaded result sets.
+    Returns list of row dicts with a "status" of ok / improved / REGRESSION / noise / missing.
+    """
+    rows = []
+    for key in sorted(set(baseline) | set(candidate)):
+        base = baseline.get(key, {"values": [], "errors": []})
+        cand = candidate.get(key, {"values": [], "errors": []})
+        model, tp, backend, tag, metric = key
+        row = {
+            "model": model, "tp": tp, "backend": backend, "tag": tag, "metric": metric,
+            "baseline": None, "candidate": None, "delta_pct": None, "threshold_pct": None,
+        }
+
+        if not base["values"]:
+            # Nothing to regress against
+            row["status"] = "new" if cand["values"] else "missing"
+            if cand["values"]:
+                row["candidate"] = summarize(cand["values"])[0]
+            rows.append(row)
+            continue
+
+        b_mean, b_std = summarize(base["values"])
+        row["baseline"] = b_mean
+
+        if not cand["values"]:
+            # Baseline worked but candidate errored -> hard regression.
+            # Candidate simply not run -> missing.
+            row["status"] = "REGRESSION" if cand["errors"] else "missing"
+            if cand["errors"]:
+                row["error"] = cand["errors"][-1]
+            rows.append(row)
+            continue
+
+        c_mean, c_std = summarize(cand["values"])
+        row["candidate"] = c_mean
+
+        delta = (c_mean - b_mean) / b_mean if b_mean else 0.0
+        noise = sigmas * math.sqrt(b_std ** 2 + c_std ** 2) / b_mean if b_mean else 0.0
+        threshold = max(tolerance, noise)
+        row["delta_pct"] = delta * 100
+        row["threshold_pct"] = threshold * 100
+
+        signed = delta if higher_is_better(metric) else -delta
+        if signed < -threshold:
+            row["status"] = "REGRESSION"
+        elif signed > threshold:
+            row["status"] = "improved"
+        elif abs(delta) > tolerance:
+            # Would have tripped the plain tolerance but is inside the noise band
+            row["status"] = "noise"
+        else:
+            row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+def fmt(val, width=10):
+    return f"{val:<{width}.1f}" if isinstance(val, float) else f"{'-':<{width}}"
+
+def print_report(rows, show_all=False):
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Backend':<8} | {'Tag':<10} | {'Metric':<24} | {'Base':<10} | {'Cand':<10} | {'Delta%':<7} | {'Thr%':<5} | Status")
+    print("-" * 150)
+    for r in rows:
+        if not show_all and r["status"] in ("ok", "missing"):
+            continue
+        name = r["model"].split("_", 1)[-1]
+        tag = r["tag"] if r["tag"] else "(Default)"
+        delta = f"{r['delta_pct']:+.1f}" if r["delta_pct"] is not None else "-"
+        thr = f"{r['threshold_pct']:.1f}" if r["threshold_pct"] is not None else "-"
+        status = r["status"]
+        if r.get("error"):
+            status += f" ({r['error']})"
+        print(f"{name:<40} | {r['tp']:<2} | {r['backend']:<8} | {tag:<10} | {r['metric']:<24} | {fmt(r['baseline'])} | {fmt(r['candidate'])} | {delta:<7} | {thr:<5} | {status}")
+    print("-" * 150)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result sets and fail on regressions")
+    parser.add_argument("--baseline", nargs="+", required=True, help="Baseline result directories (repeats allowed)")
+    parser.add_argument("--candidate", nargs="+", required=True, help="Candidate result directories (repeats allowed)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Relative tolerance (default: 0.05 = 5%%)")
+    parser.add_argument("--sigmas", type=float, default=NOISE_SIGMAS, help="Noise band in standard deviations (default: 2)")
+    parser.add_argument("--ignore-backend", action="store_true", help="Match results regardless of attention backend")
+    parser.add_argument("--all", action="store_true", help="Show unchanged and missing rows too")
+    parser.add_argument("--json", type=str, help="Also write the comparison rows to this file")
+    args = parser.parse_args()
+
+    baseline = load_result_set(args.baseline, args.ignore_backend)
+    candidate = load_result_set(args.candidate, args.ignore_backend)
+    log(f"Loaded {len(baseline)} baseline and {len(candidate)} candidate metrics.")
+
+    rows = compare(baseline, candidate, args.tolerance, args.sigmas)
+    print_report(rows, show_all=args.all)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    counts = {}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    log("Summary: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+    if counts.get("REGRESSION"):
+        log(f"FAIL: {counts['REGRESSION']} regression(s) beyond tolerance.")
+        sys.exit(1)
+    log("PASS: no regressions beyond tolerance.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Failure knowledge base for the probe (find_max_context.py) and autotune
+sweeps, so a later sweep does not relaunch configurations that are known to
+fail on this stack.
+
+Entries are keyed by tool, model, TP, GPU util, max-num-seqs, attention
+backend, KV cache dtype and the kernel_cache stack fingerprint (a vLLM / ROCm
+upgrade starts from a clean slate). Each entry keeps the classified reason and
+the failing lengths (max_model_len for probes, max-num-batched-tokens for
+autotune):
+
+    sampler_oom, verification_failed   fatal: the configuration is skipped
+    exhausted                          every length down to the floor failed: skipped
+    oom, capacity                      the search starts below min_failing_len
+    timeout, crash                     kept for the record, not acted on
+
+Both tools take --retry-failed to ignore the database for a run. A later
+success at or above the failing length drops the entry; one below it is kept
+as max_working_len, where the next probe starts.
+
+    python failure_db.py                    # entries for this stack
+    python failure_db.py --all              # every stack
+    python failure_db.py --clear [--model Qwen3]
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import kernel_cache
+
+DB_FILE = Path(os.getenv("FAILURE_DB", "~/vllm_benchmark_results/failure_db.json")).expanduser()
+FATAL = {"sampler_oom", "verification_failed", "exhausted"}
+# Categories that say something about the length (a timeout or crash does not)
+LENGTH_BOUND = {"oom", "capacity"}
+
+# (category, substring of the failure message), first match wins
+CATEGORIES = [
+    ("sampler_oom",         "Sampler Warmup OOM"),
+    ("verification_failed", "Verification Failed"),
+    ("capacity",            "maximum number of tokens"),
+    ("capacity",            "derived max_model_len"),
+    ("capacity",            "Capacity Error"),
+    ("oom",                 "OOM"),
+    ("oom",                 "out of memory"),
+    ("timeout",             "Timeout"),
+    ("timeout",             "did not start"),
+]
+
+def log(msg): print(f"[FAILDB] {msg}", flush=True)
+
+def classify(reason):
+    for category, needle in CATEGORIES:
+        if needle.lower() in (reason or "").lower():
+            return category
+    return "crash"
+
+def make_key(tool, model, tp, util, max_seqs, backend="default", kv_cache_dtype="auto", fp=None):
+    return "|".join(str(p) for p in (tool, model, tp, util, max_seqs, backend, kv_cache_dtype, fp or kernel_cache.fingerprint()))
+
+def load():
+    try:
+        return json.loads(DB_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+def save(db):
+    DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = DB_FILE.with_name(DB_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(db, indent=2, sort_keys=True))
+    os.replace(tmp, DB_FILE)
+
+def lookup(key):
+    return load().get(key)
+
+def record(key, reason, length, category=None):
+    """Adds one failure at `length` to the entry for `key`. Returns the entry."""
+    db = load()
+    category = category or classify(reason)
+    entry = db.get(key, {"count": 0})
+    # A timeout or crash further down the ladder does not undo a known length bound
+    if entry.get("category") in LENGTH_BOUND and category not in FATAL | LENGTH_BOUND:
+        category = entry["category"]
+    entry.update({
+        "category": category,
+        "reason": (reason or "")[:300],
+        "max_failing_len": max(length, entry.get("max_failing_len", 0)),
+        "min_failing_len": min(length, entry.get("min_failing_len", length)),
+        "count": entry["count"] + 1,
+        "last_seen": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    db[key] = entry
+    save(db)
+    log(f"Recorded {category} at {length} ({key.split('|', 1)[1]})")
+    return entry
+
+def success(key, length):
+    """A run of `key` worked at `length`: forgets failures it disproves, else remembers max_working_len."""
+    db = load()
+    entry = db.get(key)
+    if not entry:
+        return
+    if length >= entry["min_failing_len"]:
+        del db[key]
+    else:
+        entry["max_working_len"] = max(length, entry.get("max_working_len", 0))
+    save(db)
+
+def should_skip(entry):
+    return bool(entry) and entry["category"] in FATAL
+
+def length_cap(entry):
+    """Exclusive upper bound for the next search, None if nothing is known."""
+    return entry["min_failing_len"] if entry and entry["category"] in LENGTH_BOUND else None
+
+def describe(entry):
+    return f"{entry['category']} x{entry['count']} at {entry['min_failing_len']}..{entry['max_failing_len']} ({entry['last_seen']})"
+
+def clear(model=None):
+    """Drops every entry (or those of models containing `model`). Returns how many."""
+    db = load()
+    keep = {k: v for k, v in db.items() if model and model not in k.split("|")[1]}
+    save(keep)
+    return len(db) - len(keep)
+
+def main():
+    parser = argparse.ArgumentParser(description="List or clear known-failing benchmark configurations")
+    parser.add_argument("--model", type=str, help="Only models containing this substring")
+    parser.add_argument("--all", action="store_true", help="Entries of every stack fingerprint, not just this one")
+    parser.add_argument("--clear", action="store_true", help="Delete the matching entries")
+    args = parser.parse_args()
+
+    if args.clear:
+        log(f"Cleared {clear(args.model)} entries from {DB_FILE}")
+        return
+    fp = kernel_cache.fingerprint()
+    print(f"\n{'TOOL':<8} | {'MODEL':<40} | {'TP':<2} | {'Util':<4} | {'Seqs':<4} | {'Backend':<7} | {'KV':<4} | Failure")
+    print("-" * 120)
+    for key, entry in sorted(load().items()):
+        tool, model, tp, util, seqs, backend, kv, key_fp = key.split("|")
+        if (args.model and args.model not in model) or (key_fp != fp and not args.all):
+            continue
+        print(f"{tool:<8} | {model[-40:]:<40} | {tp:<2} | {util:<4} | {seqs:<4} | {backend:<7} | {kv:<4} | {describe(entry)}")
+    print("-" * 120)
+    print(f"Stack fingerprint {fp} | {DB_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,6 @@ import requests
 import re
 import argparse
 from pathlib import Path
-try:
-    from transformers import AutoConfig
-except ImportError:
-    print("Error: 'transformers' not found. Please install it or run in vLLM environment.")
-    sys.exit(1)
 
 # Import configuration from average benchmark script
 try:
@@ -22,19 +17,27 @@ except ImportError:
     print("Error: Could not import run_vllm_bench.py. Make sure it is in the same directory.")
     sys.exit(1)
 
+import failure_db
+import hf_cache
+import prepull_models
+import vllm_metrics
+
 # =========================
 # 🧠 GROUNDING & METHODOLOGY
 # =========================
 # This script finds the Maximum Working Context (MWC) for vLLM models.
 #
 # Methodology:
-# 1. **Inspect**: Use `transformers.AutoConfig` to determine the model's theoretical limit 
-#    (e.g., `max_position_embeddings`). 
+# 1. **Inspect**: Read the model's theoretical limit (e.g., `max_position_embeddings`)
+#    from config.json in the local HF cache (hf_cache.model_facts, memoized). 
 # 2. **Probe**: Launch `vllm serve` at this limit.
 # 3. **React**: 
 #    - If stable ("Application startup complete"): Success.
 #    - If OOM ("KV cache capacity... is X"): Retry with vLLM's suggested X.
 #    - If Config Error ("max_model_len... is Y"): Retry with vLLM's suggested Y.
+# 4. **Remember**: Failures go to the failure database (failure_db.py). Later sweeps
+#    skip fatal configs and start below known-failing lengths. Failed rows in the
+#    results file count as done (--retry-failed: probe them again, ignore the database).
 
 # =========================
 # ⚙️ CONFIG
@@ -42,6 +45,7 @@ except ImportError:
 HOST = "127.0.0.1"
 PORT = 8000
 RESULTS_FILE = Path("max_context_results.json")
+METRICS_DIR = Path("max_context_metrics") # /metrics time series of each verification request
 REPORT_FILE = Path("max_context_report.md")
 
 # We test these GPU Utilizations steps to see how much we can squeeze
@@ -54,33 +58,14 @@ CONCURRENCY_STEPS = [1, 4, 8, 16]
 def log(msg):    print(f"[MAX-CTX] {msg}", flush=True)
 
 def get_hf_context_limit(model_name, trust_remote=False):
-    try:
-        cfg = AutoConfig.from_pretrained(model_name, trust_remote_code=trust_remote)
-
-        # Gemma 3 and similar multi-config models
-        if hasattr(cfg, "text_config"):
-            tc = cfg.text_config
-            if hasattr(tc, "max_position_embeddings"):
-                return int(tc.max_position_embeddings)
-
-        # Standard HF attributes
-        for attr in (
-            "max_position_embeddings",
-            "seq_length",
-            "max_seq_len",
-            "n_positions",
-        ):
-            val = getattr(cfg, attr, None)
-            if val is not None:
-                return int(val)
-
-        return 8192
-
-    except Exception as e:
-        log(f"Warning: Could not read config for {model_name}: {e}. Defaulting to 32768.")
+    # Memoized in hf_cache: probes of the same model reuse the first read
+    facts = hf_cache.model_facts(model_name, trust_remote)
+    if not facts:
+        log(f"Warning: Could not read config for {model_name}. Defaulting to 32768.")
         return 32768
+    return int(facts["context_limit"] or 8192)
 
-def get_vllm_server_cmd(model, tp_size, util, max_len, max_seqs):
+def get_vllm_server_cmd(model, tp_size, util, max_len, max_seqs, kv_cache_dtype="auto"):
     """
     Constructs the vLLM serve command.
     """
@@ -93,6 +78,7 @@ def get_vllm_server_cmd(model, tp_size, util, max_len, max_seqs):
         "--tensor-parallel-size", str(tp_size),
         "--max-num-seqs", str(max_seqs),
         "--dtype", "auto",
+        "--kv-cache-dtype", kv_cache_dtype,
         # "--disable-log-stats" # Cleaner output, but user managed without it
     ]
     
@@ -326,10 +312,18 @@ def verify_context(model, context_len):
             
     return False, "Unknown Error"
 
-def run_probe(model, tp, util, max_seqs, start_limit=None):
+def probe_key(model, tp, util, max_seqs, kv_cache_dtype="auto"):
+    # Probes run with vLLM's default attention backend
+    return failure_db.make_key("probe", model, tp, util, max_seqs, kv_cache_dtype=kv_cache_dtype)
+
+def run_probe(model, tp, util, max_seqs, start_limit=None, kv_cache_dtype="auto"):
     """
     Probes a specific configuration starting from the model's architectural limit.
+    Each OOM/crash the ladder backs off from is recorded in the failure database
+    at its length, so the next search starts below it. So is the failure that
+    ends the ladder. Capacity hints that only correct the target are not.
     """
+    key = probe_key(model, tp, util, max_seqs, kv_cache_dtype)
     trust_remote = MODEL_TABLE[model].get("trust_remote", False)
     # 1. Get the Advertised Limit (The "Smart" Way)
     arch_limit = get_hf_context_limit(model, trust_remote)
@@ -345,6 +339,7 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
         "tp": tp,
         "util": util,
         "max_seqs": max_seqs,
+        "kv_cache_dtype": kv_cache_dtype,
         "model_limit": arch_limit,
         "configured_len": 0,
         "real_capacity": 0,
@@ -352,13 +347,14 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
         "error": ""
     }
 
-    log(f"Probing {model} | TP={tp} | Util={util} | Seqs={max_seqs} | Model Limit={arch_limit}")
+    log(f"Probing {model} | TP={tp} | Util={util} | Seqs={max_seqs} | KV={kv_cache_dtype} | Model Limit={arch_limit}")
+    failed_len, category = target_len, None
     
     # We loop until we succeed OR we drop below a useful context size.
     while target_len >= 2048:
         force_cleanup()
         
-        cmd, env = get_vllm_server_cmd(model, tp, util, target_len, max_seqs)
+        cmd, env = get_vllm_server_cmd(model, tp, util, target_len, max_seqs, kv_cache_dtype)
         log(f"DEBUG: Cmd: {' '.join(cmd)}")
         
         proc = None
@@ -373,7 +369,12 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
                 
                 # Verify with actual request
                 log(f"  -> Server ready. Verifying stability with approx {int(workable_len * 0.5)} tokens...")
-                v_ok, v_msg = verify_context(model, workable_len)
+                with vllm_metrics.MetricsScraper(f"http://{HOST}:{PORT}") as scraper:
+                    v_ok, v_msg = verify_context(model, workable_len)
+                METRICS_DIR.mkdir(exist_ok=True)
+                result_data["verify_metrics"] = scraper.save(
+                    METRICS_DIR / f"{model.replace('/', '_')}_tp{tp}_util{util}_seqs{max_seqs}_{kv_cache_dtype}_len{target_len}_metrics.json")
+                log(f"  -> Verification /metrics: {vllm_metrics.describe(result_data['verify_metrics'])}")
                 
                 if v_ok:
                     log(f"  -> Success! capacity={total_capacity}, configured={workable_len}")
@@ -388,6 +389,7 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
                     result_data["configured_len"] = target_len
                     result_data["real_capacity"] = total_capacity
                     result_data["max_context_1_user"] = workable_len
+                    failure_db.success(key, target_len)
                     
                     return result_data
                 else:
@@ -413,6 +415,7 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
             log(f"  -> Attempt failed at {target_len}")
             if fail_msg: log(f"     Reason: {fail_msg}")
             result_data["error"] = fail_msg if fail_msg else "Process died or timed out"
+            failed_len = target_len
                 
             if fail_msg:
                 # Case V: Verification Failed (Server up, but unstable inference)
@@ -473,12 +476,13 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
                     continue
 
             # Case D: Generic OOM/Crash
-            target_len = int(target_len * 0.8)
-            log(f"  -> Backing off to: {target_len}")
-                
-            if target_len < 2048:
+            if int(target_len * 0.8) < 2048:
                 log("  -> Give up (too small)")
+                category = "exhausted"
                 break
+            failure_db.record(key, result_data["error"], target_len)
+            target_len = int(target_len * 0.8)
+            log(f"  -> Backing off to: {target_len}")
         finally:
             if proc:
                 try: proc.terminate()
@@ -487,13 +491,20 @@ def run_probe(model, tp, util, max_seqs, start_limit=None):
                 except: pass
                 proc.wait() 
             force_cleanup()
-                
+
+    # The ladder ended without a success
+    if result_data["error"]:
+        failure_db.record(key, result_data["error"], failed_len, category=category)
     return result_data
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", type=str, help="Filter to run only this model (substring match)")
     parser.add_argument("--steps", type=int, default=-1, help="Number of models to run (default: all)")
+    parser.add_argument("--kv-cache-dtypes", nargs="+", choices=["auto", "fp8"],
+                        help="KV cache dtypes to probe (default: the model's configured kv_cache_dtype)")
+    parser.add_argument("--no-prepull", action="store_true", help="Skip downloading/verifying all models before probing")
+    parser.add_argument("--retry-failed", action="store_true", help="Ignore the failure database and failed rows in the results file (known-bad configs are probed again)")
     args = parser.parse_args()
 
     gpu_count = get_gpu_count()
@@ -508,44 +519,67 @@ def main():
         except Exception as e:
             log(f"Warning: Could not read existing results: {e}")
 
+    if not args.no_prepull:
+        # A download inside `vllm serve` eats into the startup timeout
+        prepull_models.prepull([m for m in MODELS_TO_RUN if not args.model or args.model in m])
+
     count = 0
+    # Warms the next model's shards in page cache while the current one is probed
+    prefetcher = hf_cache.Prefetcher([m for m in MODELS_TO_RUN if not args.model or args.model in m])
     for model in MODELS_TO_RUN:
         if args.model and args.model not in model:
             continue
+        prefetcher.advance(model)
             
         config = MODEL_TABLE[model]
         valid_tps = [t for t in config["valid_tp"] if t <= gpu_count]
         
-        for tp in valid_tps:
+        # KV cache dtype is a sweep dimension: each dtype gets its own probe ladder
+        kv_cache_dtypes = args.kv_cache_dtypes or [config.get("kv_cache_dtype", "auto")]
+        for kv_cache_dtype, tp in [(kv, tp) for kv in kv_cache_dtypes for tp in valid_tps]:
             # Track successful seqs for this TP to skip lower utils
             # effectively: {seqs_count: max_working_util}
             # Since we iterate high-util -> low-util, if we succeeded already for this 'seqs', we skip.
             successful_seqs = set() 
             
-            # Reset smart limit for each TP (TP2 should not inherit TP1's limit)
+            # Reset smart limit for each TP (TP2 should not inherit TP1's limit, auto not fp8's)
             last_working_len = None 
             
             for util in GPU_UTIL_STEPS:
                 
                 for seqs in CONCURRENCY_STEPS:
                     if seqs in successful_seqs:
-                        log(f"Skipping {model} (TP={tp}, Util={util}, Seqs={seqs}) - Already succeeded at higher util.")
+                        log(f"Skipping {model} (TP={tp}, Util={util}, Seqs={seqs}, KV={kv_cache_dtype}) - Already succeeded at higher util.")
                         continue
 
-                    # Check if we already have this result
-                    existing_res = next((r for r in results 
-                                         if r["model"] == model 
-                                         and r["tp"] == tp 
-                                         and str(r["util"]) == str(util) 
-                                         and r["max_seqs"] == seqs), None)
+                    # Known failures on this stack: skip fatal ones, start below the failing length otherwise
+                    known = None if args.retry_failed else failure_db.lookup(probe_key(model, tp, util, seqs, kv_cache_dtype))
+                    if failure_db.should_skip(known):
+                        log(f"Skipping {model} (TP={tp}, Util={util}, Seqs={seqs}, KV={kv_cache_dtype}) - Known failure: {failure_db.describe(known)} (use --retry-failed)")
+                        break # Higher concurrency would fail too
+
+                    # Check if we already have this result (rows without kv_cache_dtype
+                    # predate the sweep and count as the configured dtype). Failed rows
+                    # are only probed again with --retry-failed.
+                    same_config = lambda r: (r["model"] == model
+                                             and r["tp"] == tp
+                                             and str(r["util"]) == str(util)
+                                             and r["max_seqs"] == seqs
+                                             and r.get("kv_cache_dtype", config.get("kv_cache_dtype", "auto")) == kv_cache_dtype)
+                    existing_res = next((r for r in results
+                                         if same_config(r) and (r["status"] == "success" or not args.retry_failed)), None)
                     
                     if existing_res:
                         res = existing_res
-                        log(f"Skipping {model} (TP={tp}, Util={util}, Seqs={seqs}) - Found in results.")
+                        log(f"Skipping {model} (TP={tp}, Util={util}, Seqs={seqs}, KV={kv_cache_dtype}) - Found in results.")
                     else:
+                        start_limit = last_working_len
+                        cap = failure_db.length_cap(known)
+                        if cap:
+                            start_limit = min(start_limit or cap, known.get("max_working_len") or int(cap * 0.8))
                         # New run
-                        res = run_probe(model, tp, util, seqs, start_limit=last_working_len)
-                        results.append(res)
+                        res = run_probe(model, tp, util, seqs, start_limit=start_limit, kv_cache_dtype=kv_cache_dtype)
+                        results = [r for r in results if not same_config(r)] + [res]
                         
                         # Save immediately
                         with open(RESULTS_FILE, "w") as f:
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Single-pass AMD GPU inventory from the KFD topology and PCI sysfs.
+
+Reads /sys/class/kfd/kfd/topology/nodes once per process (no rocm-smi) and
+returns, per GPU, its HIP device index, gfx target, VRAM, PCIe address and
+link, and NUMA node. The launcher and every benchmark count GPUs through
+gpu_count() so they all agree. best_group() picks the TP group with the best
+NUMA/PCIe locality and group_placement() the CPUs to pin its server to.
+
+HIP enumerates GPUs in KFD node order, so `index` is what HIP_VISIBLE_DEVICES
+expects. Every path is taken relative to `root`, so a fake tree works the same:
+
+    <root>/sys/class/kfd/kfd/topology/nodes/1/properties      (simd_count > 0 = GPU)
+    <root>/sys/class/kfd/kfd/topology/nodes/1/mem_banks/0/properties
+    <root>/sys/class/drm/renderD128/device -> PCI device dir   (drm_render_minor)
+    <root>/sys/bus/pci/devices/0000:03:00.0/{numa_node,current_link_width,...}
+    <root>/sys/devices/system/node/node0/cpulist
+
+    python gpu_inventory.py                 # table of detected GPUs
+    python gpu_inventory.py --json --root /tmp/fake_sysfs
+"""
+import argparse
+import itertools
+import json
+from functools import lru_cache
+from pathlib import Path
+
+TARGET_GFX = "gfx1201" # R9700
+KFD_NODES = "sys/class/kfd/kfd/topology/nodes"
+FB_HEAP_TYPES = (1, 2) # Frame buffer public / private
+
+def log(msg): print(f"[GPU] {msg}", flush=True)
+
+def read(path, default=None):
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return default
+
+def read_properties(path):
+    """KFD `properties` file ("key value" per line) as {key: int}."""
+    props = {}
+    for line in (read(path) or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                props[parts[0]] = int(parts[1])
+            except ValueError:
+                pass
+    return props
+
+def gfx_name(target_version):
+    """120001 -> gfx1201, 90010 -> gfx90a (major * 10000 + minor * 100 + stepping)."""
+    major, minor, step = target_version // 10000, (target_version // 100) % 100, target_version % 100
+    return f"gfx{major}{minor:x}{step:x}"
+
+def parse_cpulist(text):
+    """'0-7,16-23' -> [0, ..., 7, 16, ..., 23]"""
+    cpus = []
+    for part in (text or "").split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        elif part.strip():
+            cpus.append(int(part))
+    return cpus
+
+def pci_dir(root, props):
+    """PCI device directory via the DRM render node, else from the KFD location_id."""
+    minor = props.get("drm_render_minor")
+    if minor is not None:
+        device = Path(root) / "sys/class/drm" / f"renderD{minor}" / "device"
+        if device.exists():
+            return device.resolve()
+    loc = props.get("location_id")
+    if loc is None:
+        return None
+    bdf = f"{props.get('domain', 0):04x}:{loc >> 8:02x}:{(loc >> 3) & 0x1f:02x}.{loc & 7}"
+    return (Path(root) / "sys/bus/pci/devices" / bdf).resolve()
+
+@lru_cache(maxsize=None)
+def gpus(root="/"):
+    """All KFD GPU nodes in HIP enumeration order, as a tuple of dicts (cached per root)."""
+    nodes_dir = Path(root) / KFD_NODES
+    if not nodes_dir.is_dir():
+        return ()
+    node_ids = sorted(int(p.name) for p in nodes_dir.iterdir() if p.name.isdigit())
+
+    found = []
+    for node in node_ids:
+        node_dir = nodes_dir / str(node)
+        props = read_properties(node_dir / "properties")
+        if not props.get("simd_count"):
+            continue # CPU node
+
+        vram = 0
+        for bank in sorted((node_dir / "mem_banks").glob("*")):
+            bank_props = read_properties(bank / "properties")
+            if bank_props.get("heap_type") in FB_HEAP_TYPES:
+                vram += bank_props.get("size_in_bytes", 0)
+
+        pci = pci_dir(root, props)
+        numa = read(pci / "numa_node") if pci else None
+        if pci and read(pci / "mem_info_vram_total"):
+            vram = int(read(pci / "mem_info_vram_total"))
+        found.append({
+            "index": len(found),
+            "node": node,
+            "gfx": gfx_name(props.get("gfx_target_version", 0)),
+            "name": read(pci / "product_name") if pci else None,
+            "vram_bytes": vram,
+            "pci": pci.name if pci else None,
+            "pci_path": str(pci) if pci else None,
+            "link_speed": read(pci / "current_link_speed") if pci else None,
+            "link_width": int(read(pci / "current_link_width", "0") or 0) if pci else None,
+            "numa_node": int(numa) if numa not in (None, "") and int(numa) >= 0 else None,
+            "cpus": parse_cpulist(read(pci / "local_cpulist")) if pci else [],
+            "render_minor": props.get("drm_render_minor"),
+        })
+    return tuple(found)
+
+def target_gpus(gfx=TARGET_GFX, root="/"):
+    """GPUs of the toolbox's target architecture."""
+    return [g for g in gpus(root) if g["gfx"] == gfx]
+
+def gpu_count(gfx=TARGET_GFX, root="/"):
+    """
+    Number of usable GPUs: the target-arch GPUs, else any KFD GPU, else 1.
+    Every tool uses this, so TP choices agree across the launcher and benchmarks.
+    """
+    return len(target_gpus(gfx, root)) or len(gpus(root)) or 1
+
+def visible_devices(gfx=TARGET_GFX, root="/"):
+    """HIP_VISIBLE_DEVICES value selecting the target-arch GPUs, None if there are none."""
+    indices = [str(g["index"]) for g in target_gpus(gfx, root)]
+    return ",".join(indices) if indices else None
+
+def busy_percent(root="/"):
+    """{index: gpu_busy_percent} for the target GPUs (any GPU if none), skipping unreadable ones."""
+    readings = {}
+    for g in target_gpus(root=root) or gpus(root):
+        value = read(Path(g["pci_path"]) / "gpu_busy_percent") if g.get("pci_path") else None
+        if value and value.isdigit():
+            readings[g["index"]] = int(value)
+    return readings
+
+def pcie_hops(a, b):
+    """
+    Bridges between two GPUs in the PCI tree (resolved sysfs paths): 2 under one
+    switch port pair, more through the root complex, most across sockets.
+    None if either path is unknown.
+    """
+    if not a.get("pci_path") or not b.get("pci_path"):
+        return None
+    pa, pb = Path(a["pci_path"]).parts, Path(b["pci_path"]).parts
+    common = 0
+    while common < min(len(pa), len(pb)) and pa[common] == pb[common]:
+        common += 1
+    return (len(pa) - common) + (len(pb) - common)
+
+def numa_node_count(root="/"):
+    """NUMA nodes on the host (1 if sysfs does not say)."""
+    return len(list((Path(root) / "sys/devices/system/node").glob("node[0-9]*"))) or 1
+
+def node_cpus(numa_node, root="/"):
+    """CPUs of a NUMA node from /sys/devices/system/node, [] if unknown."""
+    if numa_node is None:
+        return []
+    return parse_cpulist(read(Path(root) / "sys/devices/system/node" / f"node{numa_node}" / "cpulist"))
+
+def best_group(size, indices=None, root="/"):
+    """
+    The `size` GPUs (HIP indices, from `indices` or all target GPUs) that sit
+    closest together: fewest NUMA nodes first, then fewest PCIe hops between
+    them, then the widest slowest link. None if there are not enough GPUs.
+    """
+    pool = [g for g in gpus(root) if indices is None or g["index"] in indices]
+    if indices is None:
+        pool = [g for g in pool if g["gfx"] == TARGET_GFX] or pool
+    if len(pool) < size:
+        return None
+
+    def cost(group):
+        nodes = {g["numa_node"] for g in group}
+        hops = sum(pcie_hops(a, b) or 0 for a, b in itertools.combinations(group, 2))
+        width = min(g["link_width"] or 0 for g in group)
+        return (len(nodes), hops, -width, [g["index"] for g in group])
+
+    return [g["index"] for g in min(itertools.combinations(pool, size), key=cost)]
+
+def group_placement(indices, root="/"):
+    """
+    (numa_node, cpus) local to a set of GPUs, or (None, []) when they span
+    several nodes or the host does not report NUMA locality.
+    """
+    group = [g for g in gpus(root) if g["index"] in indices]
+    nodes = {g["numa_node"] for g in group}
+    if len(nodes) != 1 or None in nodes:
+        return None, []
+    node = nodes.pop()
+    return node, node_cpus(node, root) or group[0]["cpus"]
+
+def main():
+    parser = argparse.ArgumentParser(description="List AMD GPUs from the KFD topology")
+    parser.add_argument("--root", type=str, default="/", help="Filesystem root (for a fake sysfs tree)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    found = gpus(args.root)
+    if args.json:
+        print(json.dumps(list(found), indent=2))
+        return
+    if not found:
+        log(f"No KFD GPU nodes under {Path(args.root) / KFD_NODES}")
+        return
+    print(f"{'HIP':<3} | {'Node':<4} | {'gfx':<8} | {'VRAM':<9} | {'PCI':<12} | {'Link':<20} | {'NUMA':<4} | Name")
+    print("-" * 90)
+    for g in found:
+        link = f"x{g['link_width']} {g['link_speed'] or ''}".strip() if g["link_width"] else "-"
+        numa = g["numa_node"] if g["numa_node"] is not None else "-"
+        print(f"{g['index']:<3} | {g['node']:<4} | {g['gfx']:<8} | {g['vram_bytes'] / 1024**3:>5.1f} GiB | {g['pci'] or '-':<12} | "
+              f"{link:<20} | {numa:<4} | {g['name'] or '-'}")
+    log(f"{gpu_count(root=args.root)} usable GPU(s), HIP_VISIBLE_DEVICES={visible_devices(root=args.root) or '(unset)'}")
+    for size in range(2, len(target_gpus(root=args.root)) + 1):
+        group = best_group(size, root=args.root)
+        node, _ = group_placement(group, root=args.root)
+        log(f"TP={size} group: {','.join(map(str, group))} (NUMA node {node if node is not None else 'mixed'})")
+
+if __name__ == "__main__":
+    main()
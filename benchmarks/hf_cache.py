@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Hugging Face cache helpers shared by the launcher and benchmark scripts.
+
+Resolves a model id to its local snapshot without touching the network and
+stages checkpoint shards in the page cache, so a later `vllm serve` reads its
+weights from RAM instead of disk.
+
+model_facts() reads config.json and the safetensors headers from the same
+snapshot (memoized per process, no transformers import) for the context limit,
+layer/head geometry and parameter counts. transformers is only imported for
+models that are not downloaded.
+
+    python hf_cache.py meta-llama/Meta-Llama-3.1-8B-Instruct        # readahead one model
+    python hf_cache.py --status Qwen/Qwen3.5-9B                      # show snapshot + sizes
+    python hf_cache.py --facts Qwen/Qwen3.5-9B                       # context limit, geometry, params
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+READ_CHUNK = 16 * 1024 ** 2   # Large sequential reads keep the disk streaming
+MEM_RESERVE = 4 * 1024 ** 3   # Never stage into the last 4 GiB of MemAvailable
+WEIGHT_PATTERNS = ["*.safetensors", "*.bin", "*.pt"]
+PREFETCH_DELAY = 60           # Let the current run finish its own weight load before competing for the disk
+
+# Config keys, first present wins (names differ across architectures)
+CONTEXT_KEYS = ["max_position_embeddings", "seq_length", "max_seq_len", "n_positions"]
+LAYER_KEYS = ["num_hidden_layers", "n_layer", "num_layers"]
+HEAD_KEYS = ["num_attention_heads", "n_head"]
+KV_HEAD_KEYS = ["num_key_value_heads", "multi_query_group_num"]
+EXPERT_KEYS = ["num_local_experts", "num_experts", "n_routed_experts"]
+EXPERTS_PER_TOKEN_KEYS = ["num_experts_per_tok", "moe_topk", "top_k"]
+# Quantization side tensors (zero points, scales, act-order indices) are not parameters
+QUANT_AUX_SUFFIXES = ("qzeros", "scales", "g_idx", "weight_scale", "weight_zero_point", "input_scale", "weight_shape")
+
+def log(msg): print(f"[HF-CACHE] {msg}", flush=True)
+
+def hub_dir():
+    """Same precedence as huggingface_hub: HF_HUB_CACHE > HF_HOME/hub > ~/.cache/huggingface/hub."""
+    if os.getenv("HF_HUB_CACHE"):
+        return Path(os.environ["HF_HUB_CACHE"]).expanduser()
+    if os.getenv("HF_HOME"):
+        return Path(os.environ["HF_HOME"]).expanduser() / "hub"
+    return Path.home() / ".cache" / "huggingface" / "hub"
+
+def snapshot_dir(model_id, revision="main"):
+    """Local snapshot directory for `model_id`, or None if it was never downloaded."""
+    repo = hub_dir() / f"models--{model_id.replace('/', '--')}"
+    ref = repo / "refs" / revision
+    if ref.exists():
+        snap = repo / "snapshots" / ref.read_text().strip()
+        if snap.is_dir():
+            return snap
+    # No ref (e.g. pinned commit download): newest snapshot wins
+    snaps = sorted((repo / "snapshots").glob("*"), key=lambda p: p.stat().st_mtime, reverse=True) if (repo / "snapshots").is_dir() else []
+    return snaps[0] if snaps else None
+
+def weight_files(model_id):
+    """Resolved checkpoint shard paths (blobs, not symlinks) of the local snapshot."""
+    snap = snapshot_dir(model_id)
+    if not snap:
+        return []
+    for pattern in WEIGHT_PATTERNS:
+        files = sorted(snap.glob(pattern))
+        if files:
+            # safetensors wins over .bin when a repo ships both
+            return [f.resolve() for f in files if f.resolve().is_file()]
+    return []
+
+@lru_cache(maxsize=None)
+def load_config(model_id, trust_remote=False):
+    """
+    config.json of `model_id` as a dict: straight from the local snapshot, else
+    via transformers.AutoConfig (may hit the hub). None if neither works.
+    """
+    snap = snapshot_dir(model_id)
+    if snap and (snap / "config.json").exists():
+        try:
+            return json.loads((snap / "config.json").read_text())
+        except (OSError, ValueError) as e:
+            log(f"Unreadable config.json for {model_id}: {e}")
+    try:
+        from transformers import AutoConfig # Slow import, only for models that are not downloaded
+        return AutoConfig.from_pretrained(model_id, trust_remote_code=trust_remote).to_dict()
+    except Exception as e:
+        log(f"Could not read config for {model_id}: {e}")
+        return None
+
+def first_key(cfg, keys):
+    return next((cfg[k] for k in keys if cfg.get(k) is not None), None)
+
+def safetensors_params(model_id, bits=None):
+    """
+    (total, expert) parameter counts from the shard headers (no tensor data is
+    read). With `bits` (AWQ/GPTQ quantization_config), packed int32 weights
+    count 32/bits parameters per element and quantization side tensors are
+    left out. (None, None) without local safetensors shards.
+    """
+    files = [f for f in weight_files(model_id) if f.suffix == ".safetensors"]
+    if not files:
+        return None, None
+    total = experts = 0
+    for path in files:
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+        except (OSError, ValueError) as e:
+            log(f"Unreadable safetensors header in {path.name}: {e}")
+            return None, None
+        for name, info in header.items():
+            if name == "__metadata__" or (bits and name.endswith(QUANT_AUX_SUFFIXES)):
+                continue
+            n = math.prod(info["shape"])
+            if bits and info["dtype"] == "I32":
+                n = n * 32 // bits
+            total += n
+            if ".experts." in name:
+                experts += n
+    return total, experts
+
+@lru_cache(maxsize=None)
+def model_facts(model_id, trust_remote=False):
+    """
+    Derived facts for `model_id`, memoized: context_limit, num_layers,
+    num_heads, num_kv_heads, head_dim, hidden_size, params, and for MoE models
+    num_experts, experts_per_token and active_params. Missing facts are None.
+    """
+    cfg = load_config(model_id, trust_remote)
+    if cfg is None:
+        return {}
+    # Multimodal wrappers (Gemma 3, Qwen-VL, ...) keep the LM under text_config
+    text = cfg.get("text_config") or cfg
+    facts = {
+        "context_limit": first_key(text, CONTEXT_KEYS) or first_key(cfg, CONTEXT_KEYS),
+        "num_layers": first_key(text, LAYER_KEYS),
+        "num_heads": first_key(text, HEAD_KEYS),
+        "hidden_size": text.get("hidden_size"),
+        "vocab_size": text.get("vocab_size"),
+    }
+    facts["num_kv_heads"] = first_key(text, KV_HEAD_KEYS) or facts["num_heads"]
+    facts["head_dim"] = text.get("head_dim") or (
+        facts["hidden_size"] // facts["num_heads"] if facts["hidden_size"] and facts["num_heads"] else None)
+
+    quant = cfg.get("quantization_config") or text.get("quantization_config") or {}
+    total, expert_params = safetensors_params(model_id, quant.get("bits"))
+    facts["params"] = total
+    num_experts = first_key(text, EXPERT_KEYS)
+    if num_experts:
+        facts["num_experts"] = num_experts
+        facts["experts_per_token"] = first_key(text, EXPERTS_PER_TOKEN_KEYS)
+        if total and facts["experts_per_token"]:
+            # Only k of the E routed experts run per token
+            facts["active_params"] = int(total - expert_params * (1 - facts["experts_per_token"] / num_experts))
+    return facts
+
+def mem_available():
+    """MemAvailable from /proc/meminfo in bytes (0 if unknown)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def readahead(paths, budget=None, stop_event=None):
+    """
+    Reads `paths` sequentially into the page cache. Stops at `budget` bytes
+    (default: MemAvailable minus MEM_RESERVE) or when `stop_event` is set.
+    Returns the number of bytes staged.
+    """
+    if budget is None:
+        budget = max(0, mem_available() - MEM_RESERVE)
+    buf = bytearray(READ_CHUNK)
+    staged = 0
+    for path in paths:
+        try:
+            size = path.stat().st_size
+        except OSError:
+            continue
+        if staged + size > budget:
+            log(f"Stopping before {path.name}: RAM budget reached ({staged / 1024**3:.1f} GiB staged)")
+            break
+        with open(path, "rb", buffering=0) as f:
+            fd = f.fileno()
+            if hasattr(os, "posix_fadvise"):
+                # Double the kernel readahead window and queue the whole file
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            while f.readinto(buf):
+                if stop_event is not None and stop_event.is_set():
+                    return staged
+            staged += size
+    return staged
+
+def stage_model(model_id, budget=None, stop_event=None, lock=False):
+    """
+    Stages a model's shards in the page cache. With lock=True and `vmtouch`
+    installed, the pages are also locked (vmtouch -l) so they survive memory
+    pressure; the returned Popen must be terminated to release them.
+    Returns (bytes_staged, lock_process_or_None).
+    """
+    files = weight_files(model_id)
+    if not files:
+        log(f"{model_id} is not in {hub_dir()}. Nothing to stage.")
+        return 0, None
+    total = sum(f.stat().st_size for f in files)
+    start = time.time()
+    staged = readahead(files, budget, stop_event)
+    elapsed = time.time() - start
+    log(f"Staged {staged / 1024**3:.1f}/{total / 1024**3:.1f} GiB of {model_id} in {elapsed:.1f}s"
+        + (f" ({staged / 1024**2 / elapsed:.0f} MiB/s)" if elapsed > 0 else ""))
+
+    locker = None
+    if lock and staged == total and shutil.which("vmtouch"):
+        locker = subprocess.Popen(["vmtouch", "-l", "-q"] + [str(f) for f in files],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return staged, locker
+
+class Prefetcher:
+    """
+    Background page-cache warmer for benchmark queues. Call advance(model)
+    when a run starts: staging of the previous model stops and the next
+    different model in `queue` is staged in a daemon thread after `delay`
+    seconds, bounded by MemAvailable at that point.
+    """
+    def __init__(self, queue, delay=PREFETCH_DELAY):
+        self.queue = list(queue)
+        self.delay = delay
+        self.pos = 0
+        self.stop_event = None
+
+    def advance(self, model_id):
+        self.stop()
+        if model_id in self.queue[self.pos:]:
+            self.pos = self.queue.index(model_id, self.pos)
+        upcoming = next((m for m in self.queue[self.pos:] if m != model_id), None)
+        if upcoming is None or not weight_files(upcoming):
+            return
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._run, args=(upcoming, self.stop_event), daemon=True).start()
+
+    def _run(self, model_id, stop_event):
+        if stop_event.wait(self.delay):
+            return
+        log(f"Prefetching next model {model_id}...")
+        stage_model(model_id, stop_event=stop_event)
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.stop_event = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage Hugging Face checkpoints in the page cache")
+    parser.add_argument("models", nargs="+", help="Model ids (org/name)")
+    parser.add_argument("--status", action="store_true", help="Only show snapshot and shard sizes")
+    parser.add_argument("--facts", action="store_true", help="Only show config-derived facts (context, geometry, params)")
+    args = parser.parse_args()
+
+    for model_id in args.models:
+        if args.facts:
+            log(f"{model_id}: {json.dumps(model_facts(model_id))}")
+            continue
+        files = weight_files(model_id)
+        if args.status or not files:
+            size = sum(f.stat().st_size for f in files)
+            log(f"{model_id}: {snapshot_dir(model_id) or 'not cached'} ({len(files)} shards, {size / 1024**3:.1f} GiB)")
+            continue
+        stage_model(model_id)
+    log(f"MemAvailable: {mem_available() / 1024**3:.1f} GiB")
+
+if __name__ == "__main__":
+    main()
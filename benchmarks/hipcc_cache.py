@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+hipcc front end installed by start-vllm (fix_multi_gpu_jit): rewrites
+--offload-arch=native to gfx1201 and serves repeat compiles from a
+content-addressed cache, like ccache.
+
+A single-source `-c` compile is keyed by the sha256 of the preprocessed
+source (`hipcc -E`), the argument list, the compiler's `--version` and the
+HIPCC_* environment. Hits copy the stored object (and depfile, and replay the
+stored stderr) instead of compiling. Everything else (links, -E, response
+files, anything we cannot parse) is passed straight to the real compiler.
+
+The cache lives outside the directories nuke_vllm_cache() wipes, so AITER and
+extension JIT builds after "Erase vLLM Cache" are cache hits:
+
+    HIPCC_CACHE_DIR       cache directory            (~/.cache/hipcc)
+    HIPCC_CACHE_MAX_GB    size bound, oldest evicted (5)
+    HIPCC_CACHE_VERBOSE=1 log every hit/miss to stderr
+    HIPCC_REAL            real compiler              (/opt/rocm/bin/hipcc.real)
+
+    python hipcc_cache.py --cache-stats
+    python hipcc_cache.py --cache-clear
+    HIPCC_REAL=./fake_cc.sh python hipcc_cache.py -c a.cpp -o a.o   # with a fake compiler
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REAL_HIPCC = os.getenv("HIPCC_REAL", "/opt/rocm/bin/hipcc.real")
+TARGET_ARCH = os.getenv("HIPCC_OFFLOAD_ARCH", "gfx1201")
+CACHE_DIR = Path(os.getenv("HIPCC_CACHE_DIR", "~/.cache/hipcc")).expanduser()
+MAX_BYTES = int(float(os.getenv("HIPCC_CACHE_MAX_GB", "5")) * 1024**3)
+VERBOSE = os.getenv("HIPCC_CACHE_VERBOSE", "0") == "1"
+
+SOURCE_EXTS = {".c", ".cc", ".cpp", ".cxx", ".cu", ".hip"}
+# Options whose value is the next argument
+ARG_OPTS = {"-o", "-I", "-D", "-U", "-include", "-isystem", "-iquote", "-x", "-MF", "-MT", "-MQ",
+            "-Xclang", "-Xlinker", "-Xarch_device", "-Xarch_host", "-mllvm", "-L", "-l"}
+# Options that make the compile uncacheable (no single object output)
+UNCACHEABLE = {"-E", "-M", "-MM", "-S", "-save-temps", "--genco", "-fsyntax-only"}
+# Preprocessing drops these (with their value, if any)
+DEP_OPTS = {"-MD", "-MMD", "-MP"}
+# Environment the compile depends on besides its arguments
+ENV_KEYS = ("HIPCC_COMPILE_FLAGS_APPEND", "HIPCC_LINK_FLAGS_APPEND", "HIP_CLANG_PATH", "HIP_PLATFORM",
+            "ROCM_PATH", "HIP_PATH")
+
+def log(msg):
+    if VERBOSE:
+        print(f"[HIPCC-CACHE] {msg}", file=sys.stderr, flush=True)
+
+def rewrite_args(args):
+    """--offload-arch=native -> --offload-arch=gfx1201 (see fix_multi_gpu_jit)."""
+    return [a.replace("--offload-arch=native", f"--offload-arch={TARGET_ARCH}") for a in args]
+
+def parse_compile(args):
+    """
+    (sources, output, depfile) for a cacheable single-source compile, None
+    otherwise. The depfile is the -MD/-MMD output (-MF, else <output>.d).
+    """
+    if "-c" not in args:
+        return None
+    sources, output, depfile, deps = [], None, None, False
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in UNCACHEABLE or a.startswith("@"):
+            return None
+        if a in ARG_OPTS:
+            if i + 1 >= len(args):
+                return None
+            if a == "-o":
+                output = args[i + 1]
+            elif a == "-MF":
+                depfile = args[i + 1]
+            i += 2
+            continue
+        if a.startswith("-o") and len(a) > 2:
+            output = a[2:]
+        elif a.startswith("-MF") and len(a) > 3:
+            depfile = a[3:]
+        elif a in DEP_OPTS:
+            deps = True
+        elif not a.startswith("-") and Path(a).suffix in SOURCE_EXTS:
+            sources.append(a)
+        i += 1
+    if len(sources) != 1 or not output or output == "-":
+        return None
+    if deps and not depfile:
+        depfile = str(Path(output).with_suffix(".d"))
+    return sources, output, depfile if deps else None
+
+def preprocess_args(args):
+    """`args` minus output/dependency options, plus -E (preprocessed source to stdout)."""
+    out = []
+    skip = False
+    for a in args:
+        if skip:
+            skip = False
+            continue
+        if a in ("-o", "-MF", "-MT", "-MQ"):
+            skip = True
+            continue
+        if a == "-c" or a in DEP_OPTS or (a.startswith("-o") and len(a) > 2) or (a[:3] in ("-MF", "-MT", "-MQ") and len(a) > 3):
+            continue
+        out.append(a)
+    return out + ["-E"]
+
+def compiler_version():
+    """`hipcc --version`, remembered per compiler binary (size, mtime) to save a process per compile."""
+    st = os.stat(REAL_HIPCC)
+    stamp = CACHE_DIR / f"compiler-{hashlib.sha256(f'{REAL_HIPCC}:{st.st_size}:{st.st_mtime_ns}'.encode()).hexdigest()[:16]}.txt"
+    if stamp.exists():
+        return stamp.read_text()
+    version = subprocess.run([REAL_HIPCC, "--version"], capture_output=True, text=True, errors="replace").stdout
+    write_atomic(stamp, version.encode())
+    return version
+
+def cache_key(args):
+    """sha256 over compiler version, environment, arguments and preprocessed source; None if -E fails."""
+    pre = subprocess.run([REAL_HIPCC] + preprocess_args(args), capture_output=True)
+    if pre.returncode != 0:
+        return None
+    h = hashlib.sha256()
+    h.update(compiler_version().encode())
+    for key in ENV_KEYS:
+        h.update(f"{key}={os.environ.get(key, '')}\0".encode())
+    for a in args:
+        h.update(a.encode() + b"\0")
+    h.update(pre.stdout)
+    return h.hexdigest()
+
+def entry_dir(key):
+    return CACHE_DIR / key[:2] / key
+
+def write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def bump_stats(outcome):
+    """Counts one compile as hit / miss / uncached / error in stats.json (flock-protected)."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_DIR / "stats.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = CACHE_DIR / "stats.json"
+            try:
+                stats = json.loads(path.read_text())
+            except (OSError, ValueError):
+                stats = {}
+            stats[outcome] = stats.get(outcome, 0) + 1
+            stats["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            write_atomic(path, json.dumps(stats, indent=2).encode())
+    except OSError:
+        pass # Stats are best effort, the compile is not
+
+def entries():
+    """[(mtime, bytes, dir)] for every cache entry."""
+    found = []
+    for sub in CACHE_DIR.glob("??"):
+        for entry in sub.iterdir():
+            try:
+                files = list(entry.iterdir())
+                found.append((entry.stat().st_mtime, sum(f.stat().st_size for f in files), entry))
+            except OSError:
+                pass
+    return found
+
+def evict():
+    """Drops least recently used entries until the cache is under 90% of MAX_BYTES."""
+    found = entries()
+    total = sum(size for _, size, _ in found)
+    if total <= MAX_BYTES:
+        return
+    for _, size, entry in sorted(found, key=lambda e: e[0]):
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        if total <= MAX_BYTES * 0.9:
+            break
+
+def restore(key, output, depfile):
+    """Copies a cached entry's outputs into place; False if the entry is missing or incomplete."""
+    entry = entry_dir(key)
+    obj = entry / "obj"
+    if not obj.exists() or (depfile and not (entry / "dep").exists()):
+        return False
+    try:
+        shutil.copyfile(obj, output)
+        if depfile:
+            shutil.copyfile(entry / "dep", depfile)
+        if (entry / "stderr").exists():
+            sys.stderr.write((entry / "stderr").read_text(errors="replace"))
+        os.utime(entry) # LRU order for evict()
+    except OSError:
+        return False # Evicted underneath us: compile instead
+    return True
+
+def store(key, output, depfile, stderr):
+    entry = entry_dir(key)
+    write_atomic(entry / "obj", Path(output).read_bytes())
+    if depfile and Path(depfile).exists():
+        write_atomic(entry / "dep", Path(depfile).read_bytes())
+    if stderr:
+        write_atomic(entry / "stderr", stderr)
+    evict()
+
+def compile_cached(args):
+    """Runs one hipcc invocation through the cache. Returns the exit code."""
+    parsed = parse_compile(args)
+    key = None
+    if parsed:
+        try:
+            key = cache_key(args)
+        except OSError as e:
+            log(f"cache unavailable: {e}")
+    if not key:
+        bump_stats("error" if parsed else "uncached")
+        return subprocess.run([REAL_HIPCC] + args).returncode
+
+    sources, output, depfile = parsed
+    if restore(key, output, depfile):
+        log(f"hit  {key[:12]} {sources[0]}")
+        bump_stats("hit")
+        return 0
+
+    result = subprocess.run([REAL_HIPCC] + args, stderr=subprocess.PIPE)
+    sys.stderr.buffer.write(result.stderr)
+    if result.returncode == 0 and Path(output).exists():
+        try:
+            store(key, output, depfile, result.stderr)
+        except OSError as e:
+            log(f"store failed: {e}")
+    log(f"miss {key[:12]} {sources[0]}")
+    bump_stats("miss")
+    return result.returncode
+
+def print_stats():
+    try:
+        stats = json.loads((CACHE_DIR / "stats.json").read_text())
+    except (OSError, ValueError):
+        stats = {}
+    found = entries() if CACHE_DIR.exists() else []
+    hits, misses = stats.get("hit", 0), stats.get("miss", 0)
+    print(f"Cache dir:   {CACHE_DIR}")
+    print(f"Entries:     {len(found)} ({sum(size for _, size, _ in found) / 1024**2:.1f} MiB of {MAX_BYTES / 1024**3:.1f} GiB)")
+    print(f"Hits:        {hits}")
+    print(f"Misses:      {misses}")
+    print(f"Uncached:    {stats.get('uncached', 0)} (links, -E, ...)")
+    print(f"Errors:      {stats.get('error', 0)} (preprocessing failed, compiled directly)")
+    if hits + misses:
+        print(f"Hit rate:    {hits / (hits + misses) * 100:.1f}%")
+
+def main():
+    args = sys.argv[1:]
+    if args == ["--cache-stats"]:
+        print_stats()
+        return 0
+    if args == ["--cache-clear"]:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"Cleared {CACHE_DIR}")
+        return 0
+    return compile_cached(rewrite_args(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Host-side CPU profiler for `vllm serve` during latency runs.
+
+At high QPS on small models the bottleneck is often the Python API server
+(tokenization, detokenization, SSE streaming) or the engine core's scheduler
+loop rather than the GPU. HostProfiler samples /proc every SAMPLE_INTERVAL
+seconds for every process in the server trees (API server, engine core,
+workers, vllm-proxy) and records per-process CPU and its busiest thread next to
+gpu_busy_percent. One Python thread can use one core under the GIL, so a
+thread pegged near 100% while the GPUs idle is the signature of a CPU-bound
+server:
+
+    CPU-bound (api server)    add API server processes (--api-server-count), not GPUs
+    CPU-bound (engine core)   scheduling overhead: fewer/larger batches, async scheduling
+    GPU-bound                 more or faster GPUs pay off
+
+With py-spy on PATH and --py-spy (ptrace allowed), stacks of the whole tree
+are recorded too and the hottest frames are reported with the verdict.
+
+    python host_profiler.py --duration 60                 # every running `vllm serve`
+    python host_profiler.py --pid 1234 --duration 60 --py-spy --out host.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+try:
+    import gpu_inventory
+except ImportError:
+    gpu_inventory = None # NVIDIA trees: CPU only
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+SAMPLE_INTERVAL = 1.0
+PEGGED_PCT = 85       # A thread at or above this % of one core counts as pegged
+PEGGED_SHARE = 0.5    # ... in at least this share of the samples -> CPU-bound
+GPU_BUSY_PCT = 70     # Mean gpu_busy_percent at or above this -> GPU-bound
+HOT_FRAMES = 15
+PYSPY_RATE = 50       # Samples per second
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+# (role, regex over the process command line), first match wins. V1 engine
+# processes rename themselves (setproctitle) to VLLM::EngineCore / VLLM::Worker_*.
+ROLES = [
+    ("proxy",       r"vllm[_-]proxy"),
+    ("engine core", r"EngineCore"),
+    ("worker",      r"VLLM::Worker|VllmWorker|Worker_TP"),
+    ("api server",  r"vllm serve|vllm\.entrypoints|APIServer|ApiServer"),
+]
+
+def log(msg): print(f"[HOSTPROF] {msg}", flush=True)
+
+def read_stat(path):
+    """(ppid, utime + stime ticks) from a /proc stat file, None if it is gone."""
+    try:
+        text = Path(path).read_text()
+    except OSError:
+        return None
+    fields = text.rsplit(")", 1)[1].split() # comm may contain spaces
+    return int(fields[1]), int(fields[11]) + int(fields[12])
+
+def argv(pid):
+    try:
+        return Path(f"/proc/{pid}/cmdline").read_bytes().decode(errors="replace").split("\0")
+    except OSError:
+        return []
+
+def cmdline(pid):
+    return " ".join(argv(pid)).strip()
+
+def role(pid):
+    cmd = cmdline(pid)
+    return next((name for name, pattern in ROLES if re.search(pattern, cmd)), "other")
+
+def process_tree(root_pids):
+    """`root_pids` and all their descendants."""
+    children = {}
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            stat = read_stat(entry / "stat")
+            if stat:
+                children.setdefault(stat[0], []).append(int(entry.name))
+    found, todo = [], list(root_pids)
+    while todo:
+        pid = todo.pop()
+        if pid not in found:
+            found.append(pid)
+            todo.extend(children.get(pid, []))
+    return found
+
+def is_server(args):
+    """`[python] .../vllm serve ...` or `python -m vllm.entrypoints...` (not a shell line mentioning it)."""
+    for i in range(min(2, len(args))):
+        if Path(args[i]).name == "vllm" and args[i + 1:i + 2] == ["serve"]:
+            return True
+        if args[i:i + 1] == ["-m"] and args[i + 1:i + 2] and args[i + 1].startswith("vllm.entrypoints"):
+            return True
+    return False
+
+def find_servers():
+    """PIDs of running `vllm serve` processes whose parent is not one too."""
+    servers = {}
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit() and is_server(argv(entry.name)):
+            stat = read_stat(entry / "stat")
+            if stat:
+                servers[int(entry.name)] = stat[0]
+    return [pid for pid, ppid in servers.items() if ppid not in servers]
+
+def cpu_ticks(pid):
+    """(process ticks, {tid: ticks}), None if the process is gone."""
+    total = read_stat(f"/proc/{pid}/stat")
+    if not total:
+        return None
+    threads = {}
+    try:
+        tids = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        tids = []
+    for tid in tids:
+        stat = read_stat(f"/proc/{pid}/task/{tid}/stat")
+        if stat:
+            threads[tid] = stat[1]
+    return total[1], threads
+
+def hot_frames(raw_path, limit=HOT_FRAMES):
+    """[(frame, share of samples)] by self time from a py-spy `--format raw` (collapsed stacks) file."""
+    counts = Counter()
+    try:
+        lines = Path(raw_path).read_text(errors="replace").splitlines()
+    except OSError:
+        return []
+    for line in lines:
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            counts[stack.split(";")[-1].strip()] += int(count)
+    total = sum(counts.values())
+    return [(frame, round(n / total, 3)) for frame, n in counts.most_common(limit)] if total else []
+
+class HostProfiler:
+    """
+    Samples the process trees of `root_pids` every `interval` seconds in a
+    daemon thread between start() and stop(), or inside a `with` block. With
+    `pyspy` (and py-spy installed) also records stacks to `pyspy_out`.
+    """
+    def __init__(self, root_pids, interval=SAMPLE_INTERVAL, pyspy=False, pyspy_out=None):
+        self.root_pids = [root_pids] if isinstance(root_pids, int) else list(root_pids)
+        self.interval = interval
+        self.pyspy = pyspy
+        self.pyspy_out = Path(pyspy_out) if pyspy_out else Path(f"/tmp/host_profile_{os.getpid()}.txt")
+        self.samples = []
+        self.frames = []
+        self.stop_event = None
+        self.spies = []
+
+    def _sample(self, previous, elapsed):
+        current, procs = {}, {}
+        for pid in process_tree(self.root_pids):
+            ticks = cpu_ticks(pid)
+            if not ticks:
+                continue
+            current[pid] = ticks
+            if pid not in previous:
+                continue # First sight: no interval to measure yet
+            total, threads = ticks
+            prev_total, prev_threads = previous[pid]
+            top = max((t - prev_threads.get(tid, t) for tid, t in threads.items()), default=0)
+            procs[pid] = {"role": role(pid),
+                          "cpu_pct": round((total - prev_total) / CLK_TCK / elapsed * 100, 1),
+                          "top_thread_pct": round(top / CLK_TCK / elapsed * 100, 1)}
+        return current, procs
+
+    def _run(self, stop_event):
+        previous, last = {}, time.time()
+        while True:
+            now = time.time()
+            previous, procs = self._sample(previous, max(now - last, 1e-3))
+            last = now
+            if procs:
+                busy = gpu_inventory.busy_percent() if gpu_inventory else {}
+                self.samples.append({"t": round(now - self.started, 2), "procs": procs,
+                                     "gpu_busy_pct": round(sum(busy.values()) / len(busy), 1) if busy else None})
+            if stop_event.wait(self.interval):
+                return
+
+    def start(self):
+        self.samples, self.frames = [], []
+        self.started = time.time()
+        if self.pyspy and shutil.which("py-spy"):
+            for i, pid in enumerate(self.root_pids):
+                out = self.pyspy_out.with_name(f"{self.pyspy_out.stem}.{i}{self.pyspy_out.suffix}") if i else self.pyspy_out
+                self.spies.append((out, subprocess.Popen(
+                    ["py-spy", "record", "--pid", str(pid), "--subprocesses", "--nonblocking", "--format", "raw",
+                     "--rate", str(PYSPY_RATE), "--output", str(out)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)))
+        elif self.pyspy:
+            log("py-spy not found, sampling CPU only.")
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.thread.join(timeout=self.interval + 5)
+            self.stop_event = None
+        for out, spy in self.spies:
+            spy.send_signal(signal.SIGINT) # py-spy writes its output on Ctrl-C
+            try:
+                _, err = spy.communicate(timeout=60)
+            except subprocess.TimeoutExpired:
+                spy.kill()
+                _, err = spy.communicate()
+            if not out.exists():
+                log(f"py-spy recorded nothing ({(err or b'').decode(errors='replace').strip()[-200:]})")
+        combined = Counter()
+        for out, _ in self.spies:
+            for frame, share in hot_frames(out):
+                combined[frame] += share / len(self.spies)
+        self.frames = [(frame, round(share, 3)) for frame, share in combined.most_common(HOT_FRAMES)]
+        self.spies = []
+        return self.summary()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        return summarize(self.samples, self.frames)
+
+    def save(self, path):
+        """Writes the samples, hot frames and summary to `path`. Returns the summary."""
+        summary = self.summary()
+        Path(path).write_text(json.dumps({"root_pids": self.root_pids, "interval_s": self.interval,
+                                          "summary": summary, "samples": self.samples}, indent=2))
+        return summary
+
+def summarize(samples, frames=()):
+    """
+    {} without samples, else per role: mean/peak CPU % (summed over its
+    processes), mean busiest-thread % and the share of samples it was pegged;
+    mean GPU busy %; the verdict and hot frames.
+    """
+    if not samples:
+        return {}
+    roles = {}
+    for sample in samples:
+        per_role = {}
+        for proc in sample["procs"].values():
+            cpu, top = per_role.get(proc["role"], (0, 0))
+            per_role[proc["role"]] = (cpu + proc["cpu_pct"], max(top, proc["top_thread_pct"]))
+        for name, (cpu, top) in per_role.items():
+            roles.setdefault(name, []).append((cpu, top))
+    mean = lambda xs: round(sum(xs) / len(xs), 1) if xs else None
+    by_role = {name: {"cpu_pct_mean": mean([c for c, _ in values]),
+                      "cpu_pct_peak": max(c for c, _ in values),
+                      "top_thread_pct_mean": mean([t for _, t in values]),
+                      "pegged_share": round(sum(1 for _, t in values if t >= PEGGED_PCT) / len(samples), 3)}
+               for name, values in roles.items()}
+    gpu = [s["gpu_busy_pct"] for s in samples if s.get("gpu_busy_pct") is not None]
+    summary = {"samples": len(samples), "roles": by_role, "gpu_busy_pct_mean": mean(gpu),
+               "hot_frames": [list(f) for f in frames]}
+    summary["verdict"], summary["advice"] = verdict(by_role, summary["gpu_busy_pct_mean"])
+    return summary
+
+def verdict(by_role, gpu_busy):
+    """(verdict, advice) from pegged threads and GPU busy %."""
+    pegged = sorted(((r["pegged_share"], name) for name, r in by_role.items()
+                     if name in ("api server", "engine core", "proxy") and r["pegged_share"] >= PEGGED_SHARE), reverse=True)
+    gpu_bound = gpu_busy is not None and gpu_busy >= GPU_BUSY_PCT
+    if pegged and not gpu_bound:
+        share, name = pegged[0]
+        advice = {
+            "api server": "Add API server processes (--api-server-count) before adding GPUs",
+            "engine core": "Scheduler/engine loop is the limit: larger batches or async scheduling, not more GPUs",
+            "proxy": "vllm-proxy is the limit: run more proxy workers or route clients to replicas directly",
+        }[name]
+        return f"CPU-bound ({name})", f"{advice} (busiest thread pegged in {share:.0%} of samples, GPU {gpu_busy if gpu_busy is not None else '?'}% busy)"
+    if gpu_bound:
+        return "GPU-bound", f"GPU {gpu_busy:.0f}% busy" + (f"; {pegged[0][1]} also pegged" if pegged else "")
+    if gpu_busy is None:
+        return "inconclusive", "No pegged server thread and no GPU utilization readings"
+    return "neither", f"No pegged server thread and GPU only {gpu_busy:.0f}% busy: load generator or latency bound"
+
+def describe(summary):
+    """One-line summary for logs."""
+    if not summary:
+        return "no host samples"
+    cpu = ", ".join(f"{name} {r['cpu_pct_mean']:.0f}% (top thread {r['top_thread_pct_mean']:.0f}%)"
+                    for name, r in sorted(summary["roles"].items()) if name != "other")
+    line = f"{summary['verdict']}: {cpu}"
+    if summary["hot_frames"]:
+        frame, share = summary["hot_frames"][0]
+        line += f" | hottest frame {frame} ({share:.0%})"
+    return line
+
+def print_report(summary):
+    print(f"\n{'ROLE':<12} | {'CPU mean':>8} | {'CPU peak':>8} | {'Top thread':>10} | {'Pegged':>6}")
+    print("-" * 60)
+    for name, r in sorted(summary["roles"].items()):
+        print(f"{name:<12} | {r['cpu_pct_mean']:>7.0f}% | {r['cpu_pct_peak']:>7.0f}% | {r['top_thread_pct_mean']:>9.0f}% | {r['pegged_share']:>6.0%}")
+    print("-" * 60)
+    gpu = summary["gpu_busy_pct_mean"]
+    print(f"GPU busy: {f'{gpu:.0f}%' if gpu is not None else 'n/a'}")
+    print(f"Verdict:  {summary['verdict']} - {summary['advice']}")
+    if summary["hot_frames"]:
+        print("\nHot frames (self time):")
+        for frame, share in summary["hot_frames"]:
+            print(f"  {share:>6.1%}  {frame}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile host CPU of vLLM server processes: CPU-bound or GPU-bound?")
+    parser.add_argument("--pid", type=int, nargs="+", help="Root PIDs (default: every running `vllm serve`)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to sample")
+    parser.add_argument("--interval", type=float, default=SAMPLE_INTERVAL)
+    parser.add_argument("--py-spy", action="store_true", help="Also record stacks with py-spy (needs ptrace permission)")
+    parser.add_argument("--out", type=str, help="Write samples and summary to this JSON file")
+    args = parser.parse_args()
+
+    pids = args.pid or find_servers()
+    if not pids:
+        log("No `vllm serve` process found (use --pid).")
+        return
+    log(f"Sampling {len(process_tree(pids))} process(es) under {pids} for {args.duration:.0f}s...")
+    profiler = HostProfiler(pids, args.interval, args.py_spy,
+                            Path(args.out).with_suffix(".pyspy.txt") if args.out else None).start()
+    time.sleep(args.duration)
+    profiler.stop()
+    summary = profiler.save(args.out) if args.out else profiler.summary()
+    if summary:
+        print_report(summary)
+    else:
+        log("No samples (the processes exited?)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Packaged JIT kernel caches (Triton, AITER, vLLM), keyed by a fingerprint of
+the software stack that compiled them.
+
+vllm-warmup compiles the kernels for every model profile and calls package();
+start-vllm calls restore() when the caches are empty before launch (first boot,
+not after "Erase vLLM Cache"), so the first `vllm serve` starts from precompiled
+kernels, torch.compile artifacts included.
+A package is only ever restored onto the exact stack it was built with:
+
+    fingerprint = sha256(vllm, torch, triton, aiter versions, ROCm version, gfx target)
+
+Packages are `kernels-<fingerprint>.tar.gz` plus a `.json` manifest, read from
+every PACKAGE_DIRS entry and written to the first writable one.
+
+    python kernel_cache.py            # fingerprint and available packages
+"""
+import hashlib
+import json
+import os
+import platform
+import tarfile
+import time
+from importlib import metadata
+from pathlib import Path
+
+TARGET_GFX = "gfx1201"
+# Same set start_vllm.nuke_vllm_cache() wipes, relative to $HOME
+CACHE_DIRS = [".cache/vllm", ".triton/cache", ".aiter"]
+PACKAGE_DIRS = [Path(os.getenv("KERNEL_PACKAGE_DIR", "/opt/kernel_cache")),
+                Path("~/.cache/kernel_packages").expanduser()]
+FINGERPRINT_PACKAGES = ["vllm", "torch", "triton", "pytorch-triton-rocm", "aiter", "amd-aiter"]
+ROCM_VERSION_FILE = Path("/opt/rocm/.info/version")
+
+def log(msg): print(f"[KERNELS] {msg}", flush=True)
+
+def stack():
+    """Versions the compiled kernels depend on (package metadata only, nothing imported)."""
+    info = {"python": platform.python_version(), "gfx": TARGET_GFX}
+    for name in FINGERPRINT_PACKAGES:
+        try:
+            info[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+    try:
+        info["rocm"] = ROCM_VERSION_FILE.read_text().strip()
+    except OSError:
+        pass
+    return info
+
+def fingerprint(info=None):
+    info = info or stack()
+    return hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()[:16]
+
+def package_path(fp, directory):
+    return directory / f"kernels-{fp}.tar.gz"
+
+def find_package(fp=None):
+    """Path of the package for this stack (or `fp`), None if there is none."""
+    fp = fp or fingerprint()
+    for directory in PACKAGE_DIRS:
+        path = package_path(fp, directory)
+        if path.exists():
+            return path
+    return None
+
+def caches_present(home=None):
+    """True if any kernel cache directory has content."""
+    home = Path(home or Path.home())
+    return any((home / d).is_dir() and any((home / d).iterdir()) for d in CACHE_DIRS)
+
+def package(profiles, home=None):
+    """Tars the kernel caches under `home` for this stack. Returns the package path."""
+    home = Path(home or Path.home())
+    info = stack()
+    fp = fingerprint(info)
+    for directory in PACKAGE_DIRS:
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            if os.access(directory, os.W_OK):
+                break
+        except OSError:
+            continue
+    else:
+        raise OSError(f"No writable package directory in {[str(d) for d in PACKAGE_DIRS]}")
+
+    path = package_path(fp, directory)
+    tmp = path.with_name(path.name + ".tmp")
+    with tarfile.open(tmp, "w:gz") as tar:
+        for d in CACHE_DIRS:
+            if (home / d).exists():
+                tar.add(home / d, arcname=d)
+    os.replace(tmp, path)
+    manifest = {"fingerprint": fp, "stack": info, "profiles": profiles,
+                "bytes": path.stat().st_size, "created": time.strftime("%Y-%m-%d %H:%M:%S")}
+    path.with_suffix("").with_suffix(".json").write_text(json.dumps(manifest, indent=2))
+    log(f"Packaged {len(profiles)} profile(s) into {path} ({manifest['bytes'] / 1024**2:.0f} MiB)")
+    return path
+
+def restore(home=None):
+    """
+    Unpacks the package for this stack into `home` if there is one. Existing
+    cache files are kept (the package only fills gaps). Returns the package
+    path, or None.
+    """
+    home = Path(home or Path.home())
+    path = find_package()
+    if not path:
+        return None
+    with tarfile.open(path, "r:gz") as tar:
+        members = [m for m in tar.getmembers()
+                   if any(m.name == d or m.name.startswith(d + "/") for d in CACHE_DIRS)
+                   and (m.isdir() or m.isfile())
+                   and not (home / m.name).exists()]
+        tar.extractall(home, members=members, filter="data")
+    log(f"Restored precompiled kernels from {path}")
+    return path
+
+def main():
+    info = stack()
+    fp = fingerprint(info)
+    log(f"Fingerprint {fp}: " + ", ".join(f"{k}={v}" for k, v in info.items()))
+    for directory in PACKAGE_DIRS:
+        for manifest in sorted(directory.glob("kernels-*.json")):
+            data = json.loads(manifest.read_text())
+            mark = "*" if data["fingerprint"] == fp else " "
+            log(f"{mark} {manifest.with_suffix('.tar.gz')} | {len(data['profiles'])} profile(s) | {data['created']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Prefix caching benchmark with a shared-system-prompt workload.
+
+ShareGPT and random prompts almost never share a prefix, so the other runners
+never exercise vLLM's prefix cache. This one generates a workload where
+--shared-ratio of the requests start with one of --num-prefixes "system
+prompts" of --prefix-len tokens, followed by a unique --suffix-len question.
+The rest are fully unique. The same workload is served with
+--enable-prefix-caching and --no-enable-prefix-caching and driven by
+`vllm bench serve` (custom dataset).
+
+Reported per mode: output throughput, p50/p99 TTFT and the prefix cache hit
+rate scraped from /metrics (vllm_metrics.py). The summary also sizes the
+prefixes' KV footprint from the server's own KV cache report, i.e. how much
+VRAM the prefix cache needs to hold every shared prompt.
+
+Token counts are approximate: prompts are built from a word list that mostly
+tokenizes one word to one token.
+
+Outputs (under ~/vllm_benchmark_results/prefix_cache/):
+    {model}_tp{N}_{workload}_workload.jsonl         the generated prompts
+    {model}_tp{N}_{workload}_cache{on|off}_serve.json  `vllm bench serve --save-result`
+    {model}_tp{N}_{workload}_cache{on|off}_metrics.json /metrics time series (vllm_metrics.MetricsScraper)
+    {model}_tp{N}_{workload}_cache{on|off}_host.json    with --profile-host: server CPU samples and verdict
+    {model}_tp{N}_prefix_server.log                 last server log
+    ../prefix_cache_results.json                    one row per model/TP/workload
+"""
+import subprocess, time, json, sys, os, argparse, random, contextlib
+
+try:
+    from run_vllm_bench import MODEL_TABLE, MODELS_TO_RUN, RESULTS_DIR, DEFAULT_BATCH_TOKENS, get_gpu_count, kill_vllm, nuke_vllm_cache, get_model_args
+    from tp_vs_dp_bench import SERVE_FIELDS, wait_for_server
+except ImportError:
+    print("Error: Could not import run_vllm_bench.py / tp_vs_dp_bench.py. Make sure they are in the same directory.")
+    sys.exit(1)
+
+import analyze_server_logs
+import host_profiler
+import vllm_metrics
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HOST = "127.0.0.1"
+PORT = 8000
+NUM_PROMPTS = 400
+MAX_CONCURRENCY = 32
+SHARED_RATIO = 0.8       # Fraction of requests that start with a shared prefix
+PREFIX_LEN = 2048        # ~tokens per shared prefix ("system prompt")
+SUFFIX_LEN = 128         # ~tokens of unique text after it
+NUM_PREFIXES = 4         # Distinct shared prefixes
+OUTPUT_LEN = 128
+SEED = 0
+
+OUT_DIR = RESULTS_DIR / "prefix_cache"
+SUMMARY_FILE = RESULTS_DIR / "prefix_cache_results.json"
+
+# Common short English words: ~1 token each for Llama / Qwen / Gemma tokenizers
+WORDS = (
+    "the of and to in is you that it he was for on are as with his they at be this have from or one had by "
+    "word but not what all were we when your can said there use an each which she do how their if will up "
+    "other about out many then them these so some her would make like him into time has look two more write "
+    "go see number no way could people my than first water been call who oil its now find long down day did "
+    "get come made may part over new sound take only little work know place year live me back give most very "
+    "after thing our just name good sentence man think say great where help through much before line right "
+    "too mean old any same tell boy follow came want show also around form three small set put end does "
+    "another well large must big even such because turn here why ask went men read need land different home "
+    "us move try kind hand picture again change off play spell air away animal house point page letter mother"
+).split()
+
+def log(msg): print(f"\n[PREFIX] {msg}", flush=True)
+
+def make_text(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+def build_workload(path, num_prompts, shared_ratio, prefix_len, suffix_len, num_prefixes, seed=SEED):
+    """
+    Writes a `vllm bench serve --dataset-name custom` JSONL file and returns its
+    request mix. Shared and unique requests are interleaved at random.
+    """
+    rng = random.Random(seed)
+    prefixes = [f"System prompt {i}. " + make_text(rng, prefix_len) for i in range(num_prefixes)]
+    n_shared = int(round(num_prompts * shared_ratio))
+    rows = []
+    for i in range(num_prompts):
+        if i < n_shared:
+            prompt = f"{prefixes[i % num_prefixes]}\n\nQuestion {i}: {make_text(rng, suffix_len)}"
+        else:
+            # Same total length as a shared request, nothing reusable
+            prompt = f"Question {i}: {make_text(rng, prefix_len + suffix_len)}"
+        rows.append({"prompt": prompt})
+    rng.shuffle(rows)
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return {"shared_requests": n_shared, "unique_requests": num_prompts - n_shared}
+
+def run_mode(model, tp, caching, workload_file, result_file, args):
+    """
+    Serves the model with prefix caching on/off and replays the workload.
+    With --profile-host the server's CPU is profiled by host_profiler too.
+    """
+    cmd = ["vllm", "serve"] + get_model_args(model, tp) + [
+        "--host", HOST, "--port", str(PORT),
+        "--max-num-batched-tokens", str(MODEL_TABLE[model].get("max_tokens", DEFAULT_BATCH_TOKENS)),
+        "--attention-backend", "TRITON_ATTN",
+        "--mm-encoder-attn-backend", "TRITON_ATTN",
+        "--enable-prefix-caching" if caching else "--no-enable-prefix-caching",
+    ]
+    env = os.environ.copy()
+    env["VLLM_DISABLE_COMPILE_CACHE"] = "1"
+    env.update(MODEL_TABLE[model].get("env", {}))
+
+    mode = "on" if caching else "off"
+    log(f"START {model} (TP={tp} | prefix caching {mode})")
+    kill_vllm()
+    base_url = f"http://{HOST}:{PORT}"
+    server_log = OUT_DIR / f"{model.replace('/', '_')}_tp{tp}_prefix_server.log"
+    with open(server_log, "w") as srv_log:
+        proc = subprocess.Popen(cmd, stdout=srv_log, stderr=subprocess.STDOUT, env=env)
+        try:
+            if not wait_for_server(base_url, [proc]):
+                return {"error": "Server did not start"}
+            before = vllm_metrics.snapshot(base_url)
+            bench = [
+                "vllm", "bench", "serve",
+                "--model", model,
+                "--base-url", base_url,
+                "--dataset-name", "custom", "--dataset-path", str(workload_file),
+                "--custom-output-len", str(args.output_len),
+                "--request-rate", args.request_rate,
+                "--num-prompts", str(args.num_prompts),
+                "--max-concurrency", str(args.max_concurrency),
+                "--percentile-metrics", "ttft,tpot,e2el",
+                "--metric-percentiles", "50,99",
+                "--save-result", "--result-dir", str(OUT_DIR), "--result-filename", result_file.name,
+                "--trust-remote-code"
+            ]
+            result_file.unlink(missing_ok=True) # A failed run must not read the previous run's result
+            profile = args.profile_host
+            profiler = (host_profiler.HostProfiler(proc.pid, pyspy=profile == "py-spy",
+                                                   pyspy_out=result_file.with_name(result_file.name.replace("_serve.json", "_pyspy.txt")))
+                        if profile else contextlib.nullcontext())
+            with vllm_metrics.MetricsScraper(base_url) as scraper, profiler:
+                res = subprocess.run(bench, capture_output=True, text=True)
+            after = vllm_metrics.snapshot(base_url)
+            server_metrics = scraper.save(result_file.with_name(result_file.name.replace("_serve.json", "_metrics.json")))
+            host = profiler.save(result_file.with_name(result_file.name.replace("_serve.json", "_host.json"))) if profile else None
+            try:
+                data = json.loads(result_file.read_text()) if res.returncode == 0 else None
+            except Exception:
+                data = None
+            if data is None:
+                return {"error": res.stderr[-500:] if res.stderr else f"Benchmark failed (exit {res.returncode})"}
+        finally:
+            proc.terminate()
+            kill_vllm()
+
+    result = {k: data.get(k) for k in SERVE_FIELDS}
+    result["prefix_hit_rate"] = vllm_metrics.prefix_hit_rate(before, after)
+    result["server_metrics"] = server_metrics
+    if host:
+        result["host_profile"] = host
+    result["kv_cache"] = analyze_server_logs.extract_facts(server_log.read_text(errors="replace"))
+    hit = result["prefix_hit_rate"]
+    log(f"cache {mode}: {result['output_throughput'] or 0:.0f} tok/s, p50 TTFT {result['median_ttft_ms'] or 0:.0f} ms"
+        + (f", hit rate {hit:.0%}" if hit is not None else ""))
+    log(f"cache {mode}: {vllm_metrics.describe(server_metrics)}")
+    if host:
+        log(f"cache {mode}: {host_profiler.describe(host)}")
+    return result
+
+def prefix_footprint(row):
+    """KV cache GiB needed to keep every shared prefix cached, from the server's KV report."""
+    facts = (row["cache_on"].get("kv_cache") or {}) if "error" not in row["cache_on"] else {}
+    if not facts.get("kv_cache_gib") or not facts.get("kv_cache_tokens"):
+        return None
+    prefix_tokens = row["workload"]["num_prefixes"] * row["workload"]["prefix_len"]
+    return prefix_tokens * facts["kv_cache_gib"] / facts["kv_cache_tokens"]
+
+def gains(row):
+    on, off = row["cache_on"], row["cache_off"]
+    if "error" in on or "error" in off:
+        return {}
+    pct = lambda a, b: (a / b - 1) * 100 if a and b else None
+    # Positive = faster first token with caching
+    reduction = lambda k: (1 - on[k] / off[k]) * 100 if on.get(k) and off.get(k) else None
+    return {
+        "throughput_gain_pct": pct(on.get("output_throughput"), off.get("output_throughput")),
+        "ttft_p50_reduction_pct": reduction("median_ttft_ms"),
+        "ttft_p99_reduction_pct": reduction("p99_ttft_ms"),
+        "prefix_kv_gib": prefix_footprint(row),
+    }
+
+def print_summary(rows):
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Workload':<22} | {'Cache':<5} | {'Out tok/s':<9} | {'p50 TTFT':<8} | {'p99 TTFT':<8} | {'Hit rate':<8}")
+    print("-" * 125)
+    for row in rows:
+        name = row["model"].split("/")[-1][:40]
+        for mode in ("on", "off"):
+            r = row[f"cache_{mode}"]
+            if "error" in r:
+                print(f"{name:<40} | {row['tp']:<2} | {row['workload']['label']:<22} | {mode:<5} | FAILED")
+            else:
+                f = lambda k: f"{r[k]:.0f}" if r.get(k) is not None else "-"
+                hit = f"{r['prefix_hit_rate']:.0%}" if r.get("prefix_hit_rate") is not None else "-"
+                print(f"{name:<40} | {row['tp']:<2} | {row['workload']['label']:<22} | {mode:<5} | {f('output_throughput'):<9} | "
+                      f"{f('median_ttft_ms'):<8} | {f('p99_ttft_ms'):<8} | {hit:<8}")
+            name = ""
+        g = row.get("gains") or {}
+        if g:
+            fmt = lambda v, text: text.format(v) if v is not None else "n/a"
+            kv = f", prefixes need ~{g['prefix_kv_gib']:.2f} GiB of KV cache" if g.get("prefix_kv_gib") else ""
+            print(f"{'':<40}   => tok/s {fmt(g['throughput_gain_pct'], '{:+.0f}%')}, p50 TTFT {fmt(g['ttft_p50_reduction_pct'], '{:.0f}% lower')}, "
+                  f"p99 TTFT {fmt(g['ttft_p99_reduction_pct'], '{:.0f}% lower')}{kv}")
+        print("-" * 125)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefix caching on vs off with a shared-prefix workload")
+    parser.add_argument("--model", type=str, help="Filter to run only this model (substring match)")
+    parser.add_argument("--tp", type=int, default=1)
+    parser.add_argument("--shared-ratio", type=float, default=SHARED_RATIO, help="Fraction of requests with a shared prefix (0-1)")
+    parser.add_argument("--prefix-len", type=int, default=PREFIX_LEN, help="~Tokens per shared prefix")
+    parser.add_argument("--suffix-len", type=int, default=SUFFIX_LEN, help="~Tokens of unique text per request")
+    parser.add_argument("--num-prefixes", type=int, default=NUM_PREFIXES, help="Distinct shared prefixes")
+    parser.add_argument("--num-prompts", type=int, default=NUM_PROMPTS)
+    parser.add_argument("--output-len", type=int, default=OUTPUT_LEN)
+    parser.add_argument("--request-rate", type=str, default="inf")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--force", action="store_true", help="Re-run workloads already in the summary")
+    parser.add_argument("--profile-host", choices=["cpu", "py-spy"],
+                        help="Profile server CPU during each run (py-spy: also hot Python frames) for a CPU- vs GPU-bound verdict")
+    args = parser.parse_args()
+
+    if not 0 <= args.shared_ratio <= 1:
+        parser.error("--shared-ratio must be between 0 and 1")
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    gpu_count = get_gpu_count()
+
+    summary = []
+    if SUMMARY_FILE.exists():
+        try: summary = json.loads(SUMMARY_FILE.read_text())
+        except Exception as e: log(f"Warning: could not read {SUMMARY_FILE}: {e}")
+
+    label = f"r{args.shared_ratio:g}_p{args.prefix_len}x{args.num_prefixes}_s{args.suffix_len}"
+    touched = []
+    for model in MODELS_TO_RUN:
+        if args.model and args.model not in model:
+            continue
+        if args.tp not in MODEL_TABLE[model]["valid_tp"] or args.tp > gpu_count:
+            continue
+        key = (model, args.tp, label)
+        touched.append(key)
+        if not args.force and any((r["model"], r["tp"], r["workload"]["label"]) == key for r in summary):
+            log(f"SKIP {model} (TP={args.tp} | {label}) (in {SUMMARY_FILE.name}, use --force)")
+            continue
+
+        stem = f"{model.replace('/', '_')}_tp{args.tp}_{label}"
+        workload_file = OUT_DIR / f"{stem}_workload.jsonl"
+        mix = build_workload(workload_file, args.num_prompts, args.shared_ratio, args.prefix_len, args.suffix_len, args.num_prefixes)
+        nuke_vllm_cache()
+        row = {
+            "model": model, "tp": args.tp,
+            "workload": {"label": label, "shared_ratio": args.shared_ratio, "prefix_len": args.prefix_len,
+                         "suffix_len": args.suffix_len, "num_prefixes": args.num_prefixes,
+                         "num_prompts": args.num_prompts, "output_len": args.output_len,
+                         "request_rate": args.request_rate, "max_concurrency": args.max_concurrency, **mix},
+            "cache_on": run_mode(model, args.tp, True, workload_file, OUT_DIR / f"{stem}_cacheon_serve.json", args),
+            "cache_off": run_mode(model, args.tp, False, workload_file, OUT_DIR / f"{stem}_cacheoff_serve.json", args),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        row["gains"] = gains(row)
+        summary = [r for r in summary if (r["model"], r["tp"], r["workload"]["label"]) != key] + [row]
+        SUMMARY_FILE.write_text(json.dumps(summary, indent=2))
+
+    print_summary([r for r in summary if (r["model"], r["tp"], r["workload"]["label"]) in touched])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Pre-pull stage for the benchmark sweeps: resolves every model, downloads the
+missing files in parallel (resuming partial downloads), verifies them and
+reports the disk footprint, so no `vllm serve` / `vllm bench` run ever blocks
+on a serial hub download inside its startup timeout.
+
+Files land in the standard HF cache layout (blobs/ + snapshots/<commit>/
+symlinks + refs/main) under hf_cache.hub_dir(), exactly where vLLM and
+huggingface_hub look for them. Only the weight format vLLM will load is
+fetched (safetensors if the repo has them, else .bin/.pt); `original/`
+checkpoints and other frameworks' weights are skipped.
+
+Talks to the hub's plain HTTP API, so HF_ENDPOINT (or --endpoint) can point at
+a local stand-in that serves:
+
+    GET /api/models/<repo>/revision/<rev>?blobs=true   {"sha": ..., "siblings": [{"rfilename", "size", "blobId", "lfs": {"sha256"}}]}
+    GET /<repo>/resolve/<sha>/<file>                   file bytes (Range supported for resume)
+
+    python prepull_models.py                      # every model in MODELS_TO_RUN
+    python prepull_models.py --model Qwen3 --verify
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatch
+from pathlib import Path
+
+import requests
+
+import hf_cache
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+ENDPOINT = os.getenv("HF_ENDPOINT", "https://huggingface.co").rstrip("/")
+WORKERS = 4
+CHUNK = 8 * 1024 ** 2
+TIMEOUT = 60
+RETRIES = 3
+# Never fetched: other frameworks' weights and Meta's original checkpoints
+SKIP_PATTERNS = ["original/*", "*.gguf", "*.onnx", "*.onnx_data", "*.msgpack", "*.h5", "*.ckpt", "*.pth"]
+BIN_PATTERNS = ["*.bin", "*.pt"]
+
+def log(msg): print(f"[PREPULL] {msg}", flush=True)
+
+def hf_token():
+    """HF_TOKEN, else the token `huggingface-cli login` stored."""
+    if os.getenv("HF_TOKEN"):
+        return os.environ["HF_TOKEN"]
+    token_file = Path(os.getenv("HF_HOME", Path.home() / ".cache" / "huggingface")).expanduser() / "token"
+    return token_file.read_text().strip() if token_file.exists() else None
+
+def session():
+    s = requests.Session()
+    token = hf_token()
+    if token:
+        s.headers["Authorization"] = f"Bearer {token}"
+    return s
+
+def repo_info(http, model_id, endpoint=ENDPOINT, revision="main"):
+    """(commit sha, [{name, size, sha256 or None, blob_id}]) of the files vLLM needs."""
+    r = http.get(f"{endpoint}/api/models/{model_id}/revision/{revision}", params={"blobs": "true"}, timeout=TIMEOUT)
+    r.raise_for_status()
+    info = r.json()
+    files = [{"name": s["rfilename"], "size": (s.get("lfs") or {}).get("size", s.get("size")),
+              "sha256": (s.get("lfs") or {}).get("sha256"), "blob_id": s.get("blobId")}
+             for s in info.get("siblings", [])
+             if not any(fnmatch(s["rfilename"], p) for p in SKIP_PATTERNS)]
+    if any(f["name"].endswith(".safetensors") for f in files):
+        # vLLM loads safetensors when present: the .bin copies would be dead weight
+        files = [f for f in files if not any(fnmatch(f["name"], p) for p in BIN_PATTERNS)]
+    return info["sha"], files
+
+def blob_name(f):
+    """Blob file name as huggingface_hub names it: sha256 for LFS files, the git blob id otherwise."""
+    return f["sha256"] or f["blob_id"]
+
+def file_digest(path, f):
+    """Hash of `path` in the form the hub reports for `f` (sha256, or git blob sha1)."""
+    if f["sha256"]:
+        h = hashlib.sha256()
+    else:
+        h = hashlib.sha1()
+        h.update(f"blob {path.stat().st_size}\0".encode())
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def verify(path, f, full):
+    """Size always, content hash with `full` (or for freshly downloaded files)."""
+    if f["size"] is not None and path.stat().st_size != f["size"]:
+        return f"size {path.stat().st_size} != {f['size']}"
+    if full and blob_name(f) and file_digest(path, f) != blob_name(f):
+        return "hash mismatch"
+    return None
+
+def download(http, model_id, sha, f, repo_dir, endpoint=ENDPOINT):
+    """Downloads one file into blobs/ (resuming <blob>.incomplete) and links it into the snapshot."""
+    blob = repo_dir / "blobs" / blob_name(f)
+    partial = blob.with_name(blob.name + ".incomplete")
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    url = f"{endpoint}/{model_id}/resolve/{sha}/{f['name']}"
+
+    for attempt in range(1, RETRIES + 1):
+        have = partial.stat().st_size if partial.exists() else 0
+        headers = {"Range": f"bytes={have}-"} if have else {}
+        try:
+            with http.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                if r.status_code == 416: # Already complete
+                    break
+                r.raise_for_status()
+                # 200 to a ranged request: the server ignored Range, start over
+                mode = "ab" if have and r.status_code == 206 else "wb"
+                with open(partial, mode) as out:
+                    for chunk in r.iter_content(CHUNK):
+                        out.write(chunk)
+            break
+        except requests.RequestException as e:
+            if attempt == RETRIES:
+                raise
+            log(f"  {f['name']}: {e}, retrying ({attempt}/{RETRIES})")
+            time.sleep(2 * attempt)
+
+    error = verify(partial, f, full=True)
+    if error:
+        partial.unlink()
+        raise IOError(f"{f['name']}: {error}")
+    os.replace(partial, blob)
+
+def link(repo_dir, sha, f):
+    """snapshots/<sha>/<file> -> ../../blobs/<blob> (relative, as huggingface_hub does)."""
+    target = repo_dir / "snapshots" / sha / f["name"]
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.is_symlink() or target.exists():
+        target.unlink()
+    target.symlink_to(os.path.relpath(repo_dir / "blobs" / blob_name(f), target.parent))
+
+def prepull(models, workers=WORKERS, full_verify=False, endpoint=ENDPOINT):
+    """
+    Makes sure every model in `models` is fully in the HF cache. Returns
+    {model_id: {"bytes", "cached", "downloaded", "errors"}}; failures are logged,
+    not raised, so the sweep can still run the models that are there.
+    """
+    if os.getenv("HF_HUB_OFFLINE") == "1":
+        log("HF_HUB_OFFLINE=1: skipping pre-pull.")
+        return {}
+    http = session()
+    hub = hf_cache.hub_dir()
+    report, jobs = {}, []
+    for model_id in models:
+        try:
+            sha, files = repo_info(http, model_id, endpoint)
+        except requests.RequestException as e:
+            log(f"{model_id}: cannot resolve ({e})")
+            report[model_id] = {"bytes": 0, "cached": 0, "downloaded": 0, "errors": [str(e)]}
+            continue
+        repo_dir = hub / f"models--{model_id.replace('/', '--')}"
+        entry = report[model_id] = {"bytes": sum(f["size"] or 0 for f in files), "cached": 0, "downloaded": 0, "errors": []}
+        for f in files:
+            blob = repo_dir / "blobs" / blob_name(f)
+            if blob.exists() and not verify(blob, f, full_verify):
+                entry["cached"] += f["size"] or 0
+                link(repo_dir, sha, f)
+            else:
+                if blob.exists():
+                    log(f"{model_id}: {f['name']} failed verification, downloading again")
+                    blob.unlink()
+                jobs.append((model_id, sha, f, repo_dir))
+        (repo_dir / "refs").mkdir(parents=True, exist_ok=True)
+        (repo_dir / "refs" / "main").write_text(sha)
+
+    missing = sum(f["size"] or 0 for _, _, f, _ in jobs)
+    hub.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(hub).free
+    if missing > free:
+        log(f"Need {missing / 1024**3:.1f} GiB but only {free / 1024**3:.1f} GiB free in {hub}. Not downloading.")
+        jobs = []
+    elif jobs:
+        log(f"Downloading {len(jobs)} file(s), {missing / 1024**3:.1f} GiB, {workers} at a time...")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download, http, model_id, sha, f, repo_dir, endpoint): (model_id, sha, f, repo_dir)
+                   for model_id, sha, f, repo_dir in jobs}
+        for future in as_completed(futures):
+            model_id, sha, f, repo_dir = futures[future]
+            try:
+                future.result()
+                link(repo_dir, sha, f)
+                report[model_id]["downloaded"] += f["size"] or 0
+                log(f"  {model_id}: {f['name']} ({(f['size'] or 0) / 1024**2:.0f} MiB)")
+            except Exception as e:
+                report[model_id]["errors"].append(str(e))
+                log(f"  {model_id}: {f['name']} FAILED: {e}")
+    if jobs:
+        elapsed = time.time() - start
+        log(f"Downloaded {missing / 1024**3:.1f} GiB in {elapsed:.0f}s ({missing / 1024**2 / max(elapsed, 1e-9):.0f} MiB/s)")
+    print_report(report, hub)
+    return report
+
+def print_report(report, hub):
+    print(f"\n{'MODEL':<55} | {'Size':>9} | {'Cached':>9} | {'Pulled':>9} | Status")
+    print("-" * 100)
+    for model_id, r in report.items():
+        status = f"{len(r['errors'])} error(s)" if r["errors"] else "ok"
+        print(f"{model_id[:55]:<55} | {r['bytes'] / 1024**3:>5.1f} GiB | {r['cached'] / 1024**3:>5.1f} GiB | "
+              f"{r['downloaded'] / 1024**3:>5.1f} GiB | {status}")
+    print("-" * 100)
+    total = sum(r["bytes"] for r in report.values())
+    print(f"Footprint: {total / 1024**3:.1f} GiB for {len(report)} model(s) | "
+          f"{shutil.disk_usage(hub).free / 1024**3:.1f} GiB free in {hub}")
+
+def main():
+    try:
+        from run_vllm_bench import MODELS_TO_RUN
+    except ImportError:
+        print("Error: Could not import run_vllm_bench.py. Make sure it is in the same directory.")
+        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Download and verify every benchmark model before a sweep")
+    parser.add_argument("--model", type=str, help="Only models containing this substring")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Parallel downloads")
+    parser.add_argument("--verify", action="store_true", help="Hash already-cached files too (slow for large models)")
+    parser.add_argument("--endpoint", type=str, default=ENDPOINT, help="Hub URL (a local stand-in works)")
+    args = parser.parse_args()
+
+    models = [m for m in MODELS_TO_RUN if not args.model or args.model in m]
+    report = prepull(models, args.workers, args.verify, args.endpoint.rstrip("/"))
+    sys.exit(1 if any(r["errors"] for r in report.values()) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+SQLite results warehouse with a small query CLI.
+
+`import` loads every record produced by aggregate_results (throughput, latency,
+max-context probes and `*_server.log` startup facts) into two indexed tables:
+
+    runs    (id, model, gpu, tp, backend, tag, kind, qps, util, max_seqs,
+             quant, quant_bits, params_b, weights_gib, weights_source,
+             vram_gib, date, tree, path, error)
+    metrics (run_id, name, value)
+
+plus a `results` view joining the two. `weights_gib` is the total model weight
+footprint across the TP group, measured from a matching server log when one
+exists ("log") and estimated from parameter count x quant bits otherwise.
+`vram_gib` is the VRAM the server held across the TP group, from a server log
+of the same model, GPU, TP and backend (same GPU util and, preferably, the same
+max-num-seqs): total GPU memory x gpu_memory_utilization when the log prints
+it, else weights + KV cache + CUDA graphs (the budget minus the transient
+activation peak). NULL without a matching server log.
+
+Examples:
+
+    python results_warehouse.py import
+    # Best tok/s per GiB of VRAM for 4-bit models at TP=1
+    python results_warehouse.py query --metric tokens_per_second --bits 4 --tp 1 --per-vram-gib --best
+    # Same, per GiB of model weights
+    python results_warehouse.py query --metric tokens_per_second --bits 4 --tp 1 --per-weight-gib --best
+    python results_warehouse.py query --metric p99_ttft_ms --gpu R9700 --since 2026-01-01
+    python results_warehouse.py sql "SELECT gpu, COUNT(*) FROM runs GROUP BY gpu"
+"""
+import argparse
+import datetime
+import sqlite3
+import sys
+from pathlib import Path
+
+import aggregate_results
+
+BENCH_DIR = Path(__file__).parent.resolve()
+DB_FILE = BENCH_DIR / "results.sqlite"
+
+GIB_PER_GB = 1e9 / 2**30
+
+SCHEMA = """
+DROP VIEW IF EXISTS results;
+DROP TABLE IF EXISTS metrics;
+DROP TABLE IF EXISTS runs;
+
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL, gpu TEXT NOT NULL, tp INTEGER NOT NULL,
+    backend TEXT NOT NULL, tag TEXT NOT NULL, kind TEXT NOT NULL,
+    qps REAL, util REAL, max_seqs INTEGER,
+    quant TEXT, quant_bits INTEGER, params_b REAL,
+    weights_gib REAL, weights_source TEXT, vram_gib REAL,
+    date TEXT, tree TEXT, path TEXT, error TEXT
+);
+CREATE TABLE metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+
+CREATE INDEX idx_runs_model ON runs(model, tp);
+CREATE INDEX idx_runs_slice ON runs(kind, gpu, tp, backend);
+CREATE INDEX idx_runs_date ON runs(date);
+CREATE INDEX idx_metrics_run ON metrics(run_id);
+CREATE INDEX idx_metrics_name ON metrics(name, value);
+
+CREATE VIEW results AS
+    SELECT r.*, m.name AS metric, m.value AS value
+    FROM runs r JOIN metrics m ON m.run_id = r.id;
+"""
+
+def log(msg): print(f"[WAREHOUSE] {msg}", file=sys.stderr, flush=True)
+
+def quant_bits(quant):
+    """Weight bits for an aggregate_results.extract_meta() quant label."""
+    if quant in ("AWQ", "GPTQ") or "4" in quant: return 4
+    if quant == "FP8": return 8
+    return 16
+
+def record_date(r):
+    """Run date from the tree name when known, otherwise the file mtime."""
+    if r["provenance"]["date"]:
+        return r["provenance"]["date"]
+    return datetime.date.fromtimestamp(r["provenance"]["mtime"]).isoformat()
+
+def measured_weights(records):
+    """(model, tp) -> total weight GiB across the TP group, from server logs."""
+    weights = {}
+    for r in records:
+        if r["kind"] == "server_log" and "weights_gib" in r["metrics"]:
+            weights[(r["model"], r["tp"])] = r["metrics"]["weights_gib"] * r["tp"]
+    return weights
+
+def measured_vram(records):
+    """
+    (model, gpu, tp, backend) -> [(max_num_seqs, gpu_util, GiB)] of the VRAM
+    each server log's server held across the TP group.
+    """
+    vram = {}
+    for r in records:
+        m = r["metrics"]
+        if r["kind"] != "server_log":
+            continue
+        if "vram_budget_gib" in m:
+            per_gpu = m["vram_budget_gib"]
+        elif "weights_gib" in m and "kv_cache_gib" in m:
+            per_gpu = m["weights_gib"] + m["kv_cache_gib"] + m.get("graph_gib", 0)
+        else:
+            continue
+        vram.setdefault((r["model"], r["gpu"], r["tp"], r["backend"]), []).append(
+            (m.get("max_num_seqs"), m.get("gpu_util"), per_gpu * r["tp"]))
+    return vram
+
+def match_vram(vram, r):
+    """VRAM GiB for run `r`: a log of the same model/GPU/TP/backend, at the run's util if it has one, preferring its max_seqs."""
+    util = r["params"].get("util")
+    seqs = r["params"].get("max_num_seqs") or r["params"].get("max_seqs")
+    logs = [v for v in vram.get((r["model"], r["gpu"], r["tp"], r["backend"]), [])
+            if util is None or v[1] == util]
+    exact = [v for v in logs if seqs is not None and v[0] == seqs]
+    return (exact or logs)[-1][2] if logs else None
+
+def import_results(db_path=DB_FILE, roots=None):
+    """Rebuilds the warehouse from the (mtime-cached) aggregator records."""
+    records = aggregate_results.collect(roots)
+    weights = measured_weights(records)
+    vram = measured_vram(records)
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executescript(SCHEMA)
+        n_metrics = 0
+        for r in records:
+            params_b, quant = aggregate_results.extract_meta(r["model"])
+            bits = quant_bits(quant)
+
+            if (r["model"], r["tp"]) in weights:
+                w_gib, w_src = weights[(r["model"], r["tp"])], "log"
+            elif params_b:
+                w_gib, w_src = params_b * bits / 8 * GIB_PER_GB, "estimate"
+            else:
+                w_gib, w_src = None, None
+
+            cur = conn.execute(
+                "INSERT INTO runs (model, gpu, tp, backend, tag, kind, qps, util, max_seqs, quant, quant_bits, "
+                "params_b, weights_gib, weights_source, vram_gib, date, tree, path, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (r["model"], r["gpu"], r["tp"], r["backend"], r["tag"], r["kind"],
+                 float(r["qps"]) if r["qps"] else None,
+                 r["params"].get("util"), r["params"].get("max_seqs"),
+                 quant, bits, params_b, w_gib, w_src, match_vram(vram, r),
+                 record_date(r), r["provenance"]["tree"], r["provenance"]["path"], r["error"])
+            )
+            rows = [(cur.lastrowid, name, float(value)) for name, value in r["metrics"].items() if value is not None]
+            conn.executemany("INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)", rows)
+            n_metrics += len(rows)
+    conn.close()
+    log(f"Imported {len(records)} runs / {n_metrics} metrics into {db_path}")
+
+def connect(db_path):
+    if not Path(db_path).exists():
+        log(f"{db_path} not found. Importing first...")
+        import_results(db_path)
+    return sqlite3.connect(db_path)
+
+def build_query(args):
+    """Translates CLI filters into (sql, params) over the `results` view."""
+    divisor = "vram_gib" if args.per_vram_gib else "weights_gib" if args.per_weight_gib else None
+    value_expr = f"value / {divisor}" if divisor else "value"
+    where = ["metric = ?", "error IS NULL"]
+    params = [args.metric]
+
+    for column, value in (("tp", args.tp), ("quant_bits", args.bits), ("kind", args.kind)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    for column, value in (("model", args.model), ("gpu", args.gpu), ("backend", args.backend)):
+        if value:
+            where.append(f"{column} LIKE ?")
+            params.append(f"%{value}%")
+    if args.since:
+        where.append("date >= ?")
+        params.append(args.since)
+    if args.until:
+        where.append("date <= ?")
+        params.append(args.until)
+    if divisor:
+        where.append(f"{divisor} > 0")
+
+    order = "ASC" if args.asc else "DESC"
+    columns = "model, gpu, tp, backend, tag, qps, date, weights_gib, weights_source, vram_gib"
+    if args.best:
+        # One row per model: the best value across GPUs/backends/dates matching the filters
+        agg = "MIN" if args.asc else "MAX"
+        sql = (f"SELECT {columns}, {agg}({value_expr}) AS score FROM results "
+               f"WHERE {' AND '.join(where)} GROUP BY model ORDER BY score {order} LIMIT ?")
+    else:
+        sql = (f"SELECT {columns}, {value_expr} AS score FROM results "
+               f"WHERE {' AND '.join(where)} ORDER BY score {order} LIMIT ?")
+    params.append(args.limit)
+    return sql, params
+
+def print_rows(headers, rows):
+    if not rows:
+        print("(no rows)")
+        return
+    cells = [[("-" if v is None else f"{v:.2f}" if isinstance(v, float) else str(v)) for v in row] for row in rows]
+    widths = [max(len(str(h)), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print(" | ".join(f"{h:<{w}}" for h, w in zip(headers, widths)))
+    print("-+-".join("-" * w for w in widths))
+    for c in cells:
+        print(" | ".join(f"{v:<{w}}" for v, w in zip(c, widths)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark results warehouse (SQLite) with query CLI")
+    parser.add_argument("--db", type=str, default=str(DB_FILE), help=f"Database path (default: {DB_FILE.name})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_imp = sub.add_parser("import", help="(Re)build the warehouse from all result trees")
+    p_imp.add_argument("roots", nargs="*", help="Result directories (default: everything under benchmarks/)")
+
+    p_q = sub.add_parser("query", help="Slice one metric by model/GPU/TP/backend/date")
+    p_q.add_argument("--metric", required=True, help="e.g. tokens_per_second, p99_ttft_ms, max_context, kv_cache_tokens")
+    p_q.add_argument("--model", help="Model substring")
+    p_q.add_argument("--gpu", help="GPU substring (e.g. R9700, 4090)")
+    p_q.add_argument("--tp", type=int)
+    p_q.add_argument("--backend", help="Triton / ROCm / AITER / default")
+    p_q.add_argument("--kind", help="throughput / latency / startup / max_context / server_log")
+    p_q.add_argument("--bits", type=int, help="Weight quantization bits (4, 8, 16)")
+    p_q.add_argument("--since", help="YYYY-MM-DD")
+    p_q.add_argument("--until", help="YYYY-MM-DD")
+    per_gib = p_q.add_mutually_exclusive_group()
+    per_gib.add_argument("--per-vram-gib", action="store_true", help="Divide by the VRAM GiB the server held across the TP group (from server logs)")
+    per_gib.add_argument("--per-weight-gib", action="store_true", help="Divide by total weight GiB across the TP group")
+    p_q.add_argument("--best", action="store_true", help="Only the best row per model")
+    p_q.add_argument("--asc", action="store_true", help="Lower is better (latency metrics)")
+    p_q.add_argument("--limit", type=int, default=50)
+
+    p_sql = sub.add_parser("sql", help="Run raw SQL against the warehouse")
+    p_sql.add_argument("query")
+
+    args = parser.parse_args()
+
+    if args.cmd == "import":
+        import_results(args.db, args.roots or None)
+        return
+
+    conn = connect(args.db)
+    if args.cmd == "query":
+        sql, params = build_query(args)
+    else:
+        sql, params = args.query, []
+    cur = conn.execute(sql, params)
+    headers = [d[0] for d in cur.description] if cur.description else []
+    print_rows(headers, cur.fetchall())
+    conn.close()
+
+if __name__ == "__main__":
+    main()
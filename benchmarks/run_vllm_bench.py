@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import subprocess, time, json, sys, os, requests, argparse, shutil
+import subprocess, time, json, sys, os, requests, argparse, shutil, math, statistics
 from pathlib import Path
 
 import tempfile
@@ -22,6 +22,12 @@ except ImportError:
         sys.path.append(str(Path(__file__).parent.parent / "scripts"))
         import models
 
+import aggregate_results
+import hf_cache
+import gpu_inventory
+import prepull_models
+import watchdog
+
 # Import from shared config
 MODEL_TABLE = models.MODEL_TABLE
 MODELS_TO_RUN = models.MODELS_TO_RUN
@@ -34,6 +40,18 @@ DEFAULT_BATCH_TOKENS = models.DEFAULT_BATCH_TOKENS
 FALLBACK_INPUT_LEN  = 1024
 FALLBACK_OUTPUT_LEN = 512
 
+# Repeated trials (--trials). One trial keeps the legacy single-run behaviour.
+DEFAULT_TRIALS        = 1
+DEFAULT_WARMUP_TRIALS = 0
+DEFAULT_CI_TARGET     = 0.02 # Stop early once the 95% CI half-width is within 2% of the mean
+MIN_TRIALS_FOR_CI     = 3
+
+# Two-sided 95% Student-t critical values by degrees of freedom (n-1)
+T_CRIT_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042
+}
+
 RESULTS_DIR = Path("~/vllm_benchmark_results").expanduser()
 RESULTS_DIR.mkdir(exist_ok=True, parents=True)
 
@@ -56,24 +74,8 @@ def run_dialog(args):
 def log(msg): print(f"\n[BENCH] {msg}")
 
 def get_gpu_count():
-    try:
-        # Using rocm-smi --showid to list GPUs. 
-        # Output format: "GPU[0] : Device Name: ..."
-        res = subprocess.run(["rocm-smi", "--showid"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if res.returncode == 0:
-            target_gpu = "AMD Radeon Graphics"
-            count = 0
-            for line in res.stdout.strip().split('\n'):
-                if "Device Name" in line and target_gpu in line:
-                    count += 1
-            
-            return count if count > 0 else 1
-        else:
-            log("rocm-smi failed, defaulting to 2 GPUs (Hardcoded Fallback)")
-            return 2
-    except Exception as e:
-        log(f"Error detecting GPUs: {e}, defaulting to 2 GPUs")
-        return 2
+    # KFD topology via gpu_inventory: same count as start-vllm, no rocm-smi
+    return gpu_inventory.gpu_count()
 
 def kill_vllm():
     cmds = [
@@ -118,6 +120,30 @@ def get_dataset():
         log(f"WARNING: ShareGPT download failed ({e}). using RANDOM.")
         return None
 
+def t_critical(df):
+    """95% two-sided Student-t value; uses the nearest tabulated df at or below, 1.96 past 30."""
+    if df > 30: return 1.96
+    return T_CRIT_95[max(k for k in T_CRIT_95 if k <= df)]
+
+def trial_stats(values):
+    """
+    Returns {"mean", "stddev", "ci95", "n"} for a list of per-trial values.
+    ci95 is the half-width of the 95% confidence interval of the mean.
+    """
+    n = len(values)
+    mean = statistics.fmean(values)
+    if n < 2:
+        return {"mean": mean, "stddev": 0.0, "ci95": None, "n": n}
+    std = statistics.stdev(values)
+    return {"mean": mean, "stddev": std, "ci95": t_critical(n - 1) * std / math.sqrt(n), "n": n}
+
+def format_tps(data):
+    """Formats a throughput result as 'mean' or 'mean±ci' when trial stats are present."""
+    if "error" in data: return data["error"]
+    tps = data.get("tokens_per_second", 0)
+    ci = data.get("tokens_per_second_ci95")
+    return f"{tps:.1f}±{ci:.1f}" if ci else f"{tps:.1f}"
+
 def get_model_args(model, tp_size, overrides=None):
     config = MODEL_TABLE.get(model, {})
     overrides = overrides or {}
@@ -148,6 +174,11 @@ def get_model_args(model, tp_size, overrides=None):
     
     return cmd
 
+def failure_record(run, error):
+    """Result JSON for a failed run: the typed failure plus whatever the watchdog salvaged."""
+    return {"error": run["failure"] or error, "phase": run["phase"], "elapsed_s": run["elapsed_s"],
+            "salvaged": run["salvaged"], "tail": run["tail"]}
+
 def run_throughput(model, tp_size, backend_name="Default", output_dir=RESULTS_DIR, extra_env=None, overrides=None):
     if tp_size not in MODEL_TABLE[model]["valid_tp"]: return
     overrides = overrides or {}
@@ -161,8 +192,15 @@ def run_throughput(model, tp_size, backend_name="Default", output_dir=RESULTS_DI
     output_file = output_dir_path / f"{model_safe}_tp{tp_size}{tag_suffix}_throughput.json"
     
     if output_file.exists():
-        log(f"SKIP {model} (TP={tp_size} | {backend_name})")
-        return
+        # A result satisfies the request if it converged (CI target met early) or was
+        # asked for at least as many trials; legacy results only have their trial list.
+        try: prev = json.loads(output_file.read_text())
+        except: prev = {}
+        existing_trials = prev.get("trials_requested", len(prev.get("tokens_per_second_trials", [None])))
+        if prev.get("converged") or existing_trials >= int(overrides.get("trials", DEFAULT_TRIALS)):
+            log(f"SKIP {model} (TP={tp_size} | {backend_name})")
+            return
+        log(f"RERUN {model} (TP={tp_size} | {backend_name}): existing result was for only {existing_trials} trial(s)")
 
     dataset_path = get_dataset()
     dataset_args = ["--dataset-name", "sharegpt", "--dataset-path", dataset_path] if dataset_path else ["--input-len", "1024"]
@@ -207,19 +245,108 @@ def run_throughput(model, tp_size, backend_name="Default", output_dir=RESULTS_DI
     if extra_env:
         env.update(extra_env)
 
-    try: 
-        subprocess.run(cmd, check=True, env=env)
-    except Exception as e: 
-        log(f"ERROR: Failed {model} [{backend_name}]")
+    trials = int(overrides.get("trials", DEFAULT_TRIALS))
+    warmup = int(overrides.get("warmup_trials", DEFAULT_WARMUP_TRIALS))
+    ci_target = float(overrides.get("ci_target", DEFAULT_CI_TARGET))
+
+    # Recorded with the result so the launcher can match its concurrency / KV dtype
+    max_num_seqs = int(overrides.get("max_num_seqs", MODEL_TABLE[model].get("max_num_seqs", "32")))
+    kv_cache_dtype = overrides.get("kv_cache_dtype", MODEL_TABLE[model].get("kv_cache_dtype", "auto"))
+
+    # Stalled runs (e.g. a hung RCCL init) are killed so the queue moves on
+    silence = int(overrides.get("silence_timeout", watchdog.SILENCE_TIMEOUT))
+
+    if trials <= 1 and warmup <= 0:
+        run = watchdog.run(cmd, env=env, silence=silence)
+        try: 
+            if run["failure"]: raise RuntimeError(run["failure"])
+            result = json.loads(output_file.read_text())
+            result["max_num_seqs"] = max_num_seqs
+            result["kv_cache_dtype"] = kv_cache_dtype
+            output_file.write_text(json.dumps(result, indent=4))
+        except Exception as e: 
+            log(f"ERROR: Failed {model} [{backend_name}]: {e}")
+            try:
+                with open(output_file, 'w') as f:
+                    json.dump(failure_record(run, str(e)), f, indent=4)
+            except: pass
+        return
+
+    # Multi-trial mode: each trial writes its own JSON, the aggregate goes to output_file.
+    # Warmup trials absorb compile/cache effects and are discarded.
+    trial_file = output_dir_path / f"{output_file.stem}.trial.json"
+    trial_cmd = list(cmd)
+    trial_cmd[trial_cmd.index("--output-json") + 1] = str(trial_file)
+
+    values = []
+    last = {}
+    stats = None
+    converged = False
+    for i in range(warmup + trials):
+        is_warmup = i < warmup
+        label = f"warmup {i+1}/{warmup}" if is_warmup else f"trial {i-warmup+1}/{trials}"
+        log(f"{model} (TP={tp_size} | {backend_name}) {label}")
+        if i > 0: kill_vllm()
+        run = watchdog.run(trial_cmd, env=env, silence=silence)
         try:
-            with open(output_file, 'w') as f:
-                json.dump({"error": "Failed"}, f)
-        except: pass
+            if run["failure"]: raise RuntimeError(run["failure"])
+            last = json.loads(trial_file.read_text())
+        except Exception as e:
+            log(f"ERROR: Failed {model} [{backend_name}] {label}: {e}")
+            continue
+        finally:
+            trial_file.unlink(missing_ok=True)
+
+        if is_warmup: continue
+        values.append(float(last.get("tokens_per_second", 0)))
+        stats = trial_stats(values)
+        if stats["ci95"] is not None:
+            log(f"  -> {stats['mean']:.1f} ± {stats['ci95']:.1f} tok/s after {len(values)} trial(s)")
+        if len(values) >= MIN_TRIALS_FOR_CI and stats["mean"] > 0 and stats["ci95"] / stats["mean"] <= ci_target:
+            log(f"  -> CI within {ci_target:.0%} of mean. Stopping early.")
+            converged = True
+            break
+
+    if not values:
+        with open(output_file, 'w') as f:
+            json.dump(failure_record(run, "Failed"), f, indent=4)
+        return
+
+    # Keep vLLM's own fields from the last trial, replace the headline number with the mean
+    result = dict(last)
+    result.update({
+        "tokens_per_second": stats["mean"],
+        "tokens_per_second_trials": values,
+        "tokens_per_second_stddev": stats["stddev"],
+        "tokens_per_second_ci95": stats["ci95"],
+        "warmup_trials_discarded": warmup,
+        "trials_requested": trials,
+        "converged": converged,
+        "max_num_seqs": max_num_seqs,
+        "kv_cache_dtype": kv_cache_dtype
+    })
+    with open(output_file, 'w') as f:
+        json.dump(result, f, indent=4)
 
 
 def print_summary(tps):
-    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Tag':<15} | {'Triton':<8} | {'ROCm':<8} | {'AITER':<8}")
-    print("-" * 103)
+    # One pass over RESULTS_DIR via the shared aggregator (see aggregate_results.py)
+    # (model_safe, tp, tag) -> {backend: record}
+    table = {}
+    for r in aggregate_results.collect([RESULTS_DIR]):
+        if r["kind"] != "throughput": continue
+        table.setdefault((r["model_safe"], r["tp"], r["tag"]), {})[r["backend"]] = r
+
+    def cell(rec):
+        if rec is None: return "N/A"
+        if rec["error"]: return rec["error"]
+        return format_tps({
+            "tokens_per_second": rec["metrics"]["tokens_per_second"],
+            "tokens_per_second_ci95": rec["metrics"].get("tokens_per_second_ci95")
+        })
+
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Tag':<15} | {'Triton':<14} | {'ROCm':<14} | {'AITER':<14}")
+    print("-" * 121)
     
     for m in MODELS_TO_RUN:
         msafe = m.replace("/", "_")
@@ -228,69 +355,61 @@ def print_summary(tps):
         for tp in tps:
             if tp not in MODEL_TABLE[m]["valid_tp"]: continue
             
-            prefix = f"{msafe}_tp{tp}"
-            
-            tags = set()
-            for p in (RESULTS_DIR / "triton").glob(f"{prefix}*_throughput.json"):
-                name_part = p.name[len(prefix):-len("_throughput.json")]
-                tag = name_part.lstrip("_")
-                tags.add(tag)
-                
-            for p in (RESULTS_DIR / "rocm").glob(f"{prefix}*_throughput.json"):
-                name_part = p.name[len(prefix):-len("_throughput.json")]
-                tag = name_part.lstrip("_")
-                tags.add(tag)
-                
-            for p in (RESULTS_DIR / "aiter").glob(f"{prefix}*_throughput.json"):
-                name_part = p.name[len(prefix):-len("_throughput.json")]
-                tag = name_part.lstrip("_")
-                tags.add(tag)
-                
-            if not tags:
-                tags.add("") # Default empty tag if no files found
-                
-            for tag in sorted(list(tags)):
-                tag_suffix = f"_{tag}" if tag else ""
-                
-                # Default
-                try: 
-                    p1 = (RESULTS_DIR / "triton") / f"{prefix}{tag_suffix}_throughput.json"
-                    if p1.exists():
-                        d1 = json.loads(p1.read_text())
-                        val1 = d1["error"] if "error" in d1 else f"{d1.get('tokens_per_second', 0):.1f}"
-                    else:
-                        val1 = "N/A"
-                except: val1 = "N/A"
-                
-                # ROCm
-                try:
-                    p2 = (RESULTS_DIR / "rocm") / f"{prefix}{tag_suffix}_throughput.json"
-                    if p2.exists():
-                        d2 = json.loads(p2.read_text())
-                        val2 = d2["error"] if "error" in d2 else f"{d2.get('tokens_per_second', 0):.1f}"
-                    else:
-                        val2 = "N/A"
-                except: val2 = "N/A"
-
-                # AITER
-                try:
-                    p3 = (RESULTS_DIR / "aiter") / f"{prefix}{tag_suffix}_throughput.json"
-                    if p3.exists():
-                        d3 = json.loads(p3.read_text())
-                        val3 = d3["error"] if "error" in d3 else f"{d3.get('tokens_per_second', 0):.1f}"
-                    else:
-                        val3 = "N/A"
-                except: val3 = "N/A"
+            tags = sorted(tag for (ms, t, tag) in table if ms == msafe and t == tp) or [""] # Default empty tag if no files found
+            for tag in tags:
+                by_backend = table.get((msafe, tp, tag), {})
+                val1 = cell(by_backend.get("Triton"))
+                val2 = cell(by_backend.get("ROCm"))
+                val3 = cell(by_backend.get("AITER"))
 
                 display_tag = tag if tag else "(Default)"
-                print(f"{name_cell:<40} | {tp:<2} | {display_tag:<15} | {val1:<8} | {val2:<8} | {val3:<8}")
+                print(f"{name_cell:<40} | {tp:<2} | {display_tag:<15} | {val1:<14} | {val2:<14} | {val3:<14}")
                 
-    print("-" * 103)
+    print("-" * 121)
+
+def print_kv_cache_summary(tps, models):
+    """Per model/TP: best tok/s and single-user max context for each KV cache dtype."""
+    records = aggregate_results.collect([RESULTS_DIR, aggregate_results.BENCH_DIR / aggregate_results.MAX_CONTEXT_FILE])
+
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'KV dtype':<8} | {'Best tok/s':<10} | {'Max ctx (1 req)':<15} | {'vs configured':<20}")
+    print("-" * 110)
+    for m in models:
+        configured = MODEL_TABLE[m].get("kv_cache_dtype", "auto")
+        for tp in tps:
+            if tp not in MODEL_TABLE[m]["valid_tp"]: continue
+            rows = {}
+            for dtype in ("auto", "fp8"):
+                tag = aggregate_results.kv_cache_tag(m, dtype)
+                mine = [r for r in records if r["model"] == m and r["tp"] == tp and r["tag"] == tag and not r["error"]]
+                tps_vals = [r["metrics"]["tokens_per_second"] for r in mine if r["kind"] == "throughput"]
+                ctx_vals = [r["metrics"]["max_context"] for r in mine if r["kind"] == "max_context" and r["params"]["max_seqs"] == 1]
+                rows[dtype] = (max(tps_vals) if tps_vals else None, max(ctx_vals) if ctx_vals else None)
+
+            base_tps, base_ctx = rows[configured]
+            name = m.split('/')[-1]
+            for dtype, (tok_s, ctx) in rows.items():
+                delta = ""
+                if dtype != configured:
+                    if tok_s and base_tps: delta += f"tok/s {tok_s / base_tps - 1:+.0%} "
+                    if ctx and base_ctx: delta += f"ctx x{ctx / base_ctx:.2f}"
+                label = f"{dtype}{'*' if dtype == configured else ''}"
+                print(f"{name:<40} | {tp:<2} | {label:<8} | {f'{tok_s:.1f}' if tok_s else 'N/A':<10} | {ctx or 'N/A':<15} | {delta:<20}")
+                name = ""
+    print("-" * 110)
+    print("* = kv_cache_dtype the model is configured with in models.py")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="VLLM High-Concurrency Throughput Benchmark Suite")
     parser.add_argument("--tp", type=int, nargs="+", default=[1, 2])
     parser.add_argument("--tui", action="store_true", help="Launch interactive configuration UI")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS, help="Max measured trials per config (default: 1)")
+    parser.add_argument("--warmup-trials", type=int, default=DEFAULT_WARMUP_TRIALS, help="Trials to run and discard before measuring")
+    parser.add_argument("--ci-target", type=float, default=DEFAULT_CI_TARGET, help="Stop early once 95%% CI half-width / mean is below this (default: 0.02)")
+    parser.add_argument("--kv-cache-dtypes", nargs="+", choices=["auto", "fp8"],
+                        help="Sweep KV cache dtypes (non-default dtypes get a 'kv<dtype>' tag)")
+    parser.add_argument("--no-prepull", action="store_true", help="Skip downloading/verifying all models before the sweep")
+    parser.add_argument("--silence-timeout", type=int, default=watchdog.SILENCE_TIMEOUT,
+                        help="Kill a run after this many seconds without output while the GPUs are idle (default: 900)")
     args = parser.parse_args()
     
     gpu_count = get_gpu_count()
@@ -334,10 +453,18 @@ if __name__ == "__main__":
             print("No models selected. Exiting.")
             sys.exit(0)
 
+    if not args.no_prepull:
+        # Downloads inside `vllm bench` would be timed and serialised
+        prepull_models.prepull(selected_models)
+
     kill_vllm()
+    # Warms the next model's shards in page cache while the current one benchmarks
+    prefetcher = hf_cache.Prefetcher([m for tp in valid_tp_args for m in selected_models])
     for tp in valid_tp_args:
         for m in selected_models:
-            overrides = {}
+            prefetcher.advance(m)
+            overrides = {"trials": args.trials, "warmup_trials": args.warmup_trials, "ci_target": args.ci_target,
+                         "silence_timeout": args.silence_timeout}
             if args.tui:
                 config = MODEL_TABLE.get(m, {})
                 default_seqs = config.get("max_num_seqs", "32")
@@ -375,19 +502,28 @@ if __name__ == "__main__":
                         
                     overrides["tag"] = lines[4].strip()
             
-            # 1. Triton Attention (explicit)
-            run_throughput(m, tp, "Triton-Attn", RESULTS_DIR / "triton", overrides=overrides)
-            
-            # 2. ROCm Attention 
-            # We force this via CLI argument --attention-backend ROCM_ATTN below
-            # No specific env vars needed if forcing backend.
-            rocm_env = {}
-            print(f"[DEBUG] Forcing ROCm Env: {rocm_env} + CLI: --attention-backend ROCM_ATTN")
-            run_throughput(m, tp, "ROCm-Attn", RESULTS_DIR / "rocm", rocm_env, overrides=overrides)
-            
-            # 3. AITER Attention
-            aiter_env = {"VLLM_ROCM_USE_AITER": "1"}
-            print(f"[DEBUG] Forcing AITER Env: {aiter_env} + CLI: --attention-backend ROCM_ATTN")
-            run_throughput(m, tp, "AITER-Attn", RESULTS_DIR / "aiter", aiter_env, overrides=overrides)
+            for kv_cache_dtype in args.kv_cache_dtypes or [None]:
+                run_overrides = dict(overrides)
+                if kv_cache_dtype:
+                    run_overrides["kv_cache_dtype"] = kv_cache_dtype
+                    run_overrides["tag"] = "_".join(t for t in (overrides.get("tag", ""), aggregate_results.kv_cache_tag(m, kv_cache_dtype)) if t)
+
+                # 1. Triton Attention (explicit)
+                run_throughput(m, tp, "Triton-Attn", RESULTS_DIR / "triton", overrides=run_overrides)
+                
+                # 2. ROCm Attention 
+                # We force this via CLI argument --attention-backend ROCM_ATTN below
+                # No specific env vars needed if forcing backend.
+                rocm_env = {}
+                print(f"[DEBUG] Forcing ROCm Env: {rocm_env} + CLI: --attention-backend ROCM_ATTN")
+                run_throughput(m, tp, "ROCm-Attn", RESULTS_DIR / "rocm", rocm_env, overrides=run_overrides)
+                
+                # 3. AITER Attention
+                aiter_env = {"VLLM_ROCM_USE_AITER": "1"}
+                print(f"[DEBUG] Forcing AITER Env: {aiter_env} + CLI: --attention-backend ROCM_ATTN")
+                run_throughput(m, tp, "AITER-Attn", RESULTS_DIR / "aiter", aiter_env, overrides=run_overrides)
             
-    print_summary(valid_tp_args)
\ No newline at end of file
+    prefetcher.stop()
+    print_summary(valid_tp_args)
+    if args.kv_cache_dtypes:
+        print_kv_cache_summary(valid_tp_args, selected_models)
\ No newline at end of file
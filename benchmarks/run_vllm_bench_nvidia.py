@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
-import subprocess, time, json, sys, os, requests, re, argparse
+import subprocess, time, json, sys, os, requests, re, argparse, contextlib
 from pathlib import Path
 
+import host_profiler
+import vllm_metrics
+import watchdog
+
 # =========================
 # ⚙️ GLOBAL SETTINGS
 # =========================
@@ -277,12 +281,14 @@ def run_throughput(model, tp_size):
     ids_cmd = " ".join(cmd)
     log(f"CMD: {ids_cmd}")
 
-    try: 
-        subprocess.run(cmd, check=True, env=env)
-    except: 
-        log(f"ERROR: Throughput failed {model}")
+    # Killed if it stops making progress (see watchdog.py), so the queue moves on
+    run = watchdog.run(cmd, env=env)
+    if run["failure"]:
+        # No result file: the next run retries it
+        log(f"ERROR: Throughput failed {model}: {run['failure']} {run['salvaged'] or ''}")
 
-def run_latency(model, tp_size):
+def run_latency(model, tp_size, profile=None):
+    """Latency sweep over QPS_SWEEP. `profile` ("cpu" or "py-spy") adds a host_profiler verdict per QPS."""
     if tp_size not in MODEL_TABLE[model]["valid_tp"]: return
     model_safe = model.replace("/", "_")
 
@@ -333,9 +339,20 @@ def run_latency(model, tp_size):
             if dataset_path: bench_cmd.extend(["--dataset-name", "sharegpt", "--dataset-path", dataset_path])
             else: bench_cmd.extend(["--dataset-name", "random", "--random-input-len", "1024", "--random-output-len", "512"])
 
-            res = subprocess.run(bench_cmd, capture_output=True, text=True, env=env)
+            # Partial output of a killed run is kept: the metrics it printed are still parsed
+            stem = f"{model_safe}_tp{tp_size}_qps{qps}"
+            profiler = (host_profiler.HostProfiler(proc.pid, pyspy=profile == "py-spy", pyspy_out=RESULTS_DIR / f"{stem}_pyspy.txt")
+                        if profile else contextlib.nullcontext())
+            with vllm_metrics.MetricsScraper(f"http://{HOST}:{PORT}") as scraper, profiler:
+                res = watchdog.run(bench_cmd, env=env, echo=False)
+            server_metrics = scraper.save(RESULTS_DIR / f"{stem}_metrics.json")
+            log(f"QPS={qps}: {vllm_metrics.describe(server_metrics)}")
+            host = profiler.save(RESULTS_DIR / f"{stem}_host.json") if profile else None
+            if profile:
+                log(f"QPS={qps}: {host_profiler.describe(host)}")
             with open(out_file, "w") as f:
-                f.write(json.dumps({"success": res.returncode==0, "raw_output": res.stdout}, indent=2))
+                f.write(json.dumps({"success": not res["failure"], "raw_output": res["output"], "failure": res["failure"],
+                                    "server_metrics": server_metrics, "host_profile": host}, indent=2))
 
     except Exception as e: log(f"CRASH: {e}")
     finally:
@@ -363,17 +380,20 @@ def print_summary(tps):
                     raw = ldata["raw_output"]
                     ttft = re.search(r"(?:Mean TTFT|TTFT).*?([\d\.]+)", raw).group(1)
                     tpot = re.search(r"(?:Mean TPOT|TPOT).*?([\d\.]+)", raw).group(1)
-                except: ttft, tpot = "-", "-"
+                    saturated = (ldata.get("server_metrics") or {}).get("saturated")
+                except: ttft, tpot, saturated = "-", "-", False
                 
                 name_cell = m.split('/')[-1] if (first_row and q == QPS_SWEEP[0]) else ""
                 
-                print(f"{name_cell:<40} | {tp:<2} | {tok_s:<8} | {q:<4} | {ttft:<6} | {tpot:<6}")
+                print(f"{name_cell:<40} | {tp:<2} | {tok_s:<8} | {q:<4} | {ttft:<6} | {tpot:<6}" + (" | KV saturated" if saturated else ""))
                 first_row = False
             print("-" * 105)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--tp", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--profile-host", choices=["cpu", "py-spy"],
+                        help="Profile server CPU during each latency run (py-spy: also hot Python frames) for a CPU- vs GPU-bound verdict")
     args = parser.parse_args()
     
     gpu_count = get_gpu_count()
@@ -388,5 +408,5 @@ if __name__ == "__main__":
     for tp in valid_tp_args:
         for m in MODELS_TO_RUN:
             run_throughput(m, tp)
-            run_latency(m, tp)
+            run_latency(m, tp, args.profile_host)
     print_summary(valid_tp_args)
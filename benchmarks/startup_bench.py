@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Startup latency benchmark: how long from launch to "Application startup complete".
+
+Launches `vllm serve` the way start-vllm does, per model / TP / attention backend,
+once with the launcher's "Erase vLLM Cache" ON (cold: vLLM, Triton and AITER JIT
+caches wiped) and once with it OFF (warm: caches left by the cold run). Each run
+is broken into phases from the arrival time of the server's own log lines
+(see analyze_server_logs.PHASES), plus the Python import time before the first
+log line:
+
+    import -> startup -> weight_load -> compile -> kv_profile -> graph_capture -> ready
+
+With --importtime the server runs under `python -X importtime` and the slowest
+modules (cumulative) are stored with the result.
+
+Results land in ~/vllm_benchmark_results/startup/{triton,rocm,aiter}/ as
+`{model}_tp{N}_{cold|warm}_startup.json`, which aggregate_results picks up as kind
+"startup" (results_warehouse query --kind startup, compare_results for regressions).
+
+The orchestration works without a GPU against the stub in tests/ (also what
+tests/test_startup_bench.py runs):
+
+    python startup_bench.py --vllm-bin tests/fake_vllm.py --model Llama --backends Triton
+"""
+import subprocess, time, json, sys, os, argparse, shutil, threading, re
+from pathlib import Path
+
+try:
+    from run_vllm_bench import MODEL_TABLE, MODELS_TO_RUN, RESULTS_DIR, get_gpu_count, kill_vllm, get_model_args
+except ImportError:
+    print("Error: Could not import run_vllm_bench.py. Make sure it is in the same directory.")
+    sys.exit(1)
+
+import analyze_server_logs
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HOST = "127.0.0.1"
+PORT = 8000
+STARTUP_TIMEOUT = 1800
+TOP_IMPORTS = 25
+
+OUT_DIR = RESULTS_DIR / "startup"
+# Launcher backend name -> (results sub-directory, --attention-backend, extra env)
+BACKENDS = {
+    "Triton": ("triton", "TRITON_ATTN", {}),
+    "ROCm":   ("rocm", "ROCM_ATTN", {}),
+    "AITER":  ("aiter", "ROCM_ATTN", {"VLLM_ROCM_USE_AITER": "1"}),
+}
+# Same set start_vllm.nuke_vllm_cache() wipes
+CACHE_DIRS = [Path.home() / ".cache" / "vllm", Path.home() / ".triton" / "cache", Path.home() / ".aiter"]
+
+# "import time:       412 |       1034 |   vllm.config"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+def log(msg): print(f"\n[STARTUP] {msg}", flush=True)
+
+def clear_caches():
+    for cache_dir in CACHE_DIRS:
+        if cache_dir.exists():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+def build_cmd(model, tp, backend, vllm_bin, importtime):
+    _, attn_backend, _ = BACKENDS[backend]
+    vllm_path = shutil.which(vllm_bin) or vllm_bin
+    cmd = [sys.executable, "-X", "importtime", vllm_path] if importtime else [vllm_path]
+    cmd += ["serve"] + get_model_args(model, tp) + [
+        "--host", HOST, "--port", str(PORT),
+        "--attention-backend", attn_backend,
+        "--mm-encoder-attn-backend", "TRITON_ATTN",
+    ]
+    return cmd
+
+def top_imports(path, limit=TOP_IMPORTS):
+    """Slowest modules by cumulative import time from a -X importtime stderr log."""
+    rows = []
+    try:
+        for line in Path(path).read_text(errors="replace").splitlines():
+            m = IMPORTTIME_RE.match(line)
+            if m:
+                rows.append((m.group(3), int(m.group(2)) / 1e6))
+    except OSError:
+        return []
+    # The engine core child process imports vllm again: keep each module's worst
+    seen = set()
+    result = []
+    for name, cumulative in sorted(rows, key=lambda r: -r[1]):
+        if name not in seen:
+            seen.add(name)
+            result.append({"module": name, "cumulative_s": round(cumulative, 3)})
+    return result[:limit]
+
+def time_startup(cmd, env, log_path, stderr_path):
+    """
+    Runs the server until it is ready (or dies / times out), timestamping every
+    stdout line on arrival. Returns (spawn_time, ready_time, [(arrival_time, line)], error);
+    `lines` also holds the shutdown output, so ready_time is the ready line's arrival.
+    """
+    lines = []
+    ready_at = []
+    ready = threading.Event()
+    ready_pattern = re.compile(analyze_server_logs.PHASES[-1][1])
+
+    with open(log_path, "w") as srv_log, open(stderr_path, "w") as srv_err:
+        start = time.time()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=srv_err, env=env, text=True,
+                                errors="replace", start_new_session=True)
+
+        def reader():
+            for line in proc.stdout:
+                lines.append((time.time(), line))
+                srv_log.write(line)
+                if ready_pattern.search(line) and not ready.is_set():
+                    ready_at.append(lines[-1][0])
+                    ready.set()
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+
+        error = None
+        while not ready.is_set():
+            if proc.poll() is not None:
+                thread.join(timeout=5)
+                error = None if ready.is_set() else f"Server exited with code {proc.returncode}"
+                break
+            if time.time() - start > STARTUP_TIMEOUT:
+                error = f"Not ready after {STARTUP_TIMEOUT}s"
+                break
+            ready.wait(0.5)
+
+        try:
+            os.killpg(proc.pid, 15)
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, 9)
+            proc.wait()
+        except ProcessLookupError:
+            pass
+        thread.join(timeout=5)
+    return start, ready_at[0] if ready_at else None, lines, error
+
+def phase_breakdown(start, lines):
+    """Phase durations from line arrival times (sub-second, unlike the log stamps)."""
+    phases = {"import": lines[0][0] - start} if lines else {}
+    prev = lines[0][0] if lines else start
+    pending = list(analyze_server_logs.PHASES)
+    for arrived, line in lines:
+        for name, pattern in pending:
+            if re.search(pattern, line):
+                phases[name] = arrived - prev
+                prev = arrived
+                pending.remove((name, pattern))
+                break
+    for name, _ in pending:
+        phases[name] = None
+    return {k: round(v, 2) if v is not None else None for k, v in phases.items()}
+
+def run_startup(model, tp, backend, cache_mode, args):
+    subdir, _, backend_env = BACKENDS[backend]
+    out_dir = OUT_DIR / subdir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{model.replace('/', '_')}_tp{tp}_{cache_mode}"
+    out_file = out_dir / f"{stem}_startup.json"
+    if out_file.exists() and not args.force:
+        log(f"SKIP {model} (TP={tp} | {backend} | {cache_mode})")
+        return json.loads(out_file.read_text())
+
+    log(f"START {model} (TP={tp} | {backend} | {cache_mode})")
+    kill_vllm()
+    if cache_mode == "cold":
+        clear_caches()
+
+    env = os.environ.copy()
+    env["PYTHONUNBUFFERED"] = "1" # Line arrival time is our clock
+    if not args.keep_compile_cache:
+        env["VLLM_DISABLE_COMPILE_CACHE"] = "1" # As start-vllm launches it
+    env.pop("VLLM_ROCM_USE_AITER", None)
+    env.update(backend_env)
+    env.update(MODEL_TABLE[model].get("env", {}))
+
+    cmd = build_cmd(model, tp, backend, args.vllm_bin, args.importtime)
+    log(f"CMD: {' '.join(cmd)}")
+    start, ready_time, lines, error = time_startup(cmd, env, out_dir / f"{stem}_startup.log", out_dir / f"{stem}_startup_stderr.log")
+    text = "".join(line for _, line in lines)
+
+    # Shutdown output after the ready line is not part of startup
+    phases = phase_breakdown(start, [l for l in lines if ready_time is None or l[0] <= ready_time])
+    result = {
+        "model": model, "tp": tp, "backend": backend, "cache": cache_mode,
+        "keep_compile_cache": args.keep_compile_cache,
+        "vllm_version": analyze_server_logs.analyze(text)["version"],
+        "time_to_ready_s": None if error else round(ready_time - start, 2),
+        "phases": phases,
+        "facts": analyze_server_logs.extract_facts(text),
+        "top_imports": top_imports(out_dir / f"{stem}_startup_stderr.log") if args.importtime else [],
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if error:
+        result["error"] = error
+        log(f"ERROR: {error}")
+    else:
+        log(f"READY in {result['time_to_ready_s']:.1f}s")
+    out_file.write_text(json.dumps(result, indent=2))
+    kill_vllm()
+    return result
+
+def print_summary(results):
+    names = ["import"] + [name for name, _ in analyze_server_logs.PHASES]
+    print(f"\n{'MODEL':<40} | {'TP':<2} | {'Backend':<7} | {'Cache':<5} | " + " | ".join(f"{n[:8]:>8}" for n in names) + f" | {'Total':>7}")
+    print("-" * 160)
+    for r in results:
+        cells = " | ".join(f"{r['phases'].get(n):>8.1f}" if r["phases"].get(n) is not None else f"{'-':>8}" for n in names)
+        total = f"{r['time_to_ready_s']:>7.1f}" if r.get("time_to_ready_s") is not None else f"{'FAIL':>7}"
+        print(f"{r['model'].split('/')[-1][:40]:<40} | {r['tp']:<2} | {r['backend']:<7} | {r['cache']:<5} | {cells} | {total}")
+    print("-" * 160)
+    for r in results:
+        if r.get("top_imports"):
+            print(f"\nSlowest imports ({r['model'].split('/')[-1]}, {r['backend']}, {r['cache']}):")
+            for row in r["top_imports"][:10]:
+                print(f"  {row['cumulative_s']:>7.3f}s  {row['module']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure vllm serve time-to-ready with cold and warm caches")
+    parser.add_argument("--model", type=str, help="Filter to run only this model (substring match)")
+    parser.add_argument("--tp", type=int, help="TP size (default: smallest valid TP per model)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=["Triton"])
+    parser.add_argument("--cache", nargs="+", choices=["cold", "warm"], default=["cold", "warm"],
+                        help="cold = launcher 'Erase vLLM Cache' ON, warm = OFF (run cold first)")
+    parser.add_argument("--keep-compile-cache", action="store_true", help="Do not set VLLM_DISABLE_COMPILE_CACHE=1 (the launcher does)")
+    parser.add_argument("--importtime", action="store_true", help="Profile Python imports with -X importtime")
+    parser.add_argument("--vllm-bin", type=str, default="vllm", help="vllm executable (a stub works for testing)")
+    parser.add_argument("--force", action="store_true", help="Re-run configurations that already have results")
+    args = parser.parse_args()
+
+    gpu_count = get_gpu_count()
+    results = []
+    for model in MODELS_TO_RUN:
+        if args.model and args.model not in model:
+            continue
+        valid_tps = [t for t in MODEL_TABLE[model]["valid_tp"] if t <= gpu_count]
+        tp = args.tp if args.tp else (min(valid_tps) if valid_tps else None)
+        if tp is None or tp not in MODEL_TABLE[model]["valid_tp"]:
+            continue
+        for backend in args.backends:
+            for cache_mode in args.cache:
+                results.append(run_startup(model, tp, backend, cache_mode, args))
+
+    if results:
+        print_summary(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Stub `vllm` for running the benchmark orchestration without a GPU.
+
+`fake_vllm.py serve <model> ...` prints the startup log lines the benchmarks
+parse (analyze_server_logs.PHASES), then idles until SIGTERM and prints
+shutdown output before exiting, like a real server.
+
+    FAKE_VLLM_PHASE_S      delay before each phase line (default 0.1)
+    FAKE_VLLM_SHUTDOWN_S   time spent shutting down after SIGTERM (default 0)
+    FAKE_VLLM_FAIL         exit with code 1 before the server is ready
+"""
+import os
+import signal
+import sys
+import time
+
+PHASE_S = float(os.getenv("FAKE_VLLM_PHASE_S", "0.1"))
+SHUTDOWN_S = float(os.getenv("FAKE_VLLM_SHUTDOWN_S", "0"))
+
+LINES = [
+    "INFO 01-01 00:00:00 [api_server.py:1] vLLM API server version 0.0.0.fake",
+    "INFO 01-01 00:00:00 [gpu_model_runner.py:1] Starting to load model {model}...",
+    "INFO 01-01 00:00:00 [gpu_model_runner.py:1] Model loading took 14.9876 GiB memory and 1.000000 seconds",
+    "INFO 01-01 00:00:00 [backends.py:1] torch.compile takes 1.00 s in total",
+    "INFO 01-01 00:00:00 [gpu_worker.py:1] Available KV cache memory: 12.00 GiB",
+    "INFO 01-01 00:00:00 [kv_cache_utils.py:1] GPU KV cache size: 98,304 tokens",
+    "INFO 01-01 00:00:00 [gpu_model_runner.py:1] Graph capturing finished in 1 secs, took 0.50 GiB",
+    "INFO 01-01 00:00:00 [launcher.py:1] Application startup complete.",
+]
+
+def shutdown(*_):
+    print("INFO 01-01 00:00:00 [launcher.py:1] Shutting down FastAPI HTTP server.", flush=True)
+    time.sleep(SHUTDOWN_S)
+    print("INFO 01-01 00:00:00 [launcher.py:1] Finished server process", flush=True)
+    sys.exit(0)
+
+def main():
+    if sys.argv[1:2] != ["serve"] or len(sys.argv) < 3:
+        print("usage: fake_vllm.py serve <model> [args...]", file=sys.stderr)
+        sys.exit(2)
+    signal.signal(signal.SIGTERM, shutdown)
+    for line in LINES:
+        time.sleep(PHASE_S)
+        if os.getenv("FAKE_VLLM_FAIL") and "Application startup complete" in line:
+            print("ERROR 01-01 00:00:00 [core.py:1] EngineCore failed to start.", flush=True)
+            sys.exit(1)
+        print(line.format(model=sys.argv[2]), flush=True)
+    while True:
+        time.sleep(1)
+
+if __name__ == "__main__":
+    main()
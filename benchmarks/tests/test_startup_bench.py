@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+startup_bench orchestration against tests/fake_vllm.py (no GPU needed):
+
+    python -m unittest discover -s benchmarks/tests
+"""
+import argparse
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(TESTS_DIR.parent))
+
+import startup_bench
+
+FAKE_VLLM = str(TESTS_DIR / "fake_vllm.py")
+
+class StartupBenchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ)
+        self.patched = {name: getattr(startup_bench, name) for name in ("OUT_DIR", "kill_vllm", "clear_caches")}
+        startup_bench.OUT_DIR = Path(self.tmp.name)
+        startup_bench.kill_vllm = lambda: None # Would pkill real servers
+        startup_bench.clear_caches = lambda: None # Would wipe the real ~/.cache/vllm
+        self.model = startup_bench.MODELS_TO_RUN[0]
+        self.args = argparse.Namespace(force=True, keep_compile_cache=False, vllm_bin=FAKE_VLLM, importtime=False)
+
+    def tearDown(self):
+        for name, value in self.patched.items():
+            setattr(startup_bench, name, value)
+        os.environ.clear()
+        os.environ.update(self.env)
+        self.tmp.cleanup()
+
+    def run_startup(self, cache_mode="warm"):
+        return startup_bench.run_startup(self.model, 1, "Triton", cache_mode, self.args)
+
+    def test_ready_time_excludes_shutdown(self):
+        os.environ.update({"FAKE_VLLM_PHASE_S": "0.1", "FAKE_VLLM_SHUTDOWN_S": "2"})
+        result = self.run_startup()
+        self.assertNotIn("error", result)
+        # 8 lines x 0.1s to ready, then 2s of shutdown output that must not count
+        self.assertGreaterEqual(result["time_to_ready_s"], 0.7)
+        self.assertLess(result["time_to_ready_s"], 2.0)
+        self.assertTrue(all(result["phases"][name] is not None for name, _ in startup_bench.analyze_server_logs.PHASES))
+        self.assertEqual(result["facts"]["kv_cache_tokens"], 98304)
+        self.assertTrue((Path(self.tmp.name) / "triton" / f"{self.model.replace('/', '_')}_tp1_warm_startup.json").exists())
+
+    def test_server_exit_is_an_error(self):
+        os.environ.update({"FAKE_VLLM_PHASE_S": "0", "FAKE_VLLM_FAIL": "1"})
+        result = self.run_startup("cold")
+        self.assertEqual(result["error"], "Server exited with code 1")
+        self.assertIsNone(result["time_to_ready_s"])
+        self.assertIsNone(result["phases"]["ready"])
+
+if __name__ == "__main__":
+    unittest.main()
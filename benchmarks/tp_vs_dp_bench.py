@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+TP vs DP decision benchmark.
+
+For every model whose valid_tp allows both 1 and 2, serves it twice on the same
+two GPUs and drives both setups with the same `vllm bench serve` load:
+
+    tp2   one `vllm serve --tensor-parallel-size 2`
+    dp2   two TP=1 `vllm serve` replicas (one per GPU of the pair) behind vllm-proxy
+
+The pair is the best-connected two of the visible GPUs (HIP_VISIBLE_DEVICES
+if set, else every gfx1201), as start-vllm picks its TP group.
+
+Per request rate it records aggregate output throughput and p50/p99 TTFT,
+TPOT and end-to-end latency. It also records max context: the verified
+single-user limit from max_context_results.json and the KV cache size each
+server reports at startup. The topology with more saturated throughput is
+recommended unless the verified context shrinks below --min-context.
+
+Outputs (under ~/vllm_benchmark_results/tp_vs_dp/):
+    {model}_{topology}_qps{q}_serve.json      raw `vllm bench serve --save-result` output
+    {model}_{topology}_qps{q}_metrics.json    /metrics time series of the servers during the run
+    {model}_{topology}_qps{q}_host.json       with --profile-host: per-process CPU samples and verdict
+    {model}_tp{N}_{tag}_server.log            server logs (readable by analyze_server_logs.py)
+    ../tp_vs_dp_results.json                  one row per model, read by start-vllm
+"""
+import subprocess, time, json, sys, os, requests, argparse, shutil, contextlib, signal
+from pathlib import Path
+
+try:
+    from run_vllm_bench import MODEL_TABLE, MODELS_TO_RUN, RESULTS_DIR, DEFAULT_BATCH_TOKENS, get_gpu_count, kill_vllm, nuke_vllm_cache, get_dataset, get_model_args
+except ImportError:
+    print("Error: Could not import run_vllm_bench.py. Make sure it is in the same directory.")
+    sys.exit(1)
+
+import aggregate_results
+import analyze_server_logs
+import gpu_inventory
+import host_profiler
+import vllm_metrics
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HOST = "127.0.0.1"
+PORT = 8000              # TP=2 server / first DP replica (replica i on PORT+i)
+PROXY_PORT = 8100
+QPS_SWEEP = ["2.0", "8.0", "inf"] # "inf" = all prompts at once: saturated throughput
+NUM_PROMPTS = 400
+MAX_CONCURRENCY = 128
+STARTUP_TIMEOUT = 1200
+STOP_TIMEOUT = 30        # Seconds between SIGTERM and SIGKILL of a server's process group
+MIN_CONTEXT = 8192       # DP is not recommended if TP=1 cannot serve at least this context
+WIN_MARGIN = 0.05        # Throughput delta below 5% counts as a tie -> keep the simpler TP=2
+
+OUT_DIR = RESULTS_DIR / "tp_vs_dp"
+SUMMARY_FILE = RESULTS_DIR / "tp_vs_dp_results.json"
+
+# `vllm bench serve --save-result` fields kept per run
+SERVE_FIELDS = [
+    "completed", "request_throughput", "output_throughput", "total_token_throughput",
+    "median_ttft_ms", "p99_ttft_ms", "median_tpot_ms", "p99_tpot_ms", "median_e2el_ms", "p99_e2el_ms",
+]
+
+def log(msg): print(f"\n[TP-DP] {msg}", flush=True)
+
+def find_proxy():
+    """vllm-proxy in the image, scripts/vllm_proxy.py in a checkout."""
+    installed = shutil.which("vllm-proxy")
+    if installed:
+        return [installed]
+    return [sys.executable, str(Path(__file__).resolve().parent.parent / "scripts" / "vllm_proxy.py")]
+
+def wait_for_server(url, procs, timeout=STARTUP_TIMEOUT):
+    start = time.time()
+    while time.time() - start < timeout:
+        if any(p.poll() is not None for p in procs):
+            log("CRITICAL: A server died during startup.")
+            return False
+        try:
+            if requests.get(f"{url}/v1/models", timeout=2).status_code == 200:
+                return True
+        except: pass
+        time.sleep(2)
+    log(f"Timeout after {timeout}s waiting for {url}")
+    return False
+
+def gpu_pair():
+    """
+    The two GPUs both topologies run on: the best-connected pair (see
+    gpu_inventory.best_group) of HIP_VISIBLE_DEVICES, else of the gfx1201 GPUs.
+    """
+    visible = os.environ.get("HIP_VISIBLE_DEVICES") or gpu_inventory.visible_devices() or "0,1"
+    visible = [d.strip() for d in visible.split(",") if d.strip()]
+    if all(d.isdigit() for d in visible):
+        group = gpu_inventory.best_group(2, [int(d) for d in visible])
+        if group:
+            return [str(i) for i in group]
+    return visible[:2]
+
+def stop_server(proc):
+    """Stops the server's whole session: vllm serve spawns engine-core workers."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+def start_server(model, tp, port, srv_log, gpus):
+    # Cap the configured context at what was verified to start for this TP
+    overrides = {}
+    ctx = verified_context(model, tp)
+    if ctx and ctx < int(MODEL_TABLE[model].get("ctx", ctx)):
+        overrides["ctx"] = ctx
+    cmd = ["vllm", "serve"] + get_model_args(model, tp, overrides) + [
+        "--host", HOST, "--port", str(port),
+        "--max-num-batched-tokens", str(MODEL_TABLE[model].get("max_tokens", DEFAULT_BATCH_TOKENS)),
+        "--attention-backend", "TRITON_ATTN",
+    ]
+    env = os.environ.copy()
+    env["VLLM_DISABLE_COMPILE_CACHE"] = "1"
+    env["HIP_VISIBLE_DEVICES"] = gpus
+    env.update(MODEL_TABLE[model].get("env", {}))
+    log(f"CMD (HIP_VISIBLE_DEVICES={gpus}): {' '.join(cmd)}")
+    return subprocess.Popen(cmd, stdout=srv_log, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+
+def run_load(model, base_url, topology, dataset_path, metrics_urls, server_pids, profile=None):
+    """
+    Runs the QPS sweep against base_url, scraping /metrics of every server in
+    metrics_urls (the proxy has none). With `profile` ("cpu" or "py-spy") the
+    process trees of server_pids are profiled by host_profiler too.
+    Returns {qps: {field: value}}.
+    """
+    model_safe = model.replace("/", "_")
+    runs = {}
+    for qps in QPS_SWEEP:
+        result_file = f"{model_safe}_{topology}_qps{qps}_serve.json"
+        log(f"BENCH {topology} QPS={qps}...")
+        cmd = [
+            "vllm", "bench", "serve",
+            "--model", model,
+            "--base-url", base_url,
+            "--request-rate", qps,
+            "--num-prompts", str(NUM_PROMPTS),
+            "--max-concurrency", str(MAX_CONCURRENCY),
+            "--percentile-metrics", "ttft,tpot,e2el",
+            "--metric-percentiles", "50,99",
+            "--save-result", "--result-dir", str(OUT_DIR), "--result-filename", result_file,
+            "--trust-remote-code"
+        ]
+        if dataset_path: cmd.extend(["--dataset-name", "sharegpt", "--dataset-path", dataset_path])
+        else: cmd.extend(["--dataset-name", "random", "--random-input-len", "1024", "--random-output-len", "512"])
+
+        stem = f"{model_safe}_{topology}_qps{qps}"
+        profiler = (host_profiler.HostProfiler(server_pids, pyspy=profile == "py-spy", pyspy_out=OUT_DIR / f"{stem}_pyspy.txt")
+                    if profile else contextlib.nullcontext())
+        with vllm_metrics.MetricsScraper(metrics_urls) as scraper, profiler:
+            res = subprocess.run(cmd, capture_output=True, text=True)
+        server_metrics = scraper.save(OUT_DIR / f"{stem}_metrics.json")
+        log(f"{topology} QPS={qps}: {vllm_metrics.describe(server_metrics)}")
+        host = profiler.save(OUT_DIR / f"{stem}_host.json") if profile else None
+        if profile:
+            log(f"{topology} QPS={qps}: {host_profiler.describe(host)}")
+        try:
+            data = json.loads((OUT_DIR / result_file).read_text())
+            runs[qps] = {k: data.get(k) for k in SERVE_FIELDS}
+            runs[qps]["server_metrics"] = server_metrics
+            if host:
+                runs[qps]["host_profile"] = host
+        except Exception:
+            log(f"ERROR: no result for {topology} QPS={qps} (rc={res.returncode})")
+            runs[qps] = {"error": res.stderr[-500:] if res.stderr else "Failed"}
+    return runs
+
+def kv_tokens(log_paths):
+    """Total KV cache tokens reported by the servers' startup logs."""
+    total = 0
+    for path in log_paths:
+        try:
+            total += int(analyze_server_logs.extract_facts(Path(path).read_text(errors="replace")).get("kv_cache_tokens", 0))
+        except Exception: pass
+    return total or None
+
+def verified_context(model, tp):
+    """Best verified single-user context for (model, tp) from max_context_results.json."""
+    probes = aggregate_results.collect([aggregate_results.BENCH_DIR / aggregate_results.MAX_CONTEXT_FILE])
+    values = [r["metrics"]["max_context"] for r in probes if r["model"] == model and r["tp"] == tp and not r["error"] and not r["tag"]]
+    return max(values) if values else None
+
+def bench_topology(model, topology, dataset_path, profile=None):
+    model_safe = model.replace("/", "_")
+    kill_vllm()
+    nuke_vllm_cache()
+
+    gpus = gpu_pair()
+    if len(gpus) < 2:
+        return {"error": f"Need 2 visible GPUs, have {','.join(gpus) or 'none'}"}
+    procs = []
+    with contextlib.ExitStack() as files:
+        if topology == "tp2":
+            logs = [OUT_DIR / f"{model_safe}_tp2_tpdp_server.log"]
+            procs.append(start_server(model, 2, PORT, files.enter_context(open(logs[0], "w")), ",".join(gpus)))
+            base_url = f"http://{HOST}:{PORT}"
+            metrics_urls = [base_url]
+            ready = wait_for_server(base_url, procs)
+        else:
+            logs = [OUT_DIR / f"{model_safe}_tp1_dp{i}_server.log" for i in range(2)]
+            metrics_urls = [f"http://{HOST}:{PORT + i}" for i in range(2)]
+            # Replica 0 first so JIT kernel builds are not raced by replica 1
+            procs.append(start_server(model, 1, PORT, files.enter_context(open(logs[0], "w")), gpus[0]))
+            ready = wait_for_server(f"http://{HOST}:{PORT}", procs)
+            if ready:
+                procs.append(start_server(model, 1, PORT + 1, files.enter_context(open(logs[1], "w")), gpus[1]))
+                ready = wait_for_server(f"http://{HOST}:{PORT + 1}", procs)
+            if ready:
+                proxy_log = files.enter_context(open(OUT_DIR / f"{model_safe}_dp2_proxy.log", "w"))
+                procs.append(subprocess.Popen(find_proxy() + ["--host", HOST, "--port", str(PROXY_PORT), "--ports", str(PORT), str(PORT + 1)],
+                                              stdout=proxy_log, stderr=subprocess.STDOUT, start_new_session=True))
+                base_url = f"http://{HOST}:{PROXY_PORT}"
+                ready = wait_for_server(base_url, procs, timeout=30)
+
+        try:
+            if not ready:
+                return {"error": "Server did not start"}
+            time.sleep(5) # Stabilize
+            runs = run_load(model, base_url, topology, dataset_path, metrics_urls, [p.pid for p in procs], profile)
+            return {"runs": runs, "kv_cache_tokens": kv_tokens(logs), "gpus": ",".join(gpus)}
+        finally:
+            for p in procs:
+                stop_server(p)
+            kill_vllm()
+
+def recommend(model, tp2, dp2, min_context):
+    """Picks a topology from saturated throughput, guarded by verified TP=1 context."""
+    def saturated(result):
+        runs = result.get("runs", {})
+        return (runs.get(QPS_SWEEP[-1]) or {}).get("output_throughput") or 0
+
+    tp_tps, dp_tps = saturated(tp2), saturated(dp2)
+    ctx_tp1 = verified_context(model, 1)
+    if not dp_tps and not tp_tps:
+        return None, "Both topologies failed"
+    if not dp_tps:
+        return "tp2", "DP replicas failed"
+    if not tp_tps:
+        return "dp2", "TP=2 failed"
+
+    gain = (dp_tps - tp_tps) / tp_tps
+    if gain > WIN_MARGIN:
+        if ctx_tp1 is not None and ctx_tp1 < min_context:
+            return "tp2", f"DP +{gain:.0%} tok/s but TP=1 context is only {ctx_tp1}"
+        return "dp2", f"DP +{gain:.0%} tok/s"
+    if gain < -WIN_MARGIN:
+        return "tp2", f"TP=2 +{-gain / (1 + gain):.0%} tok/s"
+    return "tp2", f"Tie ({gain:+.0%}): TP=2 keeps the larger context"
+
+def print_summary(rows):
+    print(f"\n{'MODEL':<40} | {'Topo':<4} | {'QPS':<4} | {'Out tok/s':<9} | {'p50 TTFT':<8} | {'p99 TTFT':<8} | {'p50 E2E':<8} | {'p99 E2E':<8} | {'Ctx':<6} | {'KV tok':<9}")
+    print("-" * 130)
+    for row in rows:
+        name = row["model"].split("/")[-1]
+        for topo in ("tp2", "dp2"):
+            result = row[topo]
+            ctx = row["max_context"][topo]
+            kv = result.get("kv_cache_tokens")
+            for qps, run in (result.get("runs") or {"-": {"error": result.get("error")}}).items():
+                if run.get("error"):
+                    print(f"{name:<40} | {topo:<4} | {qps:<4} | FAILED")
+                    name = ""
+                    continue
+                f = lambda k: f"{run[k]:.0f}" if run.get(k) is not None else "-"
+                print(f"{name:<40} | {topo:<4} | {qps:<4} | {f('output_throughput'):<9} | {f('median_ttft_ms'):<8} | {f('p99_ttft_ms'):<8} | "
+                      f"{f('median_e2el_ms'):<8} | {f('p99_e2el_ms'):<8} | {ctx or '-':<6} | {kv or '-':<9}"
+                      + (" | KV saturated" if (run.get("server_metrics") or {}).get("saturated") else ""))
+                name = ""
+        for topo in ("tp2", "dp2"):
+            host = ((row[topo].get("runs") or {}).get(QPS_SWEEP[-1]) or {}).get("host_profile")
+            if host:
+                print(f"{'':<40}   {topo} at QPS={QPS_SWEEP[-1]}: {host['verdict']} - {host['advice']}")
+        print(f"{'':<40}   => {row['recommendation'] or 'n/a'}: {row['reason']}")
+        print("-" * 130)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TP=2 against 2x TP=1 replicas behind vllm-proxy")
+    parser.add_argument("--model", type=str, help="Filter to run only this model (substring match)")
+    parser.add_argument("--min-context", type=int, default=MIN_CONTEXT, help="Minimum TP=1 verified context before DP is recommended")
+    parser.add_argument("--force", action="store_true", help="Re-run models already in the summary")
+    parser.add_argument("--profile-host", choices=["cpu", "py-spy"],
+                        help="Profile server CPU per run (py-spy: also hot Python frames) for a CPU- vs GPU-bound verdict")
+    args = parser.parse_args()
+
+    if get_gpu_count() < 2:
+        log("Need at least 2 GPUs to compare TP=2 with 2 replicas.")
+        sys.exit(0)
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    summary = []
+    if SUMMARY_FILE.exists():
+        try: summary = json.loads(SUMMARY_FILE.read_text())
+        except Exception as e: log(f"Warning: could not read {SUMMARY_FILE}: {e}")
+
+    dataset_path = get_dataset()
+    for model in MODELS_TO_RUN:
+        if args.model and args.model not in model:
+            continue
+        if not {1, 2} <= set(MODEL_TABLE[model]["valid_tp"]):
+            continue
+        if not args.force and any(r["model"] == model for r in summary):
+            log(f"SKIP {model} (in {SUMMARY_FILE.name}, use --force)")
+            continue
+
+        log(f"START {model}: TP=2 vs 2x TP=1")
+        tp2 = bench_topology(model, "tp2", dataset_path, args.profile_host)
+        dp2 = bench_topology(model, "dp2", dataset_path, args.profile_host)
+        topo, reason = recommend(model, tp2, dp2, args.min_context)
+        row = {
+            "model": model, "tp2": tp2, "dp2": dp2,
+            "max_context": {"tp2": verified_context(model, 2), "dp2": verified_context(model, 1)},
+            "recommendation": topo, "reason": reason, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        log(f"{model}: {topo} ({reason})")
+
+        summary = [r for r in summary if r["model"] != model] + [row]
+        SUMMARY_FILE.write_text(json.dumps(summary, indent=2))
+
+    print_summary([r for r in summary if not args.model or args.model in r["model"]])
+
+if __name__ == "__main__":
+    main()
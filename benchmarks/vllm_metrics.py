@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Reader for vLLM's Prometheus `/metrics` endpoint, shared by the launcher and
+the online benchmarks. Standard library only.
+
+Names changed across vLLM releases (V0 `gpu_cache_usage_perc` vs V1
+`kv_cache_usage_perc`, V0 `gpu_prefix_cache_hit_rate` gauge vs V1
+`prefix_cache_hits_total` / `prefix_cache_queries_total` counters), so the
+helpers accept either.
+
+MetricsScraper polls the headline series at a fixed interval while a benchmark
+runs (`vllm bench serve`, a context verification request) and summarizes them:
+peak/mean KV cache usage, preemptions and queue depth. A run is flagged
+"saturated" when the KV cache sat full and the scheduler kept preempting, which
+averages over the whole run can hide.
+
+    python vllm_metrics.py http://127.0.0.1:8000     # print the headline gauges/counters
+    python vllm_metrics.py http://127.0.0.1:8000 --watch 60 --out run_metrics.json
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+FETCH_TIMEOUT = 5
+SCRAPE_INTERVAL = 1.0
+KV_FULL = 0.99          # kv_usage at or above this counts as full
+SATURATED_SHARE = 0.10  # Flag when the cache was full, and preemptions grew, in 10%+ of the scrapes
+
+# `name{label="value",...} 1.0` (timestamp suffix ignored)
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+# Headline series -> candidate metric names, newest vLLM first
+SERIES = {
+    "running":        ["vllm:num_requests_running"],
+    "waiting":        ["vllm:num_requests_waiting"],
+    "kv_usage":       ["vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc"],
+    "preemptions":    ["vllm:num_preemptions_total", "vllm:num_preemptions"],
+    "prefix_queries": ["vllm:prefix_cache_queries_total", "vllm:prefix_cache_queries"],
+    "prefix_hits":    ["vllm:prefix_cache_hits_total", "vllm:prefix_cache_hits"],
+    "prefix_hit_rate": ["vllm:gpu_prefix_cache_hit_rate"],
+    "prompt_tokens":  ["vllm:prompt_tokens_total"],
+    "generation_tokens": ["vllm:generation_tokens_total"],
+}
+
+def log(msg): print(f"[METRICS] {msg}", flush=True)
+
+def fetch(base_url, timeout=FETCH_TIMEOUT):
+    """Raw /metrics text, or None if the server is unreachable."""
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/metrics", timeout=timeout) as r:
+            return r.read().decode(errors="replace")
+    except Exception:
+        return None
+
+def parse(text):
+    """Returns {metric_name: [(labels_dict, value)]} for every sample line."""
+    samples = {}
+    for line in (text or "").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = SAMPLE_RE.match(line)
+        if not m:
+            continue
+        try:
+            value = float(m.group(3))
+        except ValueError:
+            continue
+        labels = dict(LABEL_RE.findall(m.group(2) or ""))
+        samples.setdefault(m.group(1), []).append((labels, value))
+    return samples
+
+def value(samples, names, **labels):
+    """
+    Sum of the first metric in `names` that is present (a str is one name),
+    over all label sets matching `labels`. None if none of the names exist.
+    """
+    for name in [names] if isinstance(names, str) else names:
+        if name in samples:
+            return sum(v for l, v in samples[name] if all(l.get(k) == str(want) for k, want in labels.items()))
+    return None
+
+def snapshot(base_url):
+    """Headline SERIES values from one scrape ({} if unreachable)."""
+    samples = parse(fetch(base_url))
+    if not samples:
+        return {}
+    snap = {}
+    for key, names in SERIES.items():
+        v = value(samples, names)
+        if v is not None:
+            snap[key] = v
+    return snap
+
+def prefix_hit_rate(before, after):
+    """Prefix cache hit rate (0-1) between two snapshots, None if not exported."""
+    if "prefix_queries" in after and "prefix_hits" in after:
+        queries = after["prefix_queries"] - before.get("prefix_queries", 0)
+        hits = after["prefix_hits"] - before.get("prefix_hits", 0)
+        return hits / queries if queries > 0 else None
+    # V0 only exports a running gauge
+    return after.get("prefix_hit_rate")
+
+class MetricsScraper:
+    """
+    Scrapes `base_urls` (one server, or every DP replica) every `interval`
+    seconds in a daemon thread between start() and stop(), or inside a
+    `with` block. Samples sum the replicas, except kv_usage (the fullest one).
+    """
+    def __init__(self, base_urls, interval=SCRAPE_INTERVAL):
+        self.base_urls = [base_urls] if isinstance(base_urls, str) else list(base_urls)
+        self.interval = interval
+        self.samples = []
+        self.stop_event = None
+        self.thread = None
+
+    def scrape(self):
+        snaps = [s for s in (snapshot(url) for url in self.base_urls) if s]
+        if not snaps:
+            return None
+        sample = {"t": round(time.time() - self.started, 2)}
+        for key in SERIES:
+            values = [s[key] for s in snaps if key in s]
+            if values:
+                sample[key] = max(values) if key == "kv_usage" else sum(values)
+        return sample
+
+    def _run(self, stop_event):
+        while True:
+            sample = self.scrape()
+            if sample:
+                self.samples.append(sample)
+            if stop_event.wait(self.interval):
+                return
+
+    def start(self):
+        self.samples = []
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.thread.join(timeout=FETCH_TIMEOUT * len(self.base_urls) + self.interval)
+            self.stop_event = None
+        # One last scrape so counters cover the whole run
+        sample = self.scrape()
+        if sample:
+            self.samples.append(sample)
+        return self.summary()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        return summarize(self.samples)
+
+    def save(self, path):
+        """Writes the time series and its summary to `path`. Returns the summary."""
+        summary = self.summary()
+        Path(path).write_text(json.dumps({"urls": self.base_urls, "interval_s": self.interval,
+                                          "summary": summary, "samples": self.samples}, indent=2))
+        return summary
+
+def summarize(samples):
+    """
+    {} without samples, else peak/mean KV usage, share of scrapes with a full
+    cache, preemptions over the run and the share of intervals they grew in,
+    peak/mean running and waiting requests, and `saturated` with its reasons.
+    """
+    if not samples:
+        return {}
+    series = lambda key: [s[key] for s in samples if key in s]
+    kv, waiting, running, preempt = series("kv_usage"), series("waiting"), series("running"), series("preemptions")
+    mean = lambda xs: round(sum(xs) / len(xs), 3) if xs else None
+    full_share = sum(1 for v in kv if v >= KV_FULL) / len(kv) if kv else 0
+    grew = sum(1 for a, b in zip(preempt, preempt[1:]) if b > a)
+    preempt_share = grew / (len(preempt) - 1) if len(preempt) > 1 else 0
+    summary = {
+        "samples": len(samples),
+        "duration_s": round(samples[-1]["t"] - samples[0]["t"], 2),
+        "kv_usage_peak": max(kv) if kv else None,
+        "kv_usage_mean": mean(kv),
+        "kv_full_share": round(full_share, 3),
+        "preemptions": preempt[-1] - preempt[0] if preempt else None,
+        "preempting_share": round(preempt_share, 3),
+        "waiting_peak": max(waiting) if waiting else None,
+        "waiting_mean": mean(waiting),
+        "running_peak": max(running) if running else None,
+        "running_mean": mean(running),
+        "prefix_hit_rate": prefix_hit_rate(samples[0], samples[-1]),
+    }
+    reasons = []
+    if full_share >= SATURATED_SHARE:
+        reasons.append(f"KV cache full in {full_share:.0%} of scrapes")
+    if preempt_share >= SATURATED_SHARE:
+        reasons.append(f"preempting in {preempt_share:.0%} of intervals ({summary['preemptions']:.0f} total)")
+    summary["saturated"] = len(reasons) == 2
+    summary["saturation_reasons"] = reasons
+    return summary
+
+def describe(summary):
+    """One-line summary for logs."""
+    if not summary:
+        return "no /metrics samples"
+    f = lambda v, spec: format(v, spec) if v is not None else "-"
+    line = (f"KV peak {f(summary['kv_usage_peak'], '.0%')} (mean {f(summary['kv_usage_mean'], '.0%')}), "
+            f"preemptions {f(summary['preemptions'], '.0f')}, queue peak {f(summary['waiting_peak'], '.0f')}")
+    if summary["saturated"]:
+        line += " | SATURATED: " + ", ".join(summary["saturation_reasons"])
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description="Print headline metrics of a running vLLM server")
+    parser.add_argument("url", nargs="?", default="http://127.0.0.1:8000")
+    parser.add_argument("--watch", type=float, help="Scrape for this many seconds and print the summary")
+    parser.add_argument("--interval", type=float, default=SCRAPE_INTERVAL, help="Seconds between scrapes with --watch")
+    parser.add_argument("--out", type=str, help="With --watch: also write the time series to this JSON file")
+    args = parser.parse_args()
+
+    if args.watch:
+        scraper = MetricsScraper(args.url, args.interval).start()
+        time.sleep(args.watch)
+        scraper.stop()
+        if args.out:
+            scraper.save(args.out)
+        log(describe(scraper.summary()))
+        return
+
+    snap = snapshot(args.url)
+    if not snap:
+        log(f"No metrics from {args.url}/metrics")
+        return
+    for key, v in snap.items():
+        log(f"{key:<18} {v:g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Progress-aware watchdog for benchmark subprocesses (`vllm bench throughput`,
+`vllm bench serve`, ...).
+
+run() streams the child's output (raw reads, so tqdm's carriage-return
+progress bars count as progress) and kills the whole process group once it
+has been silent for SILENCE_TIMEOUT seconds while the GPUs are idle, or
+BUSY_SILENCE_TIMEOUT seconds while they are busy (a long compile or a big
+prefill is quiet but busy; a hung RCCL init is quiet and idle). The queue then
+moves on instead of stalling overnight.
+
+Failures are typed from the furthest phase the output reached and how it
+ended, e.g. "hang in distributed init", "OOM in warmup", "crash (exit 1) in
+weight load", and whatever metrics had already been printed are salvaged.
+
+    python watchdog.py --silence 30 -- vllm bench throughput --model ...
+"""
+import argparse
+import os
+import re
+import select
+import signal
+import subprocess
+import sys
+import time
+
+try:
+    import gpu_inventory
+except ImportError:
+    gpu_inventory = None # NVIDIA trees: output silence only
+
+SILENCE_TIMEOUT = 900       # Seconds without output (GPUs idle) before a run counts as hung
+BUSY_SILENCE_TIMEOUT = 2700 # Same, while the GPUs are busy
+GPU_BUSY_PERCENT = 20       # gpu_busy_percent at or above this counts as busy
+POLL_INTERVAL = 5
+KILL_GRACE = 30             # Seconds between SIGTERM and SIGKILL
+TAIL_LINES = 40             # Output lines kept with a failure
+
+# (phase, regex of a line that starts it), in run order. The furthest phase seen
+# is where a failure happened.
+PHASES = [
+    ("engine init",      r"Initializing a V1 LLM engine|Initializing an LLM engine|vLLM API server version"),
+    ("distributed init", r"world_size=\d+|init_distributed_environment|RCCL|NCCL version"),
+    ("weight load",      r"Starting to load model"),
+    ("compile",          r"Model loading took"),
+    ("KV profiling",     r"torch\.compile takes|Memory profiling takes"),
+    ("warmup",           r"GPU KV cache size|Capturing CUDA graphs|Capturing cudagraphs"),
+    ("benchmark",        r"Graph capturing finished|Application startup complete|Processed prompts|Starting main benchmark run"),
+]
+OOM_RE = re.compile(r"out of memory|OutOfMemoryError|HIP error: out of memory|No available memory for the cache blocks"
+                    r"|insufficient memory", re.IGNORECASE)
+
+# Metrics printed by `vllm bench throughput` (last occurrence wins). A run killed
+# mid-way still has its progress bar's estimates.
+SALVAGE = {
+    "requests_per_second": r"Throughput: ([\d\.]+) requests/s",
+    "tokens_per_second":   r"Throughput: [\d\.]+ requests/s, ([\d\.]+) total tokens/s",
+    "prompts_done_pct":    r"Processed prompts:\s+(\d+)%",
+    "est_input_tok_s":     r"est\. speed input: ([\d\.]+) toks/s",
+    "est_output_tok_s":    r"est\. speed input: [\d\.]+ toks/s, output: ([\d\.]+) toks/s",
+}
+
+def log(msg): print(f"\n[WATCHDOG] {msg}", flush=True)
+
+def gpu_busy():
+    """True if any target GPU reports gpu_busy_percent >= GPU_BUSY_PERCENT, None if unknown."""
+    if gpu_inventory is None:
+        return None
+    readings = gpu_inventory.busy_percent()
+    return max(readings.values()) >= GPU_BUSY_PERCENT if readings else None
+
+def phase_reached(output):
+    """Furthest PHASES entry the output shows, 'startup' if none."""
+    reached = "startup"
+    for name, pattern in PHASES:
+        if re.search(pattern, output):
+            reached = name
+    return reached
+
+def classify(output, stalled, returncode):
+    """Typed failure string, e.g. 'hang in distributed init'."""
+    if stalled:
+        kind = stalled
+    elif OOM_RE.search(output):
+        kind = "OOM"
+    else:
+        kind = f"crash (exit {returncode})"
+    return f"{kind} in {phase_reached(output)}"
+
+def salvage(output):
+    """SALVAGE metrics found in the output (floats)."""
+    found = {}
+    for name, pattern in SALVAGE.items():
+        matches = re.findall(pattern, output)
+        if matches:
+            found[name] = float(matches[-1])
+    return found
+
+def kill_group(proc):
+    for sig, wait in ((signal.SIGTERM, KILL_GRACE), (signal.SIGKILL, 10)):
+        try:
+            os.killpg(proc.pid, sig)
+            proc.wait(timeout=wait)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+        except ProcessLookupError:
+            return
+
+def run(cmd, env=None, silence=SILENCE_TIMEOUT, busy_silence=None, timeout=None, echo=True):
+    """
+    Runs `cmd` under the watchdog. Returns a dict:
+        returncode, output (stdout + stderr), elapsed_s,
+        failure (None on success, else the typed failure), phase, salvaged, tail
+    `busy_silence` defaults to BUSY_SILENCE_TIMEOUT (never shorter than `silence`).
+    """
+    busy_silence = busy_silence or max(silence, BUSY_SILENCE_TIMEOUT)
+    start = last_output = time.time()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+    fd = proc.stdout.fileno()
+    chunks = []
+    stalled = None
+    while True:
+        ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+        now = time.time()
+        if ready:
+            data = os.read(fd, 65536)
+            if not data:
+                break # EOF: the child closed its output
+            chunks.append(data)
+            last_output = now
+            if echo:
+                sys.stdout.buffer.write(data)
+                sys.stdout.flush()
+            continue
+        if timeout and now - start > timeout:
+            stalled = "timeout"
+        elif now - last_output > (busy_silence if gpu_busy() else silence):
+            stalled = "hang"
+        if stalled:
+            log(f"No progress for {now - last_output:.0f}s ({stalled}). Killing pid {proc.pid}.")
+            kill_group(proc)
+            break
+    proc.stdout.close()
+    proc.wait()
+
+    output = b"".join(chunks).decode(errors="replace")
+    failed = stalled or proc.returncode != 0
+    result = {
+        "returncode": proc.returncode,
+        "output": output,
+        "elapsed_s": round(time.time() - start, 1),
+        "failure": classify(output, stalled, proc.returncode) if failed else None,
+        "phase": phase_reached(output),
+        "salvaged": salvage(output),
+        "tail": output.replace("\r", "\n").splitlines()[-TAIL_LINES:] if failed else [],
+    }
+    if failed:
+        log(f"FAILED: {result['failure']} after {result['elapsed_s']:.0f}s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command under the benchmark watchdog")
+    parser.add_argument("--silence", type=int, default=SILENCE_TIMEOUT, help="Seconds without output (GPUs idle) before killing")
+    parser.add_argument("--busy-silence", type=int, help="Same, while the GPUs are busy (default: 2700)")
+    parser.add_argument("--timeout", type=int, help="Hard limit in seconds")
+    parser.add_argument("cmd", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+
+    result = run(cmd, silence=args.silence, busy_silence=args.busy_silence, timeout=args.timeout)
+    if result["salvaged"]:
+        log(f"Salvaged: {result['salvaged']}")
+    sys.exit(1 if result["failure"] else 0)
+
+if __name__ == "__main__":
+    main()
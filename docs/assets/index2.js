@@ -127,7 +127,7 @@ function prepareData(runs) {
         const env = run.env;
         row.backends[env] = {
             mean: typeof run.tps_mean === "number" ? run.tps_mean : null,
-            std: 0, // Not currently parsed
+            std: typeof run.tps_std === "number" ? run.tps_std : 0,
             error: Boolean(run.error),
             error_type: run.error_type || null,
         };
@@ -99,6 +99,8 @@ printf 'Repo   : https://github.com/kyuz0/amd-r9700-vllm-toolboxes\n'
 printf 'Image  : docker.io/kyuz0/vllm-therock-gfx1201:latest\n\n'
 printf 'Included:\n'
 printf '  - %-16s → %s\n' "start-vllm (TUI)" "Interactive launcher: Model select, Multi-GPU & Cache handling"
+printf '  - %-16s → %s\n' "vllm-proxy" "Load balancer for DP replicas: vllm-proxy --ports 8000 8001"
+printf '  - %-16s → %s\n' "vllm-warmup" "Precompile kernels once so launches skip JIT: vllm-warmup"
 printf '  - %-16s → %s\n' "vLLM server" "vllm serve meta-llama/Meta-Llama-3.1-8B-Instruct"
 printf '  - %-16s → %s\n' "API test"    "curl localhost:8000/v1/chat/completions"
 echo
@@ -37,6 +37,9 @@ def get_best_context(model_id, max_tp):
     
     # Filter for this model
     candidates = [r for r in data if r["model"] == model_id and r["status"] == "success"]
+    # Only probes run with the KV cache dtype the model is launched with
+    kv_cache_dtype = MODEL_TABLE.get(model_id, {}).get("kv_cache_dtype", "auto")
+    candidates = [r for r in candidates if r.get("kv_cache_dtype") in (None, kv_cache_dtype)]
     
     # Filter by TP <= max_tp (we can't launch TP2 on 1 GPU)
     # But we WANT the limit for the Highest Allowable TP.
@@ -3,9 +3,13 @@ import sys
 import os
 import json
 import time
+import select
+import signal
 import shutil
 import tempfile
+import threading
 import subprocess
+import urllib.request
 from pathlib import Path
 
 # Add benchmarks dir to path to import config
@@ -29,13 +33,60 @@ except ImportError:
     print("Error: Could not import models.py config.")
     sys.exit(1)
 
+try:
+    import gpu_inventory
+except ImportError:
+    print("Error: Could not import gpu_inventory.py.")
+    sys.exit(1)
+
+try:
+    import hf_cache
+except ImportError:
+    hf_cache = None # Standby staging disabled, swaps still work
+
+try:
+    import aggregate_results
+except ImportError:
+    aggregate_results = None # No measured backend defaults, Triton it is
+
+try:
+    import vllm_metrics
+except ImportError:
+    vllm_metrics = None # Standby swaps skip draining
+
+try:
+    import kernel_cache
+except ImportError:
+    kernel_cache = None # No precompiled kernels, first launch JIT-compiles
+
 if (OPT_DIR / "max_context_results.json").exists():
     RESULTS_FILE = OPT_DIR / "max_context_results.json"
 else:
     RESULTS_FILE = BENCH_DIR / "max_context_results.json"
+# hipcc front end with the content-addressed compile cache (see fix_multi_gpu_jit)
+HIPCC_CACHE_SCRIPT = (OPT_DIR if (OPT_DIR / "hipcc_cache.py").exists() else BENCH_DIR) / "hipcc_cache.py"
+# Written by benchmarks/tp_vs_dp_bench.py
+TOPOLOGY_FILE = Path("~/vllm_benchmark_results/tp_vs_dp_results.json").expanduser()
+# Written by benchmarks/run_vllm_bench.py (triton/, rocm/, aiter/ sub-directories)
+BENCH_RESULTS_DIR = Path("~/vllm_benchmark_results").expanduser()
+# aggregate_results backend name -> launcher menu name
+MEASURED_BACKENDS = {"Triton": "Triton", "ROCm": "ROCm (CK)", "AITER": "AITER"}
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = os.getenv("PORT", "8000")
 
+# Data-parallel supervision
+HEALTH_INTERVAL = 10     # Seconds between /v1/models checks
+HEALTH_FAILURES = 3      # Consecutive failed checks before a live replica is restarted
+STARTUP_TIMEOUT = 1800   # First start may JIT-compile kernels and graphs
+MAX_RESTARTS = 5         # Per replica, before the supervisor gives up on it
+
+# Warm standby
+DRAIN_TIMEOUT = 120      # Max seconds to wait for in-flight requests before a swap
+STANDBY_LOCK = os.getenv("STANDBY_LOCK", "0") == "1" # vmtouch -l the staged shards
+
+# Run each server on the NUMA node its GPUs hang off (multi-socket hosts only)
+NUMA_PIN = os.getenv("NUMA_PIN", "1") == "1"
+
 def find_r9700():
     """Finds ALL gfx1201 GPUs and sets HIP_VISIBLE_DEVICES.
     
@@ -43,29 +94,13 @@ def find_r9700():
     Those conflict with HIP_VISIBLE_DEVICES and break RCCL initialization,
     causing vLLM to hang at distributed init.
     """
-    gfx1201_indices = []
-    try:    
-        res = subprocess.run(
-            ["rocm-smi", "--showproductname"],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        current_gpu = None
-        for line in res.stdout.split("\n"):
-            if "GPU[" in line and "]" in line:
-                current_gpu = line.split("]")[0].split("[")[1].strip()
-            if current_gpu and "gfx1201" in line.lower():
-                if current_gpu not in gfx1201_indices:
-                    gfx1201_indices.append(current_gpu)
-                current_gpu = None  # Reset so we don't double-count
-    except Exception:
-        pass
-    
-    if gfx1201_indices:
-        visible = ",".join(gfx1201_indices)
+    # KFD node order is HIP's device order (see gpu_inventory.py)
+    visible = gpu_inventory.visible_devices()
+    if visible:
         os.environ["HIP_VISIBLE_DEVICES"] = visible
-        print(f"[*] Found {len(gfx1201_indices)} R9700(s) → HIP_VISIBLE_DEVICES={visible}")
+        print(f"[*] Found {len(visible.split(','))} R9700(s) → HIP_VISIBLE_DEVICES={visible}")
     else:
-        print("[!] Could not detect R9700 via rocm-smi, defaulting to HIP_VISIBLE_DEVICES=0")
+        print("[!] Could not detect R9700 in the KFD topology, defaulting to HIP_VISIBLE_DEVICES=0")
         os.environ["HIP_VISIBLE_DEVICES"] = "0"
 
 def fix_multi_gpu_jit():
@@ -77,55 +112,56 @@ def fix_multi_gpu_jit():
     This is the nuclear option. The Python source constructs the flag
     dynamically (f-strings, variables), so sed can never match it.
     The only reliable interception point is hipcc itself.
+
+    When hipcc_cache.py is available the wrapper hands every call to it, which
+    also serves repeat compiles from ~/.cache/hipcc (survives nuke_vllm_cache).
+    HIPCC_CACHE=0 falls back to the plain rewrite.
     """
     real_hipcc = "/opt/rocm/bin/hipcc.real"
     hipcc = "/opt/rocm/bin/hipcc"
 
-    if os.path.exists(real_hipcc):
-        print("[*] hipcc wrapper already installed from previous run.")
-        return
+    wrapper = "#!/bin/bash\n"
+    wrapper += "# R9700 hipcc wrapper: forces single-arch gfx1201 compilation\n"
+    if HIPCC_CACHE_SCRIPT.exists():
+        wrapper += f'if [ "${{HIPCC_CACHE:-1}}" != "0" ] && [ -f {HIPCC_CACHE_SCRIPT} ]; then\n'
+        wrapper += f'    exec {sys.executable} {HIPCC_CACHE_SCRIPT} "$@"\n'
+        wrapper += 'fi\n'
+    wrapper += 'args=()\n'
+    wrapper += 'for arg in "$@"; do\n'
+    wrapper += '    args+=("${arg//--offload-arch=native/--offload-arch=gfx1201}")\n'
+    wrapper += 'done\n'
+    wrapper += 'exec /opt/rocm/bin/hipcc.real "${args[@]}"\n'
 
-    print("[*] Installing hipcc wrapper: --offload-arch=native → --offload-arch=gfx1201")
+    if os.path.exists(real_hipcc):
+        try:
+            if Path(hipcc).read_text() == wrapper:
+                print("[*] hipcc wrapper already installed from previous run.")
+                return
+        except OSError:
+            pass
+        print("[*] Updating hipcc wrapper from a previous run.")
+    else:
+        print("[*] Installing hipcc wrapper: --offload-arch=native → --offload-arch=gfx1201")
     try:
         # Move real hipcc out of the way
-        os.rename(hipcc, real_hipcc)
+        if not os.path.exists(real_hipcc):
+            os.rename(hipcc, real_hipcc)
 
         # Write wrapper
         with open(hipcc, "w") as f:
-            f.write("#!/bin/bash\n")
-            f.write("# R9700 hipcc wrapper: forces single-arch gfx1201 compilation\n")
-            f.write('args=()\n')
-            f.write('for arg in "$@"; do\n')
-            f.write('    args+=("${arg//--offload-arch=native/--offload-arch=gfx1201}")\n')
-            f.write('done\n')
-            f.write('exec /opt/rocm/bin/hipcc.real "${args[@]}"\n')
+            f.write(wrapper)
 
         os.chmod(hipcc, 0o755)
-        print("[*] hipcc wrapper installed successfully.")
+        cached = " (with compile cache)" if HIPCC_CACHE_SCRIPT.exists() else ""
+        print(f"[*] hipcc wrapper installed successfully{cached}.")
     except PermissionError:
         print("[!] Cannot patch hipcc (permission denied). Try: sudo start-vllm")
     except Exception as e:
         print(f"[!] hipcc patch failed: {e}")
 
 def detect_gpus():
-    """Detects AMD GPUs via rocm-smi or /dev/dri."""
-    try:
-        # Try rocm-smi first
-        res = subprocess.run(["rocm-smi", "--showid"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if res.returncode == 0:
-            target_gpu = "AMD Radeon Graphics"
-            count = 0
-            for line in res.stdout.strip().split('\n'):
-                if "Device Name" in line and target_gpu in line:
-                    count += 1
-            if count > 0: return count
-    except: pass
-    
-    # Fallback to /dev/dri/render*
-    try:
-        return len(list(Path("/dev/dri").glob("renderD*")))
-    except:
-        return 1
+    """Number of R9700s (any AMD GPU if none, at least 1), same count as the benchmarks."""
+    return gpu_inventory.gpu_count()
 
 def get_discovered_models():
     """
@@ -169,11 +205,14 @@ def get_verified_config(model_id, tp_size, max_seqs):
         with open(RESULTS_FILE, "r") as f:
             data = json.load(f)
             
-        # Filter for Model + TP + Sequences
+        # Filter for Model + TP + Sequences + the KV cache dtype we launch with
+        # (probes from before the KV dtype sweep have no kv_cache_dtype)
+        kv_cache_dtype = config.get("kv_cache_dtype", "auto")
         matches = [r for r in data 
                   if r["model"] == model_id 
                   and r["tp"] == tp_size 
                   and r["max_seqs"] == max_seqs 
+                  and r.get("kv_cache_dtype") in (None, kv_cache_dtype)
                   and r["status"] == "success"]
         
         if not matches:
@@ -195,6 +234,61 @@ def get_verified_config(model_id, tp_size, max_seqs):
     except Exception as e:
         return default_config
 
+def get_topology_recommendation(model_id):
+    """
+    Returns (topology, reason) measured by tp_vs_dp_bench.py, e.g. ("dp2", "DP +40% tok/s"),
+    or None if the model was never compared.
+    """
+    if not TOPOLOGY_FILE.exists():
+        return None
+    try:
+        with open(TOPOLOGY_FILE, "r") as f:
+            rows = json.load(f)
+        row = next((r for r in rows if r["model"] == model_id and r.get("recommendation")), None)
+        if row:
+            return row["recommendation"], row.get("reason", "")
+    except Exception:
+        pass
+    return None
+
+def get_backend_measurements(model_id, tp_size, max_seqs):
+    """
+    Returns {launcher_backend: tok/s} from the per-backend throughput results
+    for this model and TP, or {} if none were measured. Runs at the same
+    max_num_seqs win; otherwise any concurrency the benchmark used counts.
+    """
+    if aggregate_results is None:
+        return {}
+    roots = aggregate_results.default_roots() + ([BENCH_RESULTS_DIR] if BENCH_RESULTS_DIR.exists() else [])
+    try:
+        records = [r for r in aggregate_results.collect(roots)
+                   if r["kind"] == "throughput" and not r["error"] and not r["tag"]
+                   and r["model"] == model_id and r["tp"] == tp_size
+                   and r["gpu"].startswith("AMD") and r["backend"] in MEASURED_BACKENDS]
+    except Exception:
+        return {}
+    same_seqs = [r for r in records if r["params"].get("max_num_seqs") == max_seqs]
+
+    # Local measurements (BENCH_RESULTS_DIR) beat the bundled snapshots, whatever their
+    # dates; within each group the newest result per backend wins
+    local = str(BENCH_RESULTS_DIR.resolve())
+    rank = lambda r: (r["provenance"]["path"].startswith(local), r["provenance"]["date"] or "", r["provenance"]["mtime"])
+    measured = {}
+    for r in sorted(same_seqs or records, key=rank):
+        measured[MEASURED_BACKENDS[r["backend"]]] = r["metrics"]["tokens_per_second"]
+    return measured
+
+def backend_note(measured, backend):
+    """Menu suffix with the measured delta, e.g. '(best, +12% vs Triton)'."""
+    if backend not in measured:
+        return "(not measured)" if measured else ""
+    ranked = sorted(measured, key=measured.get, reverse=True)
+    if ranked[0] != backend:
+        return f"({measured[backend] / measured[ranked[0]] - 1:+.0%} vs {ranked[0]})"
+    if len(ranked) > 1:
+        return f"(best, {measured[backend] / measured[ranked[1]] - 1:+.0%} vs {ranked[1]})"
+    return "(measured)"
+
 def run_dialog(args):
     """Runs dialog and returns stderr (selection)."""
     with tempfile.NamedTemporaryFile(mode="w+") as tf:
@@ -221,6 +315,347 @@ def nuke_vllm_cache():
             except Exception as e:
                 print(f" Failed: {e}")
 
+def build_serve_cmd(model_id, tp, seqs, ctx, util, use_eager, attn_backend, port):
+    """Builds the `vllm serve` command line and environment for one server."""
+    config = MODEL_TABLE[model_id]
+    cmd = [
+        "vllm", "serve", model_id,
+        "--host", HOST,
+        "--port", str(port),
+        "--tensor-parallel-size", str(tp),
+        "--max-num-seqs", str(seqs),
+        "--max-model-len", str(ctx),
+        "--gpu-memory-utilization", str(util),
+        "--dtype", "auto"
+    ]
+    
+    if config.get("trust_remote"): cmd.append("--trust-remote-code")
+    if use_eager: cmd.append("--enforce-eager")
+    if config.get("language_model_only"): cmd.append("--language-model-only")
+    
+    if "max_tokens" in config:
+        cmd.extend(["--max-num-batched-tokens", str(config["max_tokens"])])
+        
+    if "kv_cache_dtype" in config:
+        cmd.extend(["--kv-cache-dtype", config["kv_cache_dtype"]])
+    
+    # Env Vars
+    env = os.environ.copy()
+    env["VLLM_DISABLE_COMPILE_CACHE"] = "1"
+    
+    if attn_backend == "AITER":
+        env["VLLM_ROCM_USE_AITER"] = "1"
+        cmd.extend(["--attention-backend", "ROCM_ATTN"])
+    elif attn_backend == "ROCm (CK)":
+        if "VLLM_ROCM_USE_AITER" in env:
+            del env["VLLM_ROCM_USE_AITER"]
+        cmd.extend(["--attention-backend", "ROCM_ATTN"])
+    else: # Triton
+        if "VLLM_ROCM_USE_AITER" in env:
+            del env["VLLM_ROCM_USE_AITER"]
+        cmd.extend(["--attention-backend", "TRITON_ATTN"])
+
+    env.update(config.get("env", {}))
+
+    # ViT attention on RDNA: the default falls to TORCH_SDPA (flash_attn's
+    # Triton-AMD subpackage isn't available) which produces NaN/Inf embeddings
+    # and collapses the LM into an endless '!' stream. TRITON_ATTN uses vLLM's
+    # own Triton ViT wrapper and is numerically healthy. No-op for LM-only.
+    cmd.extend(["--mm-encoder-attn-backend", "TRITON_ATTN"])
+
+    return cmd, env
+
+def visible_gpus():
+    """HIP_VISIBLE_DEVICES (as set by find_r9700) as a list of device indices."""
+    return [d for d in os.environ.get("HIP_VISIBLE_DEVICES", "0").split(",") if d.strip()]
+
+def tp_group(tp):
+    """
+    The `tp` visible GPUs with the best NUMA/PCIe locality (see
+    gpu_inventory.best_group), falling back to the first `tp` visible ones.
+    """
+    visible = visible_gpus()
+    if all(d.isdigit() for d in visible):
+        group = gpu_inventory.best_group(tp, [int(d) for d in visible])
+        if group:
+            return [str(i) for i in group]
+    return visible[:tp]
+
+def pin_to_gpus(cmd, gpus):
+    """
+    Prefixes `cmd` so the API server and engine processes run on the cores of
+    the NUMA node local to `gpus` and prefer its memory: numactl if present,
+    else taskset (CPUs only). Unchanged on single-node hosts, when the GPUs
+    span nodes, or with NUMA_PIN=0.
+    """
+    if not NUMA_PIN or gpu_inventory.numa_node_count() < 2 or not all(g.isdigit() for g in gpus):
+        return cmd
+    node, cpus = gpu_inventory.group_placement([int(g) for g in gpus])
+    if node is None:
+        return cmd
+    if shutil.which("numactl"):
+        # --preferred, not --membind: a full node falls back instead of OOM-killing the server
+        return ["numactl", f"--cpunodebind={node}", f"--preferred={node}"] + cmd
+    if cpus and shutil.which("taskset"):
+        return ["taskset", "-c", ",".join(str(c) for c in cpus)] + cmd
+    return cmd
+
+def placement_note(cmd, gpus):
+    """'GPU 0,1 on NUMA node 0 (pinned)' style summary for the launch banner."""
+    node, _ = gpu_inventory.group_placement([int(g) for g in gpus if g.isdigit()])
+    where = f"NUMA node {node}" if node is not None else "mixed NUMA nodes"
+    pinned = "pinned" if cmd[0] in ("numactl", "taskset") else "not pinned"
+    return f"GPU {','.join(gpus)} on {where} ({pinned})"
+
+def replica_healthy(port):
+    """True once the OpenAI server on `port` answers /v1/models."""
+    host = "127.0.0.1" if HOST in ("0.0.0.0", "::") else HOST
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/v1/models", timeout=5) as r:
+            return r.status == 200
+    except Exception:
+        return False
+
+def pipe_output(proc, prefix):
+    """Streams a replica's combined stdout/stderr to our stdout, line-prefixed."""
+    for line in proc.stdout:
+        print(f"{prefix} {line}", end="", flush=True)
+
+def start_replica(replica):
+    env = replica["env"].copy()
+    # Pin to this server's GPU(s). Only HIP_VISIBLE_DEVICES (see find_r9700).
+    env["HIP_VISIBLE_DEVICES"] = replica["gpu"]
+    proc = subprocess.Popen(replica["cmd"], env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, errors="replace", start_new_session=True)
+    threading.Thread(target=pipe_output, args=(proc, replica["prefix"]), daemon=True).start()
+    replica.update(proc=proc, started=time.time(), ready=False, failures=0)
+    print(f"[*] {replica['prefix']} started (pid {proc.pid}) on GPU {replica['gpu']}, port {replica['port']}")
+
+def stop_replica(replica, timeout=30):
+    proc = replica.get("proc")
+    if not proc or proc.poll() is not None:
+        return
+    try:
+        # vllm serve spawns engine-core workers: signal the whole session
+        os.killpg(proc.pid, 15)
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, 9)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+def wait_until_ready(replica):
+    """Blocks until the replica is healthy. Returns False if it died or timed out."""
+    while time.time() - replica["started"] < STARTUP_TIMEOUT:
+        if replica["proc"].poll() is not None:
+            return False
+        if replica_healthy(replica["port"]):
+            replica["ready"] = True
+            return True
+        time.sleep(2)
+    return False
+
+def run_data_parallel(model_id, replicas_n, seqs, ctx, util, use_eager, attn_backend, compile_cache=False):
+    """
+    Runs `replicas_n` independent TP=1 servers, replica i on GPU i and port PORT+i,
+    and supervises them: a replica that exits, or stops answering /v1/models
+    HEALTH_FAILURES times in a row, is restarted (up to MAX_RESTARTS times).
+
+    Replica 0 starts alone so the first-run Triton/AITER JIT kernel builds happen
+    once; the others start together after it is healthy and reuse those kernel
+    caches. torch.compile is not shared: build_serve_cmd sets
+    VLLM_DISABLE_COMPILE_CACHE=1, so every replica compiles its own graphs
+    (unless `compile_cache`, i.e. a vllm-warmup package was just restored).
+    """
+    gpus = visible_gpus()[:replicas_n]
+    replicas = []
+    for i, gpu in enumerate(gpus):
+        port = int(PORT) + i
+        cmd, env = build_serve_cmd(model_id, 1, seqs, ctx, util, use_eager, attn_backend, port)
+        if compile_cache:
+            env.pop("VLLM_DISABLE_COMPILE_CACHE", None)
+        cmd = pin_to_gpus(cmd, [gpu])
+        replicas.append({"idx": i, "gpu": gpu, "port": port, "cmd": cmd, "env": env,
+                         "prefix": f"[dp{i}]", "restarts": 0})
+
+    print(f"\n Command (per replica): {' '.join(replicas[0]['cmd'])}")
+    print(" Placement: " + " | ".join(f"{r['prefix']} {placement_note(r['cmd'], [r['gpu']])}" for r in replicas))
+    print(" Endpoints: " + ", ".join(f"http://{HOST}:{r['port']}/v1" for r in replicas))
+    print(f" One endpoint: vllm-proxy --port {int(PORT) + len(replicas)} --ports {' '.join(str(r['port']) for r in replicas)} --prefix-affinity")
+    print("="*60 + "\n")
+
+    try:
+        start_replica(replicas[0])
+        if not wait_until_ready(replicas[0]):
+            print(f"[!] {replicas[0]['prefix']} failed to start. Aborting.")
+            stop_replica(replicas[0])
+            return
+        print(f"[*] {replicas[0]['prefix']} ready after {time.time() - replicas[0]['started']:.0f}s. Starting the remaining replicas...")
+        for r in replicas[1:]:
+            start_replica(r)
+
+        while True:
+            time.sleep(HEALTH_INTERVAL)
+            alive = 0
+            for r in replicas:
+                if r.get("gave_up"):
+                    continue
+                alive += 1
+                exited = r["proc"].poll() is not None
+                if not exited:
+                    if replica_healthy(r["port"]):
+                        if not r["ready"]:
+                            print(f"[*] {r['prefix']} ready after {time.time() - r['started']:.0f}s on port {r['port']}")
+                        r["ready"] = True
+                        r["failures"] = 0
+                        continue
+                    if not r["ready"]:
+                        if time.time() - r["started"] < STARTUP_TIMEOUT:
+                            continue # Still loading
+                        print(f"[!] {r['prefix']} not ready after {STARTUP_TIMEOUT}s.")
+                    else:
+                        r["failures"] += 1
+                        if r["failures"] < HEALTH_FAILURES:
+                            continue
+                        print(f"[!] {r['prefix']} failed {r['failures']} health checks.")
+                else:
+                    print(f"[!] {r['prefix']} exited with code {r['proc'].returncode}.")
+
+                stop_replica(r)
+                if r["restarts"] >= MAX_RESTARTS:
+                    print(f"[!] {r['prefix']} restarted {MAX_RESTARTS} times. Giving up on GPU {r['gpu']}.")
+                    r["gave_up"] = True
+                    alive -= 1
+                    continue
+                r["restarts"] += 1
+                print(f"[*] Restarting {r['prefix']} ({r['restarts']}/{MAX_RESTARTS})...")
+                start_replica(r)
+
+            if alive == 0:
+                print("[!] All replicas are down. Exiting.")
+                return
+    except KeyboardInterrupt:
+        print("\n[*] Stopping replicas...")
+    finally:
+        for r in replicas:
+            stop_replica(r)
+
+def in_flight_requests(port):
+    """Running + waiting requests from vLLM's Prometheus /metrics, None if unreachable."""
+    if vllm_metrics is None:
+        return None
+    host = "127.0.0.1" if HOST in ("0.0.0.0", "::") else HOST
+    snap = vllm_metrics.snapshot(f"http://{host}:{port}")
+    if not snap:
+        return None
+    return int(snap.get("running", 0) + snap.get("waiting", 0))
+
+def drain(port, timeout=DRAIN_TIMEOUT):
+    """
+    Waits until the server on `port` has no running or queued requests.
+    Best-effort: clients talk to the server directly, so nothing stops new
+    requests from arriving while it drains. One that lands between the last
+    check and the stop is cut off.
+    """
+    start = time.time()
+    while time.time() - start < timeout:
+        pending = in_flight_requests(port)
+        if not pending:
+            return True
+        print(f"[*] Draining: {pending} request(s) in flight...")
+        time.sleep(2)
+    print(f"[!] Still busy after {timeout}s. Swapping anyway.")
+    return False
+
+def standby_server(model_id, tp, seqs, use_eager, attn_backend):
+    """Server dict (as used by start_replica) for `model_id` on PORT, verified config at `tp`."""
+    valid_tps = MODEL_TABLE[model_id].get("valid_tp", [1])
+    if tp not in valid_tps:
+        tp = min(valid_tps)
+    verified = get_verified_config(model_id, tp, seqs)
+    cmd, env = build_serve_cmd(model_id, tp, seqs, verified["ctx"], verified["util"], use_eager, attn_backend, PORT)
+    # Keep torch.compile artifacts across swaps: swapping back to a model reuses them
+    env.pop("VLLM_DISABLE_COMPILE_CACHE", None)
+    gpus = tp_group(tp)
+    cmd = pin_to_gpus(cmd, gpus)
+    return {"model": model_id, "tp": tp, "gpu": ",".join(gpus), "port": int(PORT),
+            "cmd": cmd, "env": env, "prefix": f"[{model_id.split('/')[-1]}]"}
+
+def stage_in_background(server):
+    """Starts page-cache staging of the server's shards; fills server['staging']."""
+    server["staging"] = {"stop": threading.Event(), "locker": None}
+    if hf_cache is None:
+        return
+
+    def work():
+        _, locker = hf_cache.stage_model(server["model"], stop_event=server["staging"]["stop"], lock=STANDBY_LOCK)
+        server["staging"]["locker"] = locker
+
+    server["staging"]["thread"] = threading.Thread(target=work, daemon=True)
+    server["staging"]["thread"].start()
+
+def release_staging(server):
+    staging = server.get("staging") or {}
+    if staging.get("stop"):
+        staging["stop"].set()
+    if staging.get("locker"):
+        staging["locker"].terminate()
+
+def run_with_standby(active, standby):
+    """
+    Serves `active` on PORT while `standby`'s checkpoint shards are read into the
+    page cache. A swap ('s' + Enter, or SIGUSR1) drains the active server
+    (best-effort, see drain), stops it and starts the standby on the same port,
+    so its weight load is RAM-bound. Roles then flip and the previous model is
+    staged for the swap back. Pause clients before swapping to lose nothing.
+    """
+    swap_requested = threading.Event()
+    signal.signal(signal.SIGUSR1, lambda *_: swap_requested.set())
+
+    print(f"\n Command (active):  {' '.join(active['cmd'])}")
+    print(f" Command (standby): {' '.join(standby['cmd'])}")
+    print(f" Swap: type 's' + Enter, or: kill -USR1 {os.getpid()}   Quit: 'q' + Enter / Ctrl+C")
+    print("="*60 + "\n")
+
+    try:
+        start_replica(active)
+        stage_in_background(standby)
+        while True:
+            if active["proc"].poll() is not None:
+                print(f"[!] {active['prefix']} exited with code {active['proc'].returncode}.")
+                return
+            ready, _, _ = select.select([sys.stdin], [], [], 1.0)
+            if ready:
+                command = sys.stdin.readline().strip().lower()
+                if command == "q":
+                    return
+                if command == "s":
+                    swap_requested.set()
+            if not swap_requested.is_set():
+                continue
+            swap_requested.clear()
+
+            print(f"[*] Swap requested: {active['model']} -> {standby['model']}")
+            drain(active["port"])
+            t0 = time.time()
+            stop_replica(active)
+            start_replica(standby)
+            if not wait_until_ready(standby):
+                print(f"[!] {standby['prefix']} failed to start. Restoring {active['model']}...")
+                stop_replica(standby)
+                start_replica(active)
+                continue
+            print(f"[*] Swapped to {standby['model']}: {time.time() - t0:.0f}s without a server on port {PORT}")
+            release_staging(standby)
+            active, standby = standby, active
+            stage_in_background(standby)
+    except KeyboardInterrupt:
+        print("\n[*] Stopping...")
+    finally:
+        stop_replica(active)
+        release_staging(standby)
+
 def configure_and_launch(model_idx, gpu_count):
     model_id = MODELS_TO_RUN[model_idx]
     config = MODEL_TABLE[model_id]
@@ -228,10 +663,21 @@ def configure_and_launch(model_idx, gpu_count):
     # Static Config
     valid_tps = config.get("valid_tp", [1])
     max_tp = max(valid_tps) if valid_tps else 1
+    # Data parallel: one TP=1 replica per GPU, only for models that fit on one card
+    max_dp = len(visible_gpus()) if 1 in valid_tps else 1
     
     # Defaults
     current_tp = min(gpu_count, max_tp)
     current_seqs = 1 # Default to 1 concurrent user/request for stability
+    current_dp = 1 # Single server unless replicas are requested
+
+    # Start from the measured TP vs DP winner when it fits the detected GPUs
+    topology = get_topology_recommendation(model_id)
+    topology_note = ""
+    if topology:
+        topology_note = f"\nMeasured: {'2x TP=1 replicas' if topology[0] == 'dp2' else 'TP=2'} ({topology[1]})"
+        if topology[0] == "dp2" and max_dp >= 2:
+            current_tp, current_dp = 1, 2
     
     # Initial Lookup
     verified = get_verified_config(model_id, current_tp, current_seqs)
@@ -241,7 +687,12 @@ def configure_and_launch(model_idx, gpu_count):
     clear_cache = True  # Default ON: stale graphs from version upgrades cause crashes
     use_eager = config.get("enforce_eager", False) # Default to model config, usually False
     attn_backends = ["Triton", "ROCm (CK)", "AITER"]
-    current_attn_backend = "Triton" # Default to Triton
+    # Default to the fastest measured backend for (model, TP, seqs), else Triton.
+    # Follows TP / seqs changes until the user picks a backend by hand.
+    backend_manual = False
+    measured = get_backend_measurements(model_id, current_tp, current_seqs)
+    current_attn_backend = max(measured, key=measured.get) if measured else "Triton"
+    standby_model = None # Second model staged in page cache for fast swaps
     
     name = model_id.split("/")[-1]
     
@@ -252,15 +703,17 @@ def configure_and_launch(model_idx, gpu_count):
         menu_args = [
             "--clear", "--backtitle", f"AMD R9700 vLLM Launcher (GPUs: {gpu_count})",
             "--title", f"Configuration: {name}",
-            "--menu", "Customize Launch Parameters:", "22", "65", "9",
+            "--menu", "Customize Launch Parameters:" + topology_note, "24", "65", "11",
             "1", f"Tensor Parallelism:   {current_tp}",
             "2", f"Concurrent Requests:  {current_seqs}",
             "3", f"Context Length:       {current_ctx} (Verified)",
             "4", f"GPU Utilization:      {current_util} (Verified)",
-            "5", f"Attention Backend:    {current_attn_backend}",
+            "5", f"Attention Backend:    {current_attn_backend} {backend_note(measured, current_attn_backend)}",
             "6", f"Erase vLLM Cache:     {cache_status}",
             "7", f"Force Eager Mode:     {eager_status}",
-            "8", "LAUNCH SERVER"
+            "8", f"DP Replicas (TP=1):   {current_dp}",
+            "9", f"Warm Standby Model:   {standby_model.split('/')[-1] if standby_model else 'None'}",
+            "10", "LAUNCH SERVER"
         ]
         
         choice = run_dialog(menu_args)
@@ -276,10 +729,15 @@ def configure_and_launch(model_idx, gpu_count):
                 new_tp_int = int(new_tp)
                 if new_tp_int != current_tp:
                     current_tp = new_tp_int
+                    if current_tp > 1:
+                        current_dp = 1 # TP and DP replicas are exclusive
                     # RE-CALCULATE Config
                     verified = get_verified_config(model_id, current_tp, current_seqs)
                     current_ctx = verified["ctx"]
                     current_util = verified["util"]
+                    measured = get_backend_measurements(model_id, current_tp, current_seqs)
+                    if measured and not backend_manual:
+                        current_attn_backend = max(measured, key=measured.get)
             
         elif choice == "2":
             # Max Seqs Selection
@@ -297,6 +755,9 @@ def configure_and_launch(model_idx, gpu_count):
                 verified = get_verified_config(model_id, current_tp, current_seqs)
                 current_ctx = verified["ctx"]
                 current_util = verified["util"]
+                measured = get_backend_measurements(model_id, current_tp, current_seqs)
+                if measured and not backend_manual:
+                    current_attn_backend = max(measured, key=measured.get)
 
         elif choice == "3":
             # Configured Length Override
@@ -314,6 +775,7 @@ def configure_and_launch(model_idx, gpu_count):
             # Cycle Attention Backend
             idx = attn_backends.index(current_attn_backend)
             current_attn_backend = attn_backends[(idx + 1) % len(attn_backends)]
+            backend_manual = True
 
         elif choice == "6":
             # Toggle Cache
@@ -343,6 +805,42 @@ def configure_and_launch(model_idx, gpu_count):
             use_eager = not use_eager
              
         elif choice == "8":
+            # Data Parallel Replicas
+            if max_dp < 2:
+                run_dialog([
+                    "--title", "Data Parallel",
+                    "--msgbox", "DP replicas need a model that runs at TP=1 and at least 2 GPUs.", "8", "50"
+                ])
+                continue
+            new_dp = run_dialog([
+                "--title", "Data Parallel Replicas",
+                "--rangebox", f"Independent TP=1 servers (1-{max_dp})", "10", "40", "1", str(max_dp), str(current_dp)
+            ])
+            if new_dp:
+                current_dp = int(new_dp)
+                if current_dp > 1 and current_tp != 1:
+                    current_tp = 1
+                    verified = get_verified_config(model_id, current_tp, current_seqs)
+                    current_ctx = verified["ctx"]
+                    current_util = verified["util"]
+                    measured = get_backend_measurements(model_id, current_tp, current_seqs)
+                    if measured and not backend_manual:
+                        current_attn_backend = max(measured, key=measured.get)
+
+        elif choice == "9":
+            # Warm Standby Selection
+            standby_items = ["none", "None"]
+            for m in MODELS_TO_RUN:
+                if m != model_id:
+                    standby_items.extend([m, m.split("/")[-1]])
+            new_standby = run_dialog([
+                "--title", "Warm Standby",
+                "--menu", "Model to keep staged in RAM for a fast swap:", "20", "65", "10"
+            ] + standby_items)
+            if new_standby:
+                standby_model = None if new_standby == "none" else new_standby
+
+        elif choice == "10":
             # Launch
             break
             
@@ -351,60 +849,40 @@ def configure_and_launch(model_idx, gpu_count):
     
     # Patch aiter source FIRST, then nuke caches so fresh build uses patched source
     fix_multi_gpu_jit()
+
+    # Empty caches before any erase (first boot): start from the vllm-warmup package
+    # built on this exact stack, if there is one. Caches the user just erased stay
+    # erased, so "Erase vLLM Cache" still gives a clean state.
+    first_boot = kernel_cache is not None and not kernel_cache.caches_present()
     
     if clear_cache:
         nuke_vllm_cache()
-    
-    cmd = [
-        "vllm", "serve", model_id,
-        "--host", HOST,
-        "--port", PORT,
-        "--tensor-parallel-size", str(current_tp),
-        "--max-num-seqs", str(current_seqs),
-        "--max-model-len", str(current_ctx),
-        "--gpu-memory-utilization", str(current_util),
-        "--dtype", "auto"
-    ]
-    
-    if config.get("trust_remote"): cmd.append("--trust-remote-code")
-    if use_eager: cmd.append("--enforce-eager")
-    if config.get("language_model_only"): cmd.append("--language-model-only")
-    
-    if "max_tokens" in config:
-        cmd.extend(["--max-num-batched-tokens", str(config["max_tokens"])])
-        
-    if "kv_cache_dtype" in config:
-        cmd.extend(["--kv-cache-dtype", config["kv_cache_dtype"]])
-    
-    # Env Vars
-    env = os.environ.copy()
-    env["VLLM_DISABLE_COMPILE_CACHE"] = "1"
-    
-    if current_attn_backend == "AITER":
-        env["VLLM_ROCM_USE_AITER"] = "1"
-        cmd.extend(["--attention-backend", "ROCM_ATTN"])
-    elif current_attn_backend == "ROCm (CK)":
-        if "VLLM_ROCM_USE_AITER" in env:
-            del env["VLLM_ROCM_USE_AITER"]
-        cmd.extend(["--attention-backend", "ROCM_ATTN"])
-    else: # Triton
-        if "VLLM_ROCM_USE_AITER" in env:
-            del env["VLLM_ROCM_USE_AITER"]
-        cmd.extend(["--attention-backend", "TRITON_ATTN"])
-
-    env.update(config.get("env", {}))
-
-    # ViT attention on RDNA: the default falls to TORCH_SDPA (flash_attn's
-    # Triton-AMD subpackage isn't available) which produces NaN/Inf embeddings
-    # and collapses the LM into an endless '!' stream. TRITON_ATTN uses vLLM's
-    # own Triton ViT wrapper and is numerically healthy. No-op for LM-only.
-    cmd.extend(["--mm-encoder-attn-backend", "TRITON_ATTN"])
 
+    restored = False
+    if first_boot:
+        restored = bool(kernel_cache.restore())
+        if not restored:
+            print("[*] No precompiled kernels for this stack. Run `vllm-warmup` once to skip first-launch JIT.")
     
+    cmd, env = build_serve_cmd(model_id, current_tp, current_seqs, current_ctx, current_util, use_eager, current_attn_backend, PORT)
+    if restored:
+        # The package's torch.compile artifacts match this stack: let vLLM use them
+        env.pop("VLLM_DISABLE_COMPILE_CACHE", None)
+    if current_dp == 1:
+        gpus = tp_group(current_tp)
+        env["HIP_VISIBLE_DEVICES"] = ",".join(gpus)
+        cmd = pin_to_gpus(cmd, gpus)
+
     print("\n" + "="*60)
     print(f" Launching: {name}")
     print(f" Config:    TP={current_tp} | Seqs={current_seqs} | Ctx={current_ctx} | Util={current_util}")
-    print(f" Backend:   {current_attn_backend}")
+    if current_dp > 1:
+        print(f" Replicas:  {current_dp} x TP=1 on ports {PORT}-{int(PORT) + current_dp - 1}")
+    print(f" Backend:   {current_attn_backend} {backend_note(measured, current_attn_backend)}")
+    if current_dp == 1:
+        print(f" Placement: {placement_note(cmd, gpus)}")
+    if standby_model:
+        print(f" Standby:   {standby_model} (staged in page cache)")
     if current_tp > gpu_count:
         print(f"Warning: Model requires TP={current_tp} but only {gpu_count} GPUs detected.")
         print("Command may fail.")
@@ -418,11 +896,26 @@ def configure_and_launch(model_idx, gpu_count):
         print("\n --- Environment Variables ---")
         for k, v in custom_env.items():
             print(f" export {k}={v}")
+
+    if current_dp > 1:
+        if standby_model:
+            print(" Warning:   Warm standby is not supported with DP replicas. Ignoring it.")
+        run_data_parallel(model_id, current_dp, current_seqs, current_ctx, current_util, use_eager, current_attn_backend,
+                          compile_cache=restored)
+        sys.exit(0)
+
+    if standby_model:
+        active = standby_server(model_id, current_tp, current_seqs, use_eager, current_attn_backend)
+        # Keep the operator's overrides for the model being launched now
+        active["cmd"], active["env"] = cmd, env
+        active["env"].pop("VLLM_DISABLE_COMPILE_CACHE", None)
+        run_with_standby(active, standby_server(standby_model, current_tp, current_seqs, use_eager, current_attn_backend))
+        sys.exit(0)
             
     print(f"\n Command:   {' '.join(cmd)}")
     print("="*60 + "\n")
     
-    os.execvpe("vllm", cmd, env)
+    os.execvpe(cmd[0], cmd, env)
 
 def main():
     find_r9700()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Load-balancing front proxy for several vLLM OpenAI servers (e.g. the
+start-vllm DP replicas), so clients see a single endpoint.
+
+Routing:
+  - least outstanding requests across healthy backends (ties -> fewest served)
+  - --prefix-affinity: requests sharing the same leading messages (system
+    prompt, few-shot block; never the final turn) go to the same backend via
+    rendezvous hashing, so they hit that replica's prefix cache. Affinity yields to least-outstanding
+    when the preferred backend is more than --affinity-slack requests busier.
+
+Responses are streamed through chunk by chunk (SSE `stream=true` works as-is)
+over one pooled keep-alive session. Backends are health-checked on /v1/models
+like run_vllm_bench_nvidia.wait_for_server; requests that fail to connect are
+retried on another backend. Per-backend queue metrics are served at
+/proxy/metrics (JSON).
+
+Usage:
+    vllm-proxy --port 8080 --backends http://127.0.0.1:8000 http://127.0.0.1:8001
+    vllm-proxy --port 8080 --ports 8000 8001 --prefix-affinity
+
+    # Fake backends for testing without GPUs
+    vllm-proxy --fake-backend --port 8000 &
+    vllm-proxy --fake-backend --port 8001 &
+    vllm-proxy --port 8080 --ports 8000 8001
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+
+try:
+    from aiohttp import web, ClientSession, ClientTimeout, TCPConnector, ClientConnectionError
+except ImportError:
+    print("Error: 'aiohttp' is required (it ships with vLLM): pip install aiohttp")
+    sys.exit(1)
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HEALTH_INTERVAL = 5      # Seconds between /v1/models checks
+HEALTH_TIMEOUT = 5
+AFFINITY_CHARS = 2048    # Leading completions-prompt characters hashed for prefix affinity
+AFFINITY_SLACK = 4       # Max extra outstanding requests tolerated on the affinity backend
+MAX_CONNS = 256          # Pooled connections per backend
+
+# Hop-by-hop headers are never forwarded (RFC 7230 6.1), plus the ones aiohttp recomputes
+HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+               "trailers", "transfer-encoding", "upgrade", "host", "content-length", "content-encoding"}
+
+def log(msg): print(f"[PROXY] {msg}", flush=True)
+
+class Backend:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.healthy = False
+        self.outstanding = 0
+        self.served = 0
+        self.errors = 0
+        self.busy_s = 0.0   # Sum of request durations, for mean latency
+        self.affinity_hits = 0
+
+    def stats(self):
+        return {
+            "url": self.url, "healthy": self.healthy, "outstanding": self.outstanding,
+            "served": self.served, "errors": self.errors, "affinity_hits": self.affinity_hits,
+            "mean_latency_s": round(self.busy_s / self.served, 4) if self.served else None,
+        }
+
+# =========================
+# ROUTING
+# =========================
+
+def affinity_key(body):
+    """
+    Shared leading part of an OpenAI completions/chat request, or None. Never
+    includes the last turn, which differs per request: chat keys on every
+    message before the last one (system prompt, few-shot turns, history);
+    completions key on the first AFFINITY_CHARS characters, and only when the
+    prompt is longer than that.
+    """
+    try:
+        payload = json.loads(body)
+    except Exception:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    messages = payload.get("messages")
+    if isinstance(messages, list):
+        if len(messages) < 2:
+            return None # Nothing but the question itself
+        prefix = json.dumps(messages[:-1], sort_keys=True)
+    elif isinstance(payload.get("prompt"), str) and len(payload["prompt"]) > AFFINITY_CHARS:
+        prefix = payload["prompt"][:AFFINITY_CHARS]
+    else:
+        return None
+    return f"{payload.get('model', '')}\n{prefix}"
+
+def rendezvous(key, backends):
+    """Highest-random-weight hashing: only keys of a removed backend move."""
+    return max(backends, key=lambda b: hashlib.sha1(f"{b.url}|{key}".encode()).digest())
+
+def pick_backend(backends, key=None, exclude=()):
+    healthy = [b for b in backends if b.healthy and b not in exclude]
+    if not healthy:
+        return None
+    least = min(healthy, key=lambda b: (b.outstanding, b.served))
+    if key is not None:
+        preferred = rendezvous(key, healthy)
+        if preferred.outstanding - least.outstanding <= AFFINITY_SLACK:
+            preferred.affinity_hits += 1
+            return preferred
+    return least
+
+# =========================
+# SERVER
+# =========================
+
+async def check_backends(app):
+    session = app["session"]
+    for b in app["backends"]:
+        try:
+            async with session.get(f"{b.url}/v1/models", timeout=ClientTimeout(total=HEALTH_TIMEOUT)) as r:
+                ok = r.status == 200
+        except Exception:
+            ok = False
+        if ok != b.healthy:
+            log(f"{b.url} is now {'UP' if ok else 'DOWN'}")
+        b.healthy = ok
+
+async def health_loop(app):
+    while True:
+        await asyncio.sleep(HEALTH_INTERVAL)
+        await check_backends(app)
+
+async def handle_metrics(request):
+    app = request.app
+    return web.json_response({
+        "uptime_s": round(time.time() - app["started"], 1),
+        "prefix_affinity": app["affinity"],
+        "backends": [b.stats() for b in app["backends"]],
+    })
+
+async def handle_health(request):
+    if any(b.healthy for b in request.app["backends"]):
+        return web.Response(text="OK")
+    return web.Response(status=503, text="No healthy backends")
+
+async def handle_proxy(request):
+    app = request.app
+    body = await request.read()
+    key = affinity_key(body) if app["affinity"] and request.method == "POST" else None
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+
+    tried = []
+    while True:
+        backend = pick_backend(app["backends"], key, exclude=tried)
+        if backend is None:
+            return web.json_response({"error": {"message": "No healthy vLLM backend available", "type": "proxy_error"}}, status=503)
+        tried.append(backend)
+
+        backend.outstanding += 1
+        start = time.time()
+        response = None
+        try:
+            async with app["session"].request(request.method, f"{backend.url}{request.path_qs}",
+                                              headers=headers, data=body) as upstream:
+                response = web.StreamResponse(status=upstream.status, headers={
+                    k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS})
+                await response.prepare(request)
+                # iter_any() hands over whatever arrived, so SSE events are not held back
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+                await response.write_eof()
+            backend.served += 1
+            backend.busy_s += time.time() - start
+            return response
+        except ClientConnectionError as e:
+            backend.errors += 1
+            if response is not None and response.prepared:
+                # Already streaming to the client: nothing sane to retry
+                log(f"{backend.url} dropped a streaming response: {e}")
+                return response
+            log(f"{backend.url} unreachable ({e}). Marking DOWN, retrying elsewhere.")
+            backend.healthy = False
+        finally:
+            backend.outstanding -= 1
+
+async def on_startup(app):
+    app["session"] = ClientSession(connector=TCPConnector(limit_per_host=MAX_CONNS, keepalive_timeout=60),
+                                   timeout=ClientTimeout(total=None, sock_connect=10))
+    # Know who is up before accepting the first request
+    await check_backends(app)
+    app["health_task"] = asyncio.create_task(health_loop(app))
+
+async def on_cleanup(app):
+    app["health_task"].cancel()
+    await app["session"].close()
+
+def build_app(backend_urls, affinity=False):
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app["backends"] = [Backend(url) for url in backend_urls]
+    app["affinity"] = affinity
+    app["started"] = time.time()
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/proxy/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    app.router.add_route("*", "/{tail:.*}", handle_proxy)
+    return app
+
+# =========================
+# FAKE BACKEND (testing)
+# =========================
+
+def build_fake_backend(port, delay=0.05):
+    """Minimal OpenAI-style server: /v1/models and (streaming) completions that echo the port."""
+    async def models(request):
+        return web.json_response({"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+
+    async def completions(request):
+        payload = await request.json()
+        words = [f"backend-{port}", "says", "hello"]
+        if not payload.get("stream"):
+            await asyncio.sleep(delay * len(words))
+            return web.json_response({"choices": [{"index": 0, "text": " ".join(words)}], "backend": port})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in words:
+            await asyncio.sleep(delay)
+            await response.write(f"data: {json.dumps({'choices': [{'index': 0, 'text': word}]})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_get("/v1/models", models)
+    app.router.add_post("/v1/completions", completions)
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+def main():
+    global HEALTH_INTERVAL, AFFINITY_CHARS, AFFINITY_SLACK
+    parser = argparse.ArgumentParser(description="OpenAI-compatible load balancer for vLLM replicas")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backends", nargs="+", help="Backend base URLs (http://host:port)")
+    parser.add_argument("--ports", nargs="+", type=int, help="Shorthand for backends on 127.0.0.1")
+    parser.add_argument("--prefix-affinity", action="store_true", help="Route shared prompt prefixes to the same backend")
+    parser.add_argument("--affinity-chars", type=int, default=AFFINITY_CHARS)
+    parser.add_argument("--affinity-slack", type=int, default=AFFINITY_SLACK)
+    parser.add_argument("--health-interval", type=float, default=HEALTH_INTERVAL)
+    parser.add_argument("--fake-backend", action="store_true", help="Run a fake vLLM backend on --port instead (testing)")
+    args = parser.parse_args()
+
+    if args.fake_backend:
+        web.run_app(build_fake_backend(args.port), host="127.0.0.1", port=args.port, print=None)
+        return
+
+    urls = list(args.backends or []) + [f"http://127.0.0.1:{p}" for p in args.ports or []]
+    if not urls:
+        parser.error("Need --backends or --ports")
+    HEALTH_INTERVAL = args.health_interval
+    AFFINITY_CHARS = args.affinity_chars
+    AFFINITY_SLACK = args.affinity_slack
+
+    log(f"Listening on http://{args.host}:{args.port} -> {', '.join(urls)}"
+        + (" (prefix affinity)" if args.prefix_affinity else ""))
+    web.run_app(build_app(urls, args.prefix_affinity), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
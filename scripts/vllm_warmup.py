@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time kernel warmup for the toolbox.
+
+Triton, AITER and torch.compile kernels for gfx1201 are built lazily by the
+first `vllm serve` of each model/backend. This command starts every model
+profile from models.py once per attention backend, exactly as start-vllm would
+(its build_serve_cmd with the verified ctx/util at one concurrent request, but
+without VLLM_DISABLE_COMPILE_CACHE), waits for "Application startup
+complete" (weight load, compile, KV profiling and graph capture have run every
+kernel shape the server will use) and shuts it down again without serving
+traffic. The resulting caches are then packaged by kernel_cache.package(),
+keyed by the stack fingerprint, and start-vllm restores them when its caches
+are empty at launch (first boot, not after an erase).
+
+Needs the GPUs, so it cannot run during `podman build`. Run it once per image
+(start-vllm prints a reminder while no package matches the stack):
+
+    vllm-warmup --list                  # profiles that would be warmed, and the fingerprint
+    vllm-warmup                         # every downloaded model, all backends
+    vllm-warmup --model Qwen3 --backends Triton
+"""
+import argparse
+import importlib.machinery
+import importlib.util
+import os
+import re
+import select
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+OPT_DIR = Path("/opt")
+if (OPT_DIR / "run_vllm_bench.py").exists():
+    sys.path.append(str(OPT_DIR))
+else:
+    sys.path.append(str(SCRIPT_DIR.parent / "benchmarks"))
+
+try:
+    from run_vllm_bench import MODEL_TABLE, MODELS_TO_RUN, get_gpu_count, kill_vllm
+except ImportError:
+    print("Error: Could not import run_vllm_bench.py.")
+    sys.exit(1)
+
+import analyze_server_logs
+import hf_cache
+import kernel_cache
+
+def load_launcher():
+    """start-vllm as a module, so servers are built by its build_serve_cmd."""
+    for path in (Path("/usr/local/bin/start-vllm"), SCRIPT_DIR / "start_vllm.py"):
+        if path.exists():
+            spec = importlib.util.spec_from_loader("start_vllm", importlib.machinery.SourceFileLoader("start_vllm", str(path)))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+    print("Error: Could not find start-vllm.")
+    sys.exit(1)
+
+start_vllm = load_launcher()
+
+# =========================
+# ⚙️ CONFIG
+# =========================
+HOST = "127.0.0.1"
+PORT = 8000
+STARTUP_TIMEOUT = 1800   # Total, enforced even while the server prints nothing
+POLL_INTERVAL = 5
+MAX_SEQS = 1             # start-vllm's default concurrency
+LOG_DIR = Path("~/.cache/kernel_packages/logs").expanduser()
+
+# start-vllm attention backend names (see build_serve_cmd)
+BACKENDS = ["Triton", "ROCm (CK)", "AITER"]
+
+def log(msg): print(f"\n[WARMUP] {msg}", flush=True)
+
+def profiles(args):
+    """(model, tp, backend) for every model profile to warm."""
+    gpu_count = get_gpu_count()
+    found = []
+    for model in MODELS_TO_RUN:
+        if args.model and args.model not in model:
+            continue
+        valid_tps = [t for t in MODEL_TABLE[model]["valid_tp"] if t <= gpu_count]
+        tps = [args.tp] if args.tp else valid_tps[:1]
+        for tp in tps:
+            if tp not in valid_tps:
+                continue
+            for backend in args.backends:
+                found.append((model, tp, backend))
+    return found
+
+def warm(model, tp, backend):
+    """Starts the server until it is ready, then stops it. Returns an error string or None."""
+    verified = start_vllm.get_verified_config(model, tp, MAX_SEQS)
+    use_eager = MODEL_TABLE[model].get("enforce_eager", False)
+    start_vllm.HOST = HOST # Loopback only, nothing is served
+    cmd, env = start_vllm.build_serve_cmd(model, tp, MAX_SEQS, verified["ctx"], verified["util"], use_eager, backend, PORT)
+    env.pop("VLLM_DISABLE_COMPILE_CACHE", None) # Keep torch.compile artifacts for the package
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^a-z0-9]+", "_", backend.lower()).strip("_")
+    log_path = LOG_DIR / f"{model.replace('/', '_')}_tp{tp}_{slug}.log"
+    ready = re.compile(analyze_server_logs.PHASES[-1][1])
+    log(f"START {model} (TP={tp} | {backend} | ctx={verified['ctx']} | util={verified['util']}) -> {log_path}")
+
+    kill_vllm()
+    start = time.time()
+    error = f"Server exited before it was ready (see {log_path})"
+    with open(log_path, "wb") as srv_log:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+        fd = proc.stdout.fileno()
+        tail = b""
+        while True:
+            # select() so the deadline also fires on a server that hangs silently
+            if time.time() - start > STARTUP_TIMEOUT:
+                error = f"Not ready after {STARTUP_TIMEOUT}s (see {log_path})"
+                break
+            readable, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+            if not readable:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            srv_log.write(data)
+            tail = (tail + data)[-4096:]
+            if ready.search(tail.decode(errors="replace")):
+                error = None
+                break
+    try:
+        os.killpg(proc.pid, 15)
+        proc.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, 9)
+        proc.wait() # Reap it: a zombie would hold VRAM while the next profile starts
+    except ProcessLookupError:
+        pass
+    proc.stdout.close()
+    kill_vllm()
+    if not error:
+        log(f"WARM {model} (TP={tp} | {backend}) in {time.time() - start:.0f}s")
+    return error
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompile Triton/AITER/torch.compile kernels for the model profiles")
+    parser.add_argument("--model", type=str, help="Only models containing this substring")
+    parser.add_argument("--tp", type=int, help="TP size (default: smallest valid TP per model)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--download", action="store_true", help="Also warm models whose weights are not downloaded yet")
+    parser.add_argument("--list", action="store_true", help="Print the profiles and the stack fingerprint, then exit")
+    parser.add_argument("--package-only", action="store_true", help="Package the current caches without starting servers")
+    args = parser.parse_args()
+
+    todo = profiles(args)
+    if not args.download:
+        skipped = sorted({m for m, _, _ in todo if not hf_cache.weight_files(m)})
+        for model in skipped:
+            log(f"SKIP {model} (weights not downloaded, use --download)")
+        todo = [p for p in todo if p[0] not in skipped]
+
+    if args.list:
+        kernel_cache.main()
+        for model, tp, backend in todo:
+            print(f"  {model} | TP={tp} | {backend}")
+        return
+
+    warmed = []
+    if not args.package_only:
+        start_vllm.fix_multi_gpu_jit() # Same hipcc wrapper the launcher compiles with
+        for model, tp, backend in todo:
+            error = warm(model, tp, backend)
+            if error:
+                log(f"FAIL {model} (TP={tp} | {backend}): {error}")
+            else:
+                warmed.append({"model": model, "tp": tp, "backend": backend})
+        log(f"Warmed {len(warmed)}/{len(todo)} profile(s)")
+
+    if not kernel_cache.caches_present():
+        log("No kernel caches to package.")
+        sys.exit(1)
+    kernel_cache.package(warmed)
+
+if __name__ == "__main__":
+    main()